@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'JobPilot.settings')
 
 application = get_asgi_application()
+
+# Modèle Gemini partagé prêt avant la première requête du worker
+from matching.services.gemini_client import warm_up  # noqa: E402
+
+warm_up()
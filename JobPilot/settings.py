@@ -166,6 +166,113 @@ STRIPE_PRICE_SPRINT = os.getenv('STRIPE_PRICE_SPRINT')      # Abonnement 5,99 
 STRIPE_PRICE_PRO = os.getenv('STRIPE_PRICE_PRO')           # Abonnement 14,99 € / mois
 STRIPE_PRICE_PACK = os.getenv('STRIPE_PRICE_PACK')         # Paiement unique 4,99 € (10 crédits)
 
+# --- 5. TÂCHES EN ARRIÈRE-PLAN (python manage.py run_task_worker) ---
+BACKGROUND_TASK_MODULES = ['matching.tasks', 'resumes.tasks']
+# Optionnel : Redis (cf. docker-compose.yml) pour réveiller les workers, ex: redis://localhost:6379/0
+TASK_BROKER_URL = os.getenv('TASK_BROKER_URL')
+# En développement sans worker : exécute les tâches directement dans la requête
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER') == 'True'
+# Nombre max de tâches d'un même type exécutées simultanément (tous workers confondus)
+BACKGROUND_TASK_CONCURRENCY = {'precompute_cv_optimization': 2}
+
+# Uploads de CV refusés pendant la réception : taille max (Mo) et nombre de pages max
+RESUME_UPLOAD_MAX_MB = int(os.getenv('RESUME_UPLOAD_MAX_MB', 10))
+RESUME_UPLOAD_MAX_PAGES = int(os.getenv('RESUME_UPLOAD_MAX_PAGES', 20))
+
+# Extraction du texte des CV (tâche process_resume) : processus du pool, pages min. par processus,
+# budget par document (s) et plafond de mémoire par processus (Mo)
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', 2))
+PDF_EXTRACTION_PAGES_PER_CHUNK = int(os.getenv('PDF_EXTRACTION_PAGES_PER_CHUNK', 2))
+PDF_EXTRACTION_TIMEOUT = float(os.getenv('PDF_EXTRACTION_TIMEOUT', 30))
+PDF_EXTRACTION_MEMORY_MB = int(os.getenv('PDF_EXTRACTION_MEMORY_MB', 512))
+# Moteur d'extraction : 'auto' (pypdfium2 s'il est installé, sinon pdfminer), 'pdfium', 'pdfminer' ou
+# 'pdfplumber' ; les moteurs rapides sont relayés par pdfplumber quand leur texte semble cassé
+PDF_EXTRACTION_ENGINE = os.getenv('PDF_EXTRACTION_ENGINE', 'auto')
+
+# Extracteur local du poste et des compétences (resumes/services/local_parser.py) : Gemini n'est appelé
+# (et un crédit consommé) que si sa confiance est inférieure au seuil
+LOCAL_PARSER_ENABLED = os.getenv('LOCAL_PARSER_ENABLED', 'True') == 'True'
+LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv('LOCAL_PARSER_MIN_CONFIDENCE', 0.75))
+
+# Pré-calcul des suggestions CV pour les meilleurs nouveaux matches des utilisateurs premium
+CV_PRECOMPUTE_ENABLED = os.getenv('CV_PRECOMPUTE_ENABLED') == 'True'
+CV_PRECOMPUTE_TOP_N = int(os.getenv('CV_PRECOMPUTE_TOP_N', 3))
+# Pré-calculs max par utilisateur et par 24 h, selon le plan
+CV_PRECOMPUTE_BUDGETS = {'pass24h': 3, 'sprint': 10, 'pro': 20}
+
+# Vues asynchrones pour les endpoints IA / France Travail (à servir via JobPilot/asgi.py)
+ASYNC_AI_VIEWS = os.getenv('ASYNC_AI_VIEWS', 'True') == 'True'
+
+# Backend des modèles de langage : 'gemini' (production) ou 'stub' (modèle local déterministe, benchmarks sans clé)
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+# Stub : latence simulée (ms), délai entre fragments en streaming, part d'erreurs injectées (génériques / quota)
+LLM_STUB = {
+    'latency_ms': int(os.getenv('LLM_STUB_LATENCY_MS', 800)),
+    'jitter_ms': int(os.getenv('LLM_STUB_JITTER_MS', 200)),
+    'stream_chunk_ms': 40,
+    'failure_rate': float(os.getenv('LLM_STUB_FAILURE_RATE', 0)),
+    'quota_error_rate': float(os.getenv('LLM_STUB_QUOTA_ERROR_RATE', 0)),
+    'seed': 0,
+}
+
+# Préchauffage du modèle Gemini partagé au démarrage des workers (wsgi.py / asgi.py)
+GEMINI_WARMUP = os.getenv('GEMINI_WARMUP', 'True') == 'True'
+
+# Répartiteur des appels Gemini : concurrence max (tous processus confondus), file d'attente, réessais sur erreur
+# de quota
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 8))
+GEMINI_MAX_CONCURRENCY_PER_USER = int(os.getenv('GEMINI_MAX_CONCURRENCY_PER_USER', 2))
+# Places communes tenues en base (GeminiCallLease) ; False : plafonds appliqués par processus seulement
+GEMINI_SHARED_LIMIT = os.getenv('GEMINI_SHARED_LIMIT', 'True') == 'True'
+# Échéance (s) d'une place commune : celle d'un processus tué est reprise au-delà (plus long qu'un appel en streaming)
+GEMINI_LEASE_SECONDS = int(os.getenv('GEMINI_LEASE_SECONDS', 300))
+# Au-delà (appels en attente) ou si l'attente estimée dépasse GEMINI_QUEUE_TIMEOUT (s) : réponse 429 + Retry-After
+GEMINI_MAX_QUEUE = int(os.getenv('GEMINI_MAX_QUEUE', 50))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 20))
+GEMINI_BACKGROUND_QUEUE_TIMEOUT = float(os.getenv('GEMINI_BACKGROUND_QUEUE_TIMEOUT', 600))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 1.0))
+
+# Contexte Gemini mis en cache par CV (lettres, CV Optimizer) : durée de vie (s) et taille minimale du CV
+# (tokens estimés ; en dessous, minimum imposé par Gemini, le CV reste dans chaque prompt)
+CONTEXT_CACHE_ENABLED = os.getenv('CONTEXT_CACHE_ENABLED', 'True') == 'True'
+CONTEXT_CACHE_TTL = int(os.getenv('CONTEXT_CACHE_TTL', 3600))
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('CONTEXT_CACHE_MIN_TOKENS', 1024))
+
+# Export PDF des lettres de motivation : police TTF embarquée (chemin, facultatif ; Helvetica par défaut)
+# et taille max (Mo) du cache des fichiers rendus (PDF et DOCX), par processus
+LETTER_PDF_FONT = os.getenv('LETTER_PDF_FONT')
+LETTER_PDF_FONT_BOLD = os.getenv('LETTER_PDF_FONT_BOLD')
+LETTER_PDF_CACHE_MAX_MB = int(os.getenv('LETTER_PDF_CACHE_MAX_MB', 16))
+# Export DOCX : document modèle (.docx, facultatif ; papier à en-tête...), chargé une fois par processus
+LETTER_DOCX_TEMPLATE = os.getenv('LETTER_DOCX_TEMPLATE')
+# Export ZIP de toutes les lettres : processus de rendu des fichiers (pool partagé par les exports du worker)
+LETTER_EXPORT_WORKERS = int(os.getenv('LETTER_EXPORT_WORKERS', 2))
+
+# Télémétrie des appels IA (tokens, latence, coût par fonctionnalité et par utilisateur) : écriture par lots
+AI_TELEMETRY_ENABLED = os.getenv('AI_TELEMETRY_ENABLED', 'True') == 'True'
+AI_TELEMETRY_FLUSH_SIZE = int(os.getenv('AI_TELEMETRY_FLUSH_SIZE', 50))
+AI_TELEMETRY_FLUSH_INTERVAL = float(os.getenv('AI_TELEMETRY_FLUSH_INTERVAL', 10))
+AI_TELEMETRY_RETENTION_DAYS = int(os.getenv('AI_TELEMETRY_RETENTION_DAYS', 30))
+# Prix en USD par million de tokens : (entrée, sortie, entrée lue depuis un contexte en cache)
+AI_TOKEN_PRICES = {
+    'gemini-2.5-flash': (0.30, 2.50, 0.075),
+}
+
+# Cache des réponses IA (CV Optimizer, analyse de CV) : durée de vie, taille max (LRU)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 30 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+# Une réponse servie depuis le cache consomme-t-elle un crédit ? Booléen ou {fonctionnalité: booléen}
+LLM_CACHE_HIT_CONSUMES_CREDIT = {'cv_optimizer': False, 'cv_parser': False}
+
+# Budget de tokens des textes CV / offre insérés dans chaque prompt (voir matching/services/prompt_compactor.py)
+PROMPT_TOKEN_BUDGETS = {
+    'cover_letter': {'cv': 1500, 'offer': 1000},
+    'cv_optimizer': {'cv': 1500, 'offer': 1500},
+    'cv_parser': {'cv': 1000},
+}
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 # Static files (CSS, JavaScript, Images)
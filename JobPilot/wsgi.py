@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'JobPilot.settings')
 
 application = get_wsgi_application()
+
+# Modèle Gemini partagé prêt avant la première requête du worker
+from matching.services.gemini_client import warm_up  # noqa: E402
+
+warm_up()
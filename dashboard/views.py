@@ -2,6 +2,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from matching.models import JobMatch
+from matching.services.precompute import mark_suggestions_used
 from resumes.models import Resume
 from django.core.paginator import Paginator
 from django.db.models import Count, Case, When, IntegerField
@@ -26,7 +27,7 @@ def dashboard(request):
         user=request.user
     ).exclude(
         status='rejected'
-    ).select_related('job_offer').order_by('-matched_at', '-score')
+    ).for_list().order_by('-matched_at', '-score')
 
     page_number = request.GET.get('page', 1)
     paginator = Paginator(matches, 10)
@@ -73,7 +74,12 @@ def application_workspace(request, match_id):
         match.save()
         return redirect('application_workspace', match_id=match_id)
     
+    # Suggestions CV déjà calculées (pré-calcul en arrière-plan) : affichées sans nouvel appel IA
+    if match.cv_suggestions is not None:
+        mark_suggestions_used(match)
+
     return render(request, 'dashboard/detail.html', {
         'match': match,
         'job_offer': match.job_offer,
+        'cv_suggestions': match.cv_suggestions,
     })
@@ -0,0 +1,31 @@
+from django.contrib import admin
+
+from .models import AICallRecord
+from .services import telemetry
+
+
+@admin.register(AICallRecord)
+class AICallRecordAdmin(admin.ModelAdmin):
+    """Télémétrie des appels IA : synthèse des dernières 24 h au-dessus de la liste (lecture seule)."""
+    change_list_template = 'admin/matching/aicallrecord/change_list.html'
+    list_display = ('created_at', 'feature', 'model_name', 'user', 'prompt_tokens', 'response_tokens',
+                    'cached_tokens', 'latency_ms', 'retries', 'cache_hit', 'status', 'cost_usd')
+    list_filter = ('feature', 'status', 'cache_hit', 'model_name')
+    search_fields = ('user__username',)
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        summary = telemetry.summarize(24)
+        extra_context = {
+            **(extra_context or {}),
+            'summary': summary,
+            'features': sorted(summary['features'].items()),
+        }
+        return super().changelist_view(request, extra_context=extra_context)
@@ -0,0 +1,484 @@
+"""
+Versions asynchrones (ASGI) des vues qui attendent un service externe (Gemini, France Travail).
+
+Servies par JobPilot/asgi.py, elles n'immobilisent pas de thread pendant l'appel réseau :
+un même worker peut traiter de nombreuses requêtes en vol. Les accès ORM passent par l'API
+asynchrone de Django (aget, afirst...) ou par sync_to_async, le rendu PDF (CPU) par un thread dédié.
+Activées par ASYNC_AI_VIEWS (voir matching/urls.py) ; les vues synchrones de views.py restent disponibles.
+"""
+import asyncio
+import base64
+import logging
+from contextlib import aclosing
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from resumes.models import Resume
+from resumes.services.ai_optimizer import AIOptimizer
+from .models import JobMatch, BackgroundTask
+from .services import consume_credit, refund_credit
+from .services.ai_letter_generator import AILetterGenerator
+from .services.francetravail import FranceTravail
+from .services.gemini_dispatcher import GeminiOverloaded, call_context
+from .services.llm_cache import FEATURE_CV_OPTIMIZER, cache_hit_consumes_credit
+from .services.precompute import mark_suggestions_used, store_suggestions
+from .services.letter_refinement import MODE_FULL, MODE_UNCHANGED, parse_targets, plan, updated_baselines
+from .views import (
+    QUICK_REFINE_ACTIONS, REFINEMENT_UNCHANGED_MESSAGE, _overloaded_response, _parse_page, _refinement_message,
+    _sse_event, _start_job_search,
+)
+
+
+def _credits_error():
+    return JsonResponse({
+        'success': False,
+        'error': 'Crédits insuffisants. Passez Premium ou rechargez vos crédits.',
+        'redirect': '/subscriptions/pricing/',
+    }, status=402)
+
+
+async def _resume_for_match(match, user):
+    """CV associé au match, sinon le CV principal de l'utilisateur, sinon son premier CV."""
+    if match.resume_id:
+        return match.resume
+    resume = await Resume.objects.filter(user=user, is_primary=True).afirst()
+    if not resume:
+        resume = await Resume.objects.filter(user=user).afirst()
+    return resume
+
+
+def _results_page(matches, page_number):
+    """Pagination évaluée dans un thread (le template ne doit plus toucher la base)."""
+    page_obj = Paginator(matches, 9).get_page(page_number)
+    page_obj.object_list = list(page_obj.object_list)
+    return page_obj
+
+
+@login_required
+async def find_jobs_for_resume_async(request, resume_id):
+    """
+    Version asynchrone de find_jobs_for_resume.
+    Sans worker (BACKGROUND_TASKS_EAGER), le rafraîchissement se fait dans la requête avec le client
+    HTTP asynchrone : l'attente de France Travail ne bloque pas de thread.
+    """
+    page_number = request.GET.get('page', 1)
+    resume = await aget_object_or_404(Resume.objects.select_related('user'), id=resume_id)
+    user = resume.user
+
+    jobs_found = 0
+    stream_url = None
+    stream_last_event_id = 0
+    task_id = request.GET.get('task')
+    if task_id:
+        task = await BackgroundTask.objects.filter(pk=_parse_page(task_id), user=user, kind='find_jobs').afirst()
+        if task:
+            jobs_found = task.progress.get('saved', 0)
+            if not task.is_finished:
+                stream_url = reverse('find_jobs_stream', args=[task.id])
+                stream_last_event_id = len(task.progress.get('match_ids', []))
+    elif resume.detected_job_title:
+        page = _parse_page(page_number)
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            service = FranceTravail()
+            try:
+                logging.info(f"🔍 Recherche d'offres avec le titre détecté: {resume.detected_job_title}")
+                api_results = await service.asearch_jobs(resume.detected_job_title, page=page)
+                if api_results:
+                    saved_matches = await service.asave_jobs(api_results, user, resume)
+                    jobs_found = len(saved_matches)
+                    logging.info(f"✅ {jobs_found} offres sauvegardées en base de données")
+            except Exception as e:
+                logging.info(f"❌ Erreur API : {e}")
+        else:
+            await sync_to_async(_start_job_search)(resume, page)
+    else:
+        logging.info("⚠️ Aucun titre de poste détecté dans le CV. Impossible de rechercher des offres.")
+
+    matches = JobMatch.objects.filter(
+        resume=resume,
+        user=user
+    ).exclude(
+        status='rejected'
+    ).for_list().order_by('-score', '-matched_at')
+    page_obj = await sync_to_async(_results_page)(matches, page_number)
+
+    return await sync_to_async(render)(request, 'matching/results.html', {
+        'resume': resume,
+        'matches': matches,
+        'jobs_found': jobs_found,
+        'job_title_used': resume.detected_job_title or 'Non détecté',
+        'page_obj': page_obj,
+        'stream_url': stream_url,
+        'stream_last_event_id': stream_last_event_id,
+    })
+
+
+@login_required
+@require_POST
+async def quick_refine_cover_letter_async(request, match_id):
+    """
+    Version asynchrone de quick_refine_cover_letter (génération, export PDF, actions rapides).
+    """
+    user = await request.auser()
+    match = await aget_object_or_404(
+        JobMatch.objects.select_related('job_offer', 'resume'), id=match_id, user=user
+    )
+    action = request.POST.get('action', 'improve')
+
+    # Consommer 1 crédit pour les actions IA (sauf export-pdf qui n'utilise pas l'IA générative)
+    if action != 'export-pdf':
+        if not await sync_to_async(consume_credit)(user):
+            return _credits_error()
+
+    if action == 'generate':
+        try:
+            generator = AILetterGenerator()
+            resume = await _resume_for_match(match, user)
+            if not resume:
+                return JsonResponse({
+                    'success': False,
+                    'error': "Aucun CV trouvé. Veuillez d'abord uploader un CV."
+                }, status=400)
+            if not resume.extracted_text:
+                return JsonResponse({
+                    'success': False,
+                    'error': "Le CV n'a pas de texte extrait. Veuillez ré-uploader le CV."
+                }, status=400)
+
+            with call_context(user=user):
+                generated_letter = await generator.agenerate_cover_letter(
+                    resume=resume,
+                    job_match=match,
+                    tone="professional"
+                )
+            return JsonResponse({
+                'success': True,
+                'refined_letter': generated_letter,
+                'message': '✨ Lettre de motivation générée avec succès ! Vous pouvez maintenant la modifier et la sauvegarder.'
+            })
+        except GeminiOverloaded as e:
+            await sync_to_async(refund_credit)(user)
+            return _overloaded_response(e)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f"Erreur de validation : {str(e)}"
+            }, status=400)
+        except Exception as e:
+            logging.error(f"Erreur lors de la génération de la lettre : {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': f"Erreur lors de la génération : {str(e)}"
+            }, status=500)
+
+    current_text = request.POST.get('cover_letter_content', match.cover_letter_content)
+    if not current_text:
+        return JsonResponse({
+            'success': False,
+            'error': "Vous devez d'abord rédiger une lettre de motivation."
+        }, status=400)
+
+    if action == 'export-pdf':
+        try:
+            user_name = f"{user.first_name} {user.last_name}".strip() if (user.first_name or user.last_name) else user.username
+            job_offer = match.job_offer
+            job_title = job_offer.title if job_offer else None
+            company_name = job_offer.company_name if job_offer else None
+
+            # Rendu CPU : thread dédié pour ne pas bloquer la boucle d'évènements
+            pdf, _ = await sync_to_async(AILetterGenerator.render_pdf, thread_sensitive=False)(
+                cover_letter_content=current_text,
+                user_name=user_name,
+                user_email=user.email if user.email else None,
+                user_address=None,
+                job_title=job_title,
+                company_name=company_name,
+                recipient_name=None
+            )
+            pdf_base64 = base64.b64encode(pdf).decode('utf-8')
+            return JsonResponse({
+                'success': True,
+                'pdf_data': pdf_base64,
+                'filename': f"lettre_motivation_{job_title or 'candidature'}_{company_name or 'entreprise'}.pdf".replace(' ', '_'),
+                'message': '📄 PDF généré avec succès !'
+            })
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': f"Erreur lors de l'export PDF : {str(e)}"
+            }, status=500)
+
+    action_config = QUICK_REFINE_ACTIONS.get(action, QUICK_REFINE_ACTIONS['improve'])
+    return await _refine_response(user, match, current_text, action_config, request.POST.get('paragraphs'))
+
+
+async def _refine_response(user, match, current_text, action_config, paragraphs=None):
+    """
+    Amélioration (action rapide) avec réponse JSON : seuls les paragraphes désignés ou modifiés depuis
+    la dernière amélioration identique (type et instructions) sont envoyés à Gemini (voir letter_refinement).
+    Le crédit a déjà été consommé ; il est rendu si rien n'est à reprendre ou si le service est saturé.
+    """
+    try:
+        generator = AILetterGenerator()
+        final_instructions = generator._build_refinement_instructions(
+            action_config['instructions'],
+            action_config['type']
+        )
+        with call_context(user=user, interactive=True):
+            refined_letter, refinement = await generator.arefine_letter(
+                current_text,
+                final_instructions,
+                improvement_type=action_config['type'],
+                baselines=match.letter_refinement_hashes,
+                targets=parse_targets(paragraphs)
+            )
+        if refinement['mode'] == MODE_UNCHANGED:
+            await sync_to_async(refund_credit)(user)
+            return JsonResponse({
+                'success': True,
+                'refined_letter': refined_letter,
+                'refinement': refinement,
+                'message': REFINEMENT_UNCHANGED_MESSAGE
+            })
+
+        match.cover_letter_content = refined_letter
+        match.letter_refinement_hashes = updated_baselines(
+            match.letter_refinement_hashes, action_config['type'], final_instructions, refined_letter
+        )
+        await match.asave()
+
+        return JsonResponse({
+            'success': True,
+            'refined_letter': refined_letter,
+            'refinement': refinement,
+            'message': _refinement_message(refinement)
+        })
+    except GeminiOverloaded as e:
+        await sync_to_async(refund_credit)(user)
+        return _overloaded_response(e)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': f"Erreur de validation : {str(e)}"
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f"Erreur lors de l'amélioration : {str(e)}"
+        }, status=500)
+
+
+@login_required
+@require_POST
+async def optimize_cv_view_async(request, match_id):
+    """
+    Version asynchrone de optimize_cv_view (CV Optimizer).
+    """
+    user = await request.auser()
+    match = await aget_object_or_404(
+        JobMatch.objects.select_related('job_offer', 'resume'), id=match_id, user=user
+    )
+    resume = await _resume_for_match(match, user)
+    if not resume:
+        return JsonResponse({
+            'success': False,
+            'error': "Aucun CV trouvé. Veuillez d'abord uploader un CV."
+        }, status=400)
+    if not resume.extracted_text or not resume.extracted_text.strip():
+        return JsonResponse({
+            'success': False,
+            'error': "Le CV n'a pas de texte extrait. Veuillez ré-uploader le CV."
+        }, status=400)
+    job_offer = match.job_offer
+    if not job_offer:
+        return JsonResponse({
+            'success': False,
+            'error': "Offre d'emploi introuvable."
+        }, status=400)
+
+    # Suggestions déjà stockées sur le match (pré-calculées) ou en cache pour ce CV et cette offre : réponse immédiate
+    if match.cv_suggestions is not None:
+        await sync_to_async(mark_suggestions_used)(match)
+        cached = match.cv_suggestions
+    else:
+        cached = await sync_to_async(AIOptimizer.cached_result)(
+            resume.extracted_text, job_offer.description or '', job_offer.title or ''
+        )
+    if cached is None or cache_hit_consumes_credit(user, FEATURE_CV_OPTIMIZER):
+        if not await sync_to_async(consume_credit)(user):
+            return _credits_error()
+    if cached is not None:
+        return JsonResponse({
+            'success': True,
+            'data': cached,
+            'cached': True,
+            'message': "Suggestions d'adaptation du CV générées avec succès."
+        })
+    try:
+        optimizer = AIOptimizer()
+        with call_context(user=user):
+            result = await optimizer.aoptimize_for_offer(
+                cv_text=resume.extracted_text,
+                job_description=job_offer.description or '',
+                job_title=job_offer.title or '',
+                use_cache=False,
+                resume=resume
+            )
+        await sync_to_async(store_suggestions)(match, result, JobMatch.SUGGESTIONS_ON_DEMAND)
+        return JsonResponse({
+            'success': True,
+            'data': result,
+            'cached': False,
+            'message': "Suggestions d'adaptation du CV générées avec succès."
+        })
+    except GeminiOverloaded as e:
+        await sync_to_async(refund_credit)(user)
+        return _overloaded_response(e)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    except Exception as e:
+        logging.error(f"Erreur CV Optimizer : {e}")
+        return JsonResponse({
+            'success': False,
+            'error': f"Erreur lors de l'analyse : {str(e)}"
+        }, status=500)
+
+
+async def _letter_stream(match, action, chunks, metrics, user, instructions=None):
+    """
+    Relaie en Server-Sent Events les fragments produits par Gemini (évènements "token"),
+    puis la lettre complète ("done", avec le délai avant le premier token) ou l'erreur ("error").
+    instructions : instructions finales d'une amélioration, clé des empreintes enregistrées.
+    Si le client se déconnecte, Django annule la réponse : l'annulation remonte jusqu'au flux Gemini.
+    Le flux est consommé après la vue : la priorité de l'appel (call_context) est donc posée ici ;
+    si le service IA est saturé, l'erreur porte retry_after (les en-têtes 200 sont déjà partis).
+    """
+    parts = []
+    try:
+        with call_context(user=user, interactive=action != 'generate'):
+            async with aclosing(chunks):
+                async for text in chunks:
+                    parts.append(text)
+                    yield _sse_event('token', {'text': text})
+    except asyncio.CancelledError:
+        logging.info(f"⏹️ Streaming de la lettre du match {match.id} interrompu par le client")
+        raise
+    except GeminiOverloaded as e:
+        await sync_to_async(refund_credit)(user)
+        yield _sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+        return
+    except ValueError as e:
+        yield _sse_event('error', {'error': f"Erreur de validation : {str(e)}"})
+        return
+    except Exception as e:
+        logging.error(f"Erreur lors du streaming de la lettre : {str(e)}")
+        yield _sse_event('error', {'error': f"Erreur lors de la génération : {str(e)}"})
+        return
+
+    letter = ''.join(parts).strip()
+    if action == 'generate':
+        message = '✨ Lettre de motivation générée avec succès ! Vous pouvez maintenant la modifier et la sauvegarder.'
+    else:
+        match.cover_letter_content = letter
+        match.letter_refinement_hashes = updated_baselines(
+            match.letter_refinement_hashes, QUICK_REFINE_ACTIONS[action]['type'], instructions, letter
+        )
+        await match.asave()
+        message = '✨ Votre lettre a été améliorée avec succès !'
+    yield _sse_event('done', {
+        'refined_letter': letter,
+        'message': message,
+        'ttft_ms': metrics.get('ttft_ms'),
+    })
+
+
+@login_required
+@require_POST
+async def stream_cover_letter(request, match_id):
+    """
+    Génération / amélioration de la lettre en streaming (mêmes actions que quick_refine_cover_letter,
+    hors export PDF) : l'éditeur du workspace affiche le texte au fil des tokens.
+    Les erreurs détectées avant l'appel à Gemini (crédits, CV, lettre vide) sont renvoyées en JSON,
+    de même que les améliorations limitées à quelques paragraphes (réponse courte, sans flux).
+    """
+    user = await request.auser()
+    match = await aget_object_or_404(
+        JobMatch.objects.select_related('job_offer', 'resume'), id=match_id, user=user
+    )
+    action = request.POST.get('action', 'improve')
+    if action != 'generate' and action not in QUICK_REFINE_ACTIONS:
+        return JsonResponse({
+            'success': False,
+            'error': "Action non disponible en streaming."
+        }, status=400)
+
+    if action == 'generate':
+        resume = await _resume_for_match(match, user)
+        if not resume:
+            return JsonResponse({
+                'success': False,
+                'error': "Aucun CV trouvé. Veuillez d'abord uploader un CV."
+            }, status=400)
+        if not resume.extracted_text:
+            return JsonResponse({
+                'success': False,
+                'error': "Le CV n'a pas de texte extrait. Veuillez ré-uploader le CV."
+            }, status=400)
+    else:
+        current_text = request.POST.get('cover_letter_content', match.cover_letter_content)
+        if not current_text:
+            return JsonResponse({
+                'success': False,
+                'error': "Vous devez d'abord rédiger une lettre de motivation."
+            }, status=400)
+
+    try:
+        generator = AILetterGenerator()
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+    if not await sync_to_async(consume_credit)(user):
+        return _credits_error()
+
+    metrics = {}
+    final_instructions = None
+    if action == 'generate':
+        chunks = generator.astream_cover_letter(
+            resume=resume,
+            job_match=match,
+            tone="professional",
+            metrics=metrics
+        )
+    else:
+        action_config = QUICK_REFINE_ACTIONS[action]
+        paragraphs = request.POST.get('paragraphs')
+        final_instructions = generator._build_refinement_instructions(
+            action_config['instructions'],
+            action_config['type']
+        )
+        mode, _, _ = plan(current_text, action_config['type'], final_instructions, match.letter_refinement_hashes,
+                          parse_targets(paragraphs))
+        if mode != MODE_FULL:
+            return await _refine_response(user, match, current_text, action_config, paragraphs)
+        chunks = generator.astream_refine_cover_letter(current_text, final_instructions, metrics=metrics)
+
+    response = StreamingHttpResponse(
+        _letter_stream(match, action, chunks, metrics, user, final_instructions),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Pas de bufferisation côté Nginx
+    return response
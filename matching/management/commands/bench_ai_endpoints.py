@@ -0,0 +1,215 @@
+"""
+Commande Django : python manage.py bench_ai_endpoints
+Mesure le débit de bout en bout des endpoints IA (CV Optimizer, amélioration rapide de lettre,
+upload de CV avec analyse) avec le backend local 'stub' (voir matching/services/llm_backends.py) :
+ni clé Gemini ni réseau. Les requêtes passent par les vraies vues (client de test Django, N threads),
+le répartiteur Gemini et la base. Un utilisateur premium temporaire et ses données sont supprimés à la fin.
+"""
+import io
+import queue
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from matching.models import JobMatch, JobOffer
+from matching.services.gemini_dispatcher import get_dispatcher_stats
+from resumes.models import Resume
+
+
+CV_TEXT = """Développeur Python / Django
+Profil
+Développeur backend avec 3 ans d'expérience sur des applications web.
+Expériences
+2022 - 2025 : Développeur Django chez Acme, API REST, PostgreSQL, Docker.
+2021 - 2022 : Stage développeur Python, scripts de traitement de données.
+Compétences
+Python, Django, SQL, PostgreSQL, Docker, Git, Linux, Anglais
+Formation
+Master Informatique"""
+
+OFFER_TEXT = """Missions
+Concevoir et maintenir des API REST en Python et Django, déployées sur Kubernetes et AWS.
+Participer aux revues de code et à l'intégration continue (GitLab CI).
+Profil recherché
+Expérience en Python, Django, PostgreSQL ; connaissance de Kubernetes, Terraform et Redis appréciée."""
+
+LETTER = """Madame, Monsieur,
+
+Je vous adresse ma candidature au poste de développeur Python.
+
+Mon expérience chez Acme m'a permis de concevoir des API REST avec Django et PostgreSQL.
+
+Je serais heureux d'échanger avec vous lors d'un entretien.
+
+Bien cordialement"""
+
+ENDPOINTS = ('optimize', 'refine', 'upload')
+
+
+def _cv_pdf(reference=''):
+    """PDF du CV de test ; la référence rend chaque fichier unique (pas de réutilisation d'un CV identique)."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    y = 800
+    for line in [*CV_TEXT.splitlines(), reference]:
+        pdf.drawString(50, y, line)
+        y -= 18
+    pdf.save()
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark de bout en bout des endpoints IA avec le backend LLM local (stub)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=40, help='Requêtes par endpoint (défaut: 40).')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requêtes simultanées (défaut: 8).')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f"Endpoints mesurés, séparés par des virgules (défaut: {','.join(ENDPOINTS)}).")
+        parser.add_argument('--latency-ms', type=int, default=800, help='Latence simulée du modèle (défaut: 800).')
+        parser.add_argument('--jitter-ms', type=int, default=200, help='Variation de latence (défaut: 200).')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Part d\'erreurs injectées (défaut: 0).')
+        parser.add_argument('--quota-error-rate', type=float, default=0.0,
+                            help='Part d\'erreurs de quota injectées, réessayées par le répartiteur (défaut: 0).')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Garder le cache des réponses IA actif (désactivé par défaut pour mesurer le modèle).')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            self.stderr.write(self.style.ERROR(f"Endpoints inconnus : {', '.join(sorted(unknown))}"))
+            return
+        stub = {
+            'latency_ms': options['latency_ms'],
+            'jitter_ms': options['jitter_ms'],
+            'failure_rate': options['failure_rate'],
+            'quota_error_rate': options['quota_error_rate'],
+            'seed': 0,
+        }
+        # Le client de test Django s'annonce comme "testserver" ; tâches exécutées dans la requête
+        # pour que l'upload mesure aussi l'extraction et l'analyse du CV
+        with override_settings(LLM_BACKEND='stub', LLM_STUB=stub, LLM_CACHE_ENABLED=options['with_cache'],
+                               CV_PRECOMPUTE_ENABLED=False, BACKGROUND_TASKS_EAGER=True,
+                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            user = self._create_user()
+            try:
+                self.stdout.write(
+                    f"Backend stub : latence {options['latency_ms']} ± {options['jitter_ms']} ms, "
+                    f"{options['requests']} requêtes par endpoint, concurrence {options['concurrency']}"
+                )
+                self.stdout.write(
+                    f"{'Endpoint':<10} {'Req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'Statuts':<24}"
+                )
+                for endpoint in endpoints:
+                    self._bench(endpoint, user, options['requests'], options['concurrency'])
+            finally:
+                self._cleanup(user)
+        stats = get_dispatcher_stats()
+        self.stdout.write(
+            f"Répartiteur : attente moyenne {stats['avg_wait_ms']} ms, pic de file {stats['peak_queue']}, "
+            f"compteurs {stats['counters']}"
+        )
+
+    def _create_user(self):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        return get_user_model().objects.create_user(
+            username=f"bench_ai_{suffix}",
+            password=None,
+            subscription_plan='pro',
+            subscription_end_date=timezone.now() + timedelta(days=1),
+        )
+
+    def _requests_for(self, endpoint, user, count):
+        """Une requête par élément : (URL, données POST)."""
+        if endpoint == 'upload':
+            url = reverse('upload_resume')
+            return [
+                (url, {'title': f"Bench {i}",
+                       'file': SimpleUploadedFile(f"bench_{i}.pdf", _cv_pdf(f"Réf. bench {user.pk}-{i}"),
+                                                  'application/pdf')})
+                for i in range(count)
+            ]
+        resume = Resume.objects.create(
+            user=user, title='Bench', file='cvs/bench.pdf', extracted_text=CV_TEXT,
+            detected_job_title='Développeur Python',
+        )
+        requests = []
+        for i in range(count):
+            # Un match par requête : les suggestions stockées sur un match ne sont pas recalculées
+            offer = JobOffer.objects.create(
+                remote_id=f"bench-{user.pk}-{endpoint}-{i}", title='Développeur Python',
+                company_name='Bench', description=f"{OFFER_TEXT}\nRéférence {i}",
+            )
+            match = JobMatch.objects.create(
+                user=user, resume=resume, job_offer=offer, score=80, cover_letter_content=LETTER,
+            )
+            if endpoint == 'optimize':
+                requests.append((reverse('optimize_cv', args=[match.pk]), {}))
+            else:
+                requests.append((reverse('quick_refine_cover_letter', args=[match.pk]),
+                                 {'action': 'grammar', 'cover_letter_content': LETTER}))
+        return requests
+
+    def _bench(self, endpoint, user, count, concurrency):
+        pending = queue.Queue()
+        for item in self._requests_for(endpoint, user, count):
+            pending.put(item)
+        durations = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def worker():
+            client = Client()
+            client.force_login(user)
+            try:
+                while True:
+                    try:
+                        url, data = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    start = time.perf_counter()
+                    response = client.post(url, data)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        durations.append(elapsed)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        durations.sort()
+        p95 = durations[max(0, int(len(durations) * 0.95) - 1)]
+        status_text = ' '.join(f"{code}×{n}" for code, n in sorted(statuses.items()))
+        self.stdout.write(
+            f"{endpoint:<10} {len(durations) / wall:>7.1f} {statistics.median(durations):>8.0f} "
+            f"{p95:>8.0f} {durations[-1]:>8.0f} {status_text:<24}"
+        )
+
+    def _cleanup(self, user):
+        # Fichiers PDF enregistrés par les uploads, puis l'utilisateur et ses données (cascade)
+        for resume in Resume.objects.filter(user=user).exclude(file='cvs/bench.pdf'):
+            # Fichier partagé avec un CV identique d'un autre utilisateur : conservé
+            if not Resume.objects.filter(file=resume.file.name).exclude(user=user).exists():
+                resume.file.delete(save=False)
+        JobOffer.objects.filter(remote_id__startswith=f"bench-{user.pk}-").delete()
+        user.delete()
@@ -0,0 +1,127 @@
+"""
+Commande Django : python manage.py bench_async_concurrency
+Compare le nombre de requêtes en vol par worker entre le client France Travail synchrone
+(un worker WSGI à N threads : une requête = un thread bloqué pendant l'appel) et le client
+asynchrone (une seule boucle d'évènements ASGI).
+Un faux serveur France Travail local répond après --latency secondes et mesure le pic
+de requêtes simultanées reçues.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from matching.services.francetravail import FranceTravail
+
+
+class _UpstreamStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def reset(self):
+        with self.lock:
+            self.in_flight = 0
+            self.peak = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class _UpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _make_handler(stats, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _reply(self, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            self._reply({'access_token': 'bench'})
+
+        def do_GET(self):
+            stats.enter()
+            try:
+                time.sleep(latency)
+                self._reply({'resultats': []})
+            finally:
+                stats.leave()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = "Benchmark : requêtes France Travail en vol par worker, client synchrone (threads) vs asynchrone."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Nombre de recherches simulées (défaut: 200).')
+        parser.add_argument('--latency', type=float, default=0.5, help='Latence simulée de l\'API en secondes (défaut: 0.5).')
+        parser.add_argument('--threads', type=int, default=4, help='Threads du worker synchrone (défaut: 4, gthread).')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        latency = options['latency']
+        threads = options['threads']
+
+        stats = _UpstreamStats()
+        server = _UpstreamServer(('127.0.0.1', 0), _make_handler(stats, latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        service = FranceTravail()
+        service.TOKEN_URL = f"{base_url}/token"
+        service.api_url = f"{base_url}/offres"
+
+        self.stdout.write(f"{total} recherches, latence simulée {latency * 1000:.0f} ms")
+
+        # Avant : worker synchrone, une requête occupe un thread pendant tout l'appel
+        stats.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda _: service.search_jobs('python'), range(total)))
+        sync_elapsed = time.perf_counter() - start
+        self._report(f"Synchrone ({threads} threads)", total, sync_elapsed, stats.peak)
+
+        # Après : une seule boucle d'évènements, les requêtes attendent sans thread
+        stats.reset()
+
+        async def run_async():
+            await asyncio.gather(*(service.asearch_jobs('python') for _ in range(total)))
+
+        start = time.perf_counter()
+        asyncio.run(run_async())
+        async_elapsed = time.perf_counter() - start
+        self._report("Asynchrone (1 boucle)", total, async_elapsed, stats.peak)
+
+        server.shutdown()
+
+    def _report(self, label, total, elapsed, peak):
+        self.stdout.write(
+            f"  {label:<24} {elapsed:6.2f} s, {total / elapsed:7.1f} req/s, pic en vol : {peak}"
+        )
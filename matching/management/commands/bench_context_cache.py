@@ -0,0 +1,144 @@
+"""
+Commande Django : python manage.py bench_context_cache
+Compare les tokens de prompt envoyés pour un même CV et N offres (CV Optimizer + lettre), sans puis avec
+le contexte en cache (voir matching/services/context_cache.py), avec le backend local 'stub' : ni clé
+Gemini ni réseau. Vérifie ensuite le cycle de vie du contexte : réutilisation, disparition côté fournisseur
+(expiration), expiration connue en base et changement du texte du CV.
+Un utilisateur temporaire et son CV sont supprimés à la fin.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from matching.models import JobMatch, JobOffer, ResumeContextCache
+from matching.services.ai_letter_generator import AILetterGenerator
+from matching.services.context_cache import get_context_cache_stats
+from matching.services.llm_backends import get_backend
+from resumes.models import Resume
+from resumes.services.ai_optimizer import AIOptimizer
+
+
+SKILLS = ['Python', 'Django', 'PostgreSQL', 'Docker', 'Git', 'Linux', 'AWS', 'React', 'SQL', 'Java']
+
+OFFER_TEXT = """Missions
+Concevoir et maintenir des API REST en {skill}, déployées sur Kubernetes.
+Participer aux revues de code et à l'intégration continue.
+Profil recherché
+Expérience en {skill} et {other} ; connaissance de Terraform et Redis appréciée."""
+
+
+def _long_cv(experiences):
+    """CV de plusieurs pages : au-dessus du minimum de tokens d'un contexte en cache."""
+    lines = ["Développeur backend senior", "Profil",
+             "Développeur backend avec 12 ans d'expérience sur des applications web à fort trafic.",
+             "Expériences"]
+    for i in range(experiences):
+        skill, other = SKILLS[i % len(SKILLS)], SKILLS[(i + 3) % len(SKILLS)]
+        lines.append(f"{2024 - i} - {2025 - i} : Développeur {skill} chez Entreprise {i}")
+        lines.append(f"Conception d'API REST en {skill} et {other}, mise en production, revue de code, "
+                     f"encadrement de deux développeurs, amélioration des temps de réponse de {10 + i} %.")
+    lines += ["Compétences", ', '.join(SKILLS), "Formation", "Master Informatique"]
+    return '\n'.join(lines)
+
+
+class Command(BaseCommand):
+    help = "Tokens de prompt envoyés avec et sans contexte de CV mis en cache (backend LLM local)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=20, help="Nombre d'offres pour le même CV (défaut: 20).")
+        parser.add_argument('--experiences', type=int, default=30,
+                            help="Expériences du CV de test, pour sa longueur (défaut: 30).")
+        parser.add_argument('--latency-ms', type=int, default=50, help='Latence simulée du modèle (défaut: 50).')
+
+    def handle(self, *args, **options):
+        stub = {'latency_ms': options['latency_ms'], 'jitter_ms': 0, 'failure_rate': 0.0,
+                'quota_error_rate': 0.0, 'seed': 0}
+        with override_settings(LLM_BACKEND='stub', LLM_STUB=stub, LLM_CACHE_ENABLED=False,
+                               CV_PRECOMPUTE_ENABLED=False):
+            user, resume = self._create_resume(options['experiences'])
+            try:
+                offers = [
+                    JobOffer(title=f"Développeur {SKILLS[i % len(SKILLS)]}", company_name=f"Société {i}",
+                             description=OFFER_TEXT.format(skill=SKILLS[i % len(SKILLS)],
+                                                           other=SKILLS[(i + 5) % len(SKILLS)]))
+                    for i in range(options['offers'])
+                ]
+                self.stdout.write(
+                    f"CV de {len(resume.extracted_text)} caractères, {len(offers)} offres, "
+                    f"minimum pour le cache : {settings.CONTEXT_CACHE_MIN_TOKENS} tokens"
+                )
+                self.stdout.write(f"{'Mode':<10} {'Appels':>7} {'Tokens prompt':>14} {'Tokens/appel':>13} {'Durée s':>8}")
+                with override_settings(CONTEXT_CACHE_ENABLED=False):
+                    full = self._run('complet', resume, offers)
+                with override_settings(CONTEXT_CACHE_ENABLED=True):
+                    cached = self._run('contexte', resume, offers)
+                    if full['prompt_tokens_full']:
+                        total = cached['prompt_tokens_cached'] + cached['prompt_tokens_full'] + cached['tokens_cached']
+                        self.stdout.write(
+                            f"Avec contexte : {cached['tokens_cached']} tokens mis en cache une fois, "
+                            f"{total / full['prompt_tokens_full']:.0%} des tokens du mode complet "
+                            f"(contextes créés : {cached['created']}, réutilisés : {cached['hits']})"
+                        )
+                    self._lifecycle(resume, offers[0])
+            finally:
+                for entry in ResumeContextCache.objects.filter(resume=resume):
+                    get_backend(entry.backend).delete_cached_context(entry.cache_name)
+                user.delete()
+
+    def _create_resume(self, experiences):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        user = get_user_model().objects.create_user(username=f"bench_ctx_{suffix}", password=None)
+        resume = Resume.objects.create(
+            user=user, title='Bench', file='cvs/bench.pdf', extracted_text=_long_cv(experiences),
+            detected_job_title='Développeur backend',
+        )
+        return user, resume
+
+    def _run(self, label, resume, offers):
+        """Suggestions et lettre pour chaque offre ; retourne l'écart des compteurs de context_cache."""
+        before = get_context_cache_stats()
+        optimizer, generator = AIOptimizer(), AILetterGenerator()
+        start = time.perf_counter()
+        for offer in offers:
+            optimizer.optimize_for_offer(resume.extracted_text, offer.description, offer.title,
+                                         use_cache=False, resume=resume)
+            generator.generate_cover_letter(resume, JobMatch(resume=resume, job_offer=offer))
+        elapsed = time.perf_counter() - start
+        after = get_context_cache_stats()
+        delta = {key: after.get(key, 0) - before.get(key, 0) for key in set(after) | set(before)}
+        calls = delta.get('calls_cached', 0) + delta.get('calls_full', 0)
+        tokens = delta.get('prompt_tokens_cached', 0) + delta.get('prompt_tokens_full', 0)
+        self.stdout.write(f"{label:<10} {calls:>7} {tokens:>14} {tokens / max(calls, 1):>13.0f} {elapsed:>8.2f}")
+        return {key: delta.get(key, 0) for key in (
+            'calls_cached', 'calls_full', 'prompt_tokens_cached', 'prompt_tokens_full',
+            'tokens_cached', 'created', 'hits',
+        )}
+
+    def _lifecycle(self, resume, offer):
+        """Scénarios d'expiration et d'invalidation, un appel CV Optimizer chacun."""
+        optimizer = AIOptimizer()
+
+        def call(label):
+            before = get_context_cache_stats()
+            optimizer.optimize_for_offer(resume.extracted_text, offer.description, offer.title,
+                                         use_cache=False, resume=resume)
+            after = get_context_cache_stats()
+            changes = {key: after[key] - before.get(key, 0) for key in after
+                       if after[key] != before.get(key, 0) and not key.startswith('prompt_tokens')}
+            self.stdout.write(f"  {label:<44} {changes}")
+
+        self.stdout.write("Cycle de vie du contexte :")
+        call("réutilisation")
+        entry = ResumeContextCache.objects.get(resume=resume)
+        get_backend(entry.backend).delete_cached_context(entry.cache_name)
+        call("disparu chez le fournisseur (prompt complet)")
+        call("recréation à l'appel suivant")
+        ResumeContextCache.objects.filter(resume=resume).update(expires_at=timezone.now())
+        call("expiration connue en base")
+        resume.extracted_text += "\nCertifications\nAWS Solutions Architect"
+        resume.save(update_fields=['extracted_text'])
+        call("texte du CV modifié")
@@ -0,0 +1,91 @@
+"""
+Commande Django : python manage.py bench_job_offer_storage
+Mesure l'effet du déplacement du JSON brut des offres vers la table annexe compressée (JobOfferRaw) :
+- taille des tables (PostgreSQL uniquement) ;
+- volume du JSON brut non compressé (avant) vs compressé (après) ;
+- temps de scan de la table JobOffer seule (listes) et avec jointure sur le JSON brut (détail).
+À lancer avant et après la migration 0009 pour comparer les tailles de table sur la même base.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from matching.models import JobOffer, JobOfferRaw
+
+
+class Command(BaseCommand):
+    help = "Benchmark du stockage des offres : tailles de tables, taux de compression du JSON brut et temps de scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Nombre de répétitions de chaque scan (défaut: 5).',
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        offer_count = JobOffer.objects.count()
+        self.stdout.write(f"Offres en base : {offer_count}")
+
+        self._report_table_sizes()
+        self._report_compression()
+
+        self.stdout.write("Temps de scan (médiane sur %d passes) :" % repeat)
+        self._report_scan(
+            "  liste (for_list)",
+            lambda: sum(1 for _ in JobOffer.objects.for_list().iterator(chunk_size=2000)),
+            repeat,
+        )
+        self._report_scan(
+            "  table JobOffer complète",
+            lambda: sum(1 for _ in JobOffer.objects.all().iterator(chunk_size=2000)),
+            repeat,
+        )
+        self._report_scan(
+            "  offre + JSON brut décompressé",
+            lambda: sum(len(o.raw_api_data) for o in JobOffer.objects.with_raw().iterator(chunk_size=2000)),
+            repeat,
+        )
+
+    def _report_table_sizes(self):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING("Tailles de tables : disponibles uniquement sous PostgreSQL."))
+            return
+        with connection.cursor() as cursor:
+            for table in (JobOffer._meta.db_table, JobOfferRaw._meta.db_table):
+                cursor.execute(
+                    "SELECT pg_relation_size(%s), pg_total_relation_size(%s)",
+                    [table, table],
+                )
+                heap, total = cursor.fetchone()
+                self.stdout.write(
+                    f"Table {table} : heap {heap / 1024:.0f} Ko, total (TOAST + index) {total / 1024:.0f} Ko"
+                )
+
+    def _report_compression(self):
+        raw_bytes = 0
+        compressed_bytes = 0
+        for raw in JobOfferRaw.objects.iterator(chunk_size=500):
+            compressed_bytes += len(raw.payload)
+            # Taille du JSON tel qu'il était stocké dans l'ancienne colonne JSONField
+            raw_bytes += len(json.dumps(raw.data, ensure_ascii=False).encode('utf-8'))
+        if not raw_bytes:
+            self.stdout.write("JSON brut : aucune donnée.")
+            return
+        self.stdout.write(
+            f"JSON brut : {raw_bytes / 1024:.0f} Ko non compressé -> {compressed_bytes / 1024:.0f} Ko compressé "
+            f"(ratio {raw_bytes / compressed_bytes:.1f}x)"
+        )
+
+    def _report_scan(self, label, scan, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            scan()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(f"{label} : {timings[len(timings) // 2] * 1000:.1f} ms")
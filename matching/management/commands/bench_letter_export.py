@@ -0,0 +1,145 @@
+"""
+Commande Django : python manage.py bench_letter_export
+Temps de rendu et mémoire par lettre des exports de lettres de motivation (matching/services/letter_render.py),
+PDF contre DOCX, sur les dernières lettres enregistrées (--letters) ou, à défaut, sur des lettres générées
+(courte, normale, longue) :
+- ms par lettre (médiane et p95), sans cache puis depuis le cache des fichiers rendus ;
+- pic de mémoire Python par lettre (tracemalloc, mesuré à part : hors mémoire de libxml2 et de reportlab en C)
+  et taille du fichier produit ;
+- coût d'une copie du modèle DOCX préchargé comparé à une relecture du fichier modèle à chaque lettre.
+"""
+import copy
+import resource
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from docx import Document
+
+from matching.models import JobMatch
+from matching.services import letter_render
+
+
+PARAGRAPH = (
+    "Fort de cinq années d'expérience en développement backend Python, j'ai conçu et maintenu des API REST "
+    "en Django et PostgreSQL servant plusieurs millions de requêtes par jour. Votre offre a retenu toute mon "
+    "attention : la qualité logicielle et l'autonomie des équipes y occupent une place centrale."
+)
+GENERATED = {
+    'courte': 2,
+    'normale': 5,
+    'longue': 14,
+}
+
+
+def _letter(paragraphs):
+    body = "\n\n".join(PARAGRAPH for _ in range(paragraphs))
+    return f"Madame, Monsieur,\n\n{body}\n\nJe vous prie d'agréer mes salutations distinguées.\nJean Dupont"
+
+
+class Command(BaseCommand):
+    help = "Temps de rendu et mémoire par lettre des exports PDF et DOCX des lettres de motivation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--letters', type=int, default=30,
+                            help="Dernières lettres enregistrées utilisées (défaut: 30, 0 pour les lettres générées).")
+        parser.add_argument('--repeat', type=int, default=3, help='Rendus par lettre et par format (défaut: 3).')
+
+    def handle(self, *args, **options):
+        letters = self._letters(options['letters'])
+        self.stdout.write(f"{len(letters)} lettres, {options['repeat']} rendus par lettre et par format")
+
+        self.stdout.write(
+            f"{'Format':<7} {'ms méd.':>8} {'ms p95':>8} {'cache ms':>9} {'Mo pic':>7} {'Ko fichier':>11} "
+            f"{'Δ RSS Mo':>9}"
+        )
+        for fmt in (letter_render.FORMAT_PDF, letter_render.FORMAT_DOCX):
+            rss_before = self._max_rss_mb()
+            durations, sizes = [], []
+            for letter in letters:
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    data = letter_render.build(fmt, **letter)
+                    durations.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(data) / 1024)
+            rss_growth = self._max_rss_mb() - rss_before
+
+            cached = []
+            for letter in letters:
+                key = letter_render.letter_key(fmt=fmt, **letter)
+                letter_render.store(key, letter_render.build(fmt, **letter))
+                start = time.perf_counter()
+                key = letter_render.letter_key(fmt=fmt, **letter)
+                letter_render.cached(key)
+                cached.append((time.perf_counter() - start) * 1000)
+
+            # Pic de mémoire mesuré à part : tracemalloc ralentit le rendu
+            peaks = []
+            for letter in letters:
+                tracemalloc.start()
+                letter_render.build(fmt, **letter)
+                peaks.append(tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+                tracemalloc.stop()
+
+            self.stdout.write(
+                f"{fmt:<7} {statistics.median(durations):>8.2f} {self._p95(durations):>8.2f} "
+                f"{statistics.median(cached):>9.3f} {statistics.median(peaks):>7.2f} "
+                f"{statistics.median(sizes):>11.1f} {rss_growth:>9.1f}"
+            )
+
+        self._template_cost(options['repeat'] * 10)
+
+    def _letters(self, limit):
+        letters = []
+        if limit:
+            matches = (
+                JobMatch.objects.exclude(cover_letter_content='').select_related('job_offer', 'user')
+                .order_by('-matched_at')[:limit]
+            )
+            for match in matches:
+                user = match.user
+                letters.append({
+                    'cover_letter_content': match.cover_letter_content,
+                    'user_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+                    'user_email': user.email or None,
+                    'job_title': match.job_offer.title if match.job_offer else None,
+                    'company_name': match.job_offer.company_name if match.job_offer else None,
+                })
+        if not letters:
+            self.stdout.write(f"Lettres générées : {', '.join(GENERATED)}")
+            letters = [
+                {'cover_letter_content': _letter(paragraphs), 'user_name': 'Jean Dupont',
+                 'job_title': f"Développeur backend Python ({name})", 'company_name': 'Doctolib'}
+                for name, paragraphs in GENERATED.items()
+            ]
+        return letters
+
+    def _template_cost(self, repeat):
+        """Copie du modèle DOCX préchargé (chemin de production) contre relecture du fichier modèle."""
+        buffer = BytesIO()
+        letter_render.DOCX_TEMPLATE.save(buffer)
+        source = buffer.getvalue()
+        copies, reads = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            copy.deepcopy(letter_render.DOCX_TEMPLATE)
+            copies.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            Document(BytesIO(source))
+            reads.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"Modèle DOCX ({len(source) / 1024:.0f} Ko) : copie en mémoire {statistics.median(copies):.2f} ms, "
+            f"relecture du fichier {statistics.median(reads):.2f} ms (médianes)"
+        )
+
+    @staticmethod
+    def _p95(values):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    @staticmethod
+    def _max_rss_mb():
+        # ru_maxrss en Ko sous Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,181 @@
+"""
+Commande Django : python manage.py bench_pdf_extraction
+Compare les moteurs d'extraction du texte des CV (voir resumes/services/pdf_parser.py) : durée et qualité
+(part des mots et des lignes du texte attendu retrouvées) sur un corpus de CV PDF générés avec reportlab,
+représentatif des cas difficiles : une colonne, deux colonnes, CV long, accents et puces, caractères placés
+un à un, PDF sans texte (scanné). Les lignes 'auto:<moteur>' sont le chemin de production avec ce moteur rapide
+(relecture avec pdfplumber si le texte semble cassé) ; la colonne Diagnostic sert à régler les seuils de
+broken_text_reason : aucun texte correct ne doit y figurer.
+Avec --corpus, les PDF d'un dossier sont ajoutés ; leur texte attendu est celui de pdfplumber.
+"""
+import os
+import re
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from resumes.services import pdf_parser
+
+
+EXPERIENCES = [
+    ("2021 - 2024 : Développeur backend Python chez Doctolib",
+     "• Conception d'API REST en Django et PostgreSQL, 2 millions de requêtes par jour"),
+    ("2018 - 2021 : Ingénieur logiciel chez Société Générale",
+     "• Migration d'une application Java vers des microservices Docker et Kubernetes"),
+    ("2016 - 2018 : Développeur full stack chez Leboncoin",
+     "• Refonte du moteur de recherche, réduction des temps de réponse de 35 %"),
+    ("2014 - 2016 : Stagiaire puis développeur chez Capgemini",
+     "• Automatisation des tests d'intégration, encadrement de deux stagiaires"),
+]
+SIDEBAR = ["Compétences", "Python", "Django", "PostgreSQL", "Docker", "Kubernetes", "Git", "Langues",
+           "Français : natif", "Anglais : courant", "Contact", "jean.dupont@mail.fr", "06 12 34 56 78"]
+HEADER = ["Jean Dupont", "Développeur backend senior", "Paris, France - Permis B"]
+
+
+def _write_lines(c, lines, x=50, top=800, step=16):
+    """Une chaîne par ligne, nouvelle page si besoin ; retourne les lignes écrites."""
+    y = top
+    for line in lines:
+        if y < 60:
+            c.showPage()
+            y = top
+        c.drawString(x, y, line)
+        y -= step
+    return lines
+
+
+def _single_column(c, pages=1):
+    lines = list(HEADER) + ["Expériences professionnelles"]
+    for i in range(pages * 12):
+        title, detail = EXPERIENCES[i % len(EXPERIENCES)]
+        lines += [title, detail]
+    lines += ["Formation", "Master Informatique, Université Paris-Saclay"]
+    return _write_lines(c, lines)
+
+
+def _two_columns(c):
+    """Barre latérale et colonne principale écrites ligne à ligne aux mêmes hauteurs."""
+    main = list(HEADER) + ["Expériences professionnelles"]
+    for title, detail in EXPERIENCES * 2:
+        main += [title[:48], detail[:48]]
+    y = 800
+    for i in range(max(len(main), len(SIDEBAR))):
+        if i < len(SIDEBAR):
+            c.drawString(40, y, SIDEBAR[i])
+        if i < len(main):
+            c.drawString(200, y, main[i])
+        y -= 16
+    return SIDEBAR + main
+
+
+def _char_by_char(c):
+    """Chaque caractère dessiné séparément, sans caractère d'espace (certains exports graphiques)."""
+    lines = list(HEADER) + [title for title, _ in EXPERIENCES] + ["Compétences : Python Django PostgreSQL"]
+    c.setFont('Helvetica', 11)
+    y = 800
+    for line in lines:
+        x = 50
+        for char in line:
+            if char != ' ':
+                c.drawString(x, y, char)
+            x += c.stringWidth(char, 'Helvetica', 11)
+        y -= 16
+    return lines
+
+
+def _scanned(c):
+    """Aucun texte : des rectangles à la place des lignes."""
+    for i in range(30):
+        c.rect(50, 800 - i * 16, 300 + (i * 37) % 200, 8, fill=1)
+    return []
+
+
+CORPUS = {
+    'une_colonne': lambda c: _single_column(c),
+    'deux_colonnes': _two_columns,
+    'long_8_pages': lambda c: _single_column(c, pages=8),
+    'caracteres_un_a_un': _char_by_char,
+    'scanne': _scanned,
+}
+
+
+def _words(text):
+    return Counter(re.findall(r"\w+", text.lower()))
+
+
+def quality(expected_lines, text):
+    """(part des mots attendus retrouvés, part des lignes attendues retrouvées intactes)."""
+    expected = _words("\n".join(expected_lines))
+    if not expected:
+        return None, None
+    found = _words(text)
+    word_recall = sum(min(count, found[word]) for word, count in expected.items()) / sum(expected.values())
+    normalized = re.sub(r"\s+", " ", text)
+    line_recall = sum(1 for line in expected_lines if line in normalized) / len(expected_lines)
+    return word_recall, line_recall
+
+
+class Command(BaseCommand):
+    help = "Durée et qualité de l'extraction du texte des CV PDF selon le moteur."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Extractions par PDF et par moteur (défaut: 5).')
+        parser.add_argument('--corpus', help="Dossier de PDF à ajouter au corpus généré.")
+
+    def handle(self, *args, **options):
+        engines = [name for name in pdf_parser.ENGINES
+                   if name != pdf_parser.ENGINE_PDFIUM or pdf_parser.pypdfium2 is not None]
+        autos = [f"auto:{engine}" for engine in engines if engine != pdf_parser.ENGINE_PDFPLUMBER]
+        self.stdout.write(f"Moteurs : {', '.join(engines)} ; moteur par défaut : {pdf_parser.default_engine()}")
+        with tempfile.TemporaryDirectory() as tmp:
+            documents = []
+            for name, build in CORPUS.items():
+                path = os.path.join(tmp, f"{name}.pdf")
+                c = canvas.Canvas(path, pagesize=A4)
+                expected = build(c)
+                c.save()
+                documents.append((name, path, expected))
+            if options['corpus']:
+                for filename in sorted(os.listdir(options['corpus'])):
+                    if filename.lower().endswith('.pdf'):
+                        path = os.path.join(options['corpus'], filename)
+                        reference = "".join(t for t, _, _ in pdf_parser._timed_pages('pdfplumber', path, 0, None))
+                        documents.append((filename[:-4], path, [l for l in reference.splitlines() if l.strip()]))
+
+            self.stdout.write(
+                f"{'PDF':<22} {'Moteur':<14} {'ms':>8} {'Mots':>6} {'Lignes':>7} {'Diagnostic':<22} {'Relu par':<10}"
+            )
+            totals = {engine: [] for engine in engines + autos}
+            for name, path, expected in documents:
+                for engine in engines + autos:
+                    auto = engine in autos
+                    durations = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        if auto:
+                            pages = pdf_parser._extract_pages(path, 0, None, engine=engine.split(':', 1)[1])
+                        else:
+                            pages = pdf_parser._timed_pages(engine, path, 0, None)
+                        durations.append((time.perf_counter() - start) * 1000)
+                    texts = [text for text, _, _ in pages]
+                    words, lines = quality(expected, "\n".join(texts))
+                    duration = statistics.median(durations)
+                    totals[engine].append(duration)
+                    problem = pdf_parser.broken_text_reason(texts) if not auto else ''
+                    used = ', '.join(sorted({used for _, _, used in pages})) if auto else ''
+                    self.stdout.write(
+                        f"{name:<22} {engine:<14} {duration:>8.1f} {self._pct(words):>6} {self._pct(lines):>7} "
+                        f"{problem or '':<22} {used:<10}"
+                    )
+            self.stdout.write("Durée totale (médiane par PDF) :")
+            for engine, durations in totals.items():
+                self.stdout.write(f"  {engine:<14} {sum(durations):>8.1f} ms")
+
+    @staticmethod
+    def _pct(value):
+        return '-' if value is None else f"{value:.0%}"
@@ -0,0 +1,80 @@
+"""
+Commande Django : python manage.py bench_prompt_compaction
+Mesure, sur les couples CV / offre de la base (JobMatch), l'effet de la compaction des prompts
+pour chaque point d'appel : tokens avant / après, durée de compaction, et part du vocabulaire commun
+CV ∩ offre conservée, comparée à l'ancienne coupe aveugle à N caractères. N'appelle pas Gemini.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from matching.models import JobMatch
+from matching.services import prompt_compactor
+from matching.services.prompt_compactor import compact_cv, compact_offer, estimate_tokens
+
+
+# Ancienne coupe à N caractères par point d'appel (None : texte complet)
+LEGACY_CUTS = {
+    'cover_letter': None,
+    'cv_optimizer': 6000,
+    'cv_parser': 4000,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark de la compaction des prompts (tokens, durée, vocabulaire commun conservé)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200, help='Nombre de couples CV / offre (défaut: 200).')
+
+    def handle(self, *args, **options):
+        pairs = list(
+            JobMatch.objects.filter(resume__isnull=False)
+            .exclude(resume__extracted_text='')
+            .select_related('resume', 'job_offer')
+            .order_by('-matched_at')[:options['limit']]
+        )
+        pairs = [(m.resume.extracted_text or '', m.job_offer.description or '') for m in pairs]
+        if not pairs:
+            self.stdout.write(self.style.WARNING("Aucun couple CV / offre en base."))
+            return
+        self.stdout.write(f"{len(pairs)} couples CV / offre")
+        self.stdout.write(
+            f"{'Point d appel':<14} {'Tokens avant':>12} {'Coupe':>8} {'Compacté':>9} {'ms/appel':>9} "
+            f"{'Vocab. coupe':>13} {'Vocab. compacté':>16}"
+        )
+
+        for call_site, cut in LEGACY_CUTS.items():
+            before = legacy = after = 0
+            elapsed = 0.0
+            legacy_recall = compact_recall = 0.0
+            for cv_text, offer_text in pairs:
+                with_offer = call_site != 'cv_parser'
+                raw = cv_text + (offer_text if with_offer else '')
+                legacy_cv = cv_text[:cut] if cut else cv_text
+                legacy_offer = (offer_text[:cut] if cut else offer_text) if with_offer else ''
+
+                start = time.perf_counter()
+                if with_offer:
+                    compact_cv_text = compact_cv(cv_text, call_site, offer_text=offer_text)
+                    compact_offer_text = compact_offer(offer_text, call_site, cv_text=cv_text)
+                else:
+                    compact_cv_text = compact_cv(cv_text, call_site)
+                    compact_offer_text = ''
+                elapsed += time.perf_counter() - start
+
+                before += estimate_tokens(raw)
+                legacy += estimate_tokens(legacy_cv + legacy_offer)
+                after += estimate_tokens(compact_cv_text + compact_offer_text)
+
+                # Vocabulaire commun au CV et à l'offre encore présent dans le texte du CV envoyé
+                shared = prompt_compactor._words(cv_text) & prompt_compactor._words(offer_text)
+                if shared:
+                    legacy_recall += len(prompt_compactor._words(legacy_cv) & shared) / len(shared)
+                    compact_recall += len(prompt_compactor._words(compact_cv_text) & shared) / len(shared)
+
+            n = len(pairs)
+            self.stdout.write(
+                f"{call_site:<14} {before // n:>12} {legacy // n:>8} {after // n:>9} {elapsed * 1000 / n:>9.2f} "
+                f"{legacy_recall / n:>13.0%} {compact_recall / n:>16.0%}"
+            )
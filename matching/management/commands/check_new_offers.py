@@ -13,6 +13,8 @@ from django.urls import reverse
 
 from matching.models import JobAlert
 from matching.services.francetravail import FranceTravail
+from matching.services.precompute import schedule_cv_precompute
+from resumes.services.sectionizer import structure_for
 
 
 logger = logging.getLogger(__name__)
@@ -109,10 +111,11 @@ class Command(BaseCommand):
 
         # Filtrer par score (matching simplifié par mots-clés)
         resume_text = (resume.extracted_text or "").strip()
+        resume_words = set(structure_for(resume)['words'])
         new_offers_data = []
         for r in results:
             desc = (r.get('description') or "")
-            score = ft.calculate_match_score(resume_text, desc)
+            score = ft.calculate_match_score(resume_text, desc, resume_words=resume_words)
             if score >= min_score:
                 new_offers_data.append(r)
 
@@ -132,6 +135,7 @@ class Command(BaseCommand):
 
             alert.last_checked = timezone.now()
             alert.save(update_fields=['last_checked'])
+            schedule_cv_precompute(user, saved_matches)
 
             # Envoyer l'email récapitulatif uniquement si ce n'est pas la première exécution (éviter spam)
             if not first_run and user.email:
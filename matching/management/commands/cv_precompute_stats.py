@@ -0,0 +1,43 @@
+"""
+Commande Django : python manage.py cv_precompute_stats
+Mesure le pré-calcul des suggestions CV par plan : suggestions calculées à l'avance,
+consultées, et jamais consultées (travail perdu), ainsi que les tâches encore en file.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from matching.models import BackgroundTask
+from matching.services.precompute import PRECOMPUTE_TASK, precompute_stats
+
+
+class Command(BaseCommand):
+    help = "Statistiques du pré-calcul des suggestions CV (consultées / perdues, par plan)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Période analysée en jours (défaut: 7).')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        budgets = getattr(settings, 'CV_PRECOMPUTE_BUDGETS', {})
+        rows = precompute_stats(since)
+
+        self.stdout.write(f"Pré-calculs des {options['days']} derniers jours")
+        if not rows:
+            self.stdout.write("Aucun pré-calcul.")
+        else:
+            self.stdout.write(f"{'Plan':<10} {'Budget/24h':>10} {'Calculés':>9} {'Consultés':>10} {'Perdus':>8} {'Perte':>7}")
+            for row in rows:
+                waste = row['unused'] / row['total'] if row['total'] else 0.0
+                self.stdout.write(
+                    f"{row['plan']:<10} {budgets.get(row['plan'], 0):>10} {row['total']:>9} "
+                    f"{row['used']:>10} {row['unused']:>8} {waste:>6.0%}"
+                )
+
+        queued = BackgroundTask.objects.filter(kind=PRECOMPUTE_TASK, status=BackgroundTask.STATUS_PENDING).count()
+        failed = BackgroundTask.objects.filter(
+            kind=PRECOMPUTE_TASK, status=BackgroundTask.STATUS_FAILED, created_at__gte=since
+        ).count()
+        self.stdout.write(f"En file : {queued} — échecs sur la période : {failed}")
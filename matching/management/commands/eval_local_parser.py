@@ -0,0 +1,166 @@
+"""
+Commande Django : python manage.py eval_local_parser
+Évalue l'extracteur local du poste et des compétences (resumes/services/local_parser.py) :
+- en production : part des analyses de CV faites localement, donc d'appels Gemini évités
+  (Resume.parsed_data['analysis']) ;
+- sur un échantillon étiqueté : pour plusieurs seuils de confiance, part des CV analysés localement et accord
+  de ces analyses avec l'étiquette (intitulé équivalent, précision et rappel des compétences).
+L'échantillon est fait des CV analysés par Gemini (--limit derniers) et/ou d'un fichier JSONL (--labels,
+une ligne {"text": ..., "job_title": ..., "skills": [...]} par CV) ; à défaut, de quelques CV d'exemple.
+"""
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.fields.json import KT
+
+from resumes.models import Resume
+from resumes.services import local_parser
+from resumes.services.sectionizer import structure_for
+
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.9)
+
+EXAMPLES = [
+    {
+        'text': "Jean Dupont\nDéveloppeur backend Python\nParis - jean.dupont@mail.fr\nExpériences professionnelles\n"
+                "2021 - 2024 : Développeur chez Doctolib\nAPI REST en Django et PostgreSQL, Docker\n"
+                "Compétences\nPython, Django, PostgreSQL, Docker, Git",
+        'job_title': "Développeur backend Python",
+        'skills': ["Python", "Django", "PostgreSQL", "Docker", "Git", "REST"],
+    },
+    {
+        'text': "Marie Curie\nÀ la recherche d'un stage Data Engineer\nFormation\nMaster Data Science\n"
+                "Compétences\nPython, Spark, Airflow, SQL, AWS",
+        'job_title': "Stage Data Engineer",
+        'skills': ["Python", "Spark", "Airflow", "SQL", "AWS"],
+    },
+    {
+        'text': "Alternance Développeur Java\nLucas Bernard\nCompétences\nJava, Spring Boot, Angular, MySQL\n"
+                "Expérience\n2023 : Stage chez Sopra Steria",
+        'job_title': "Alternance Développeur Java",
+        'skills': ["Java", "Spring Boot", "Angular", "MySQL"],
+    },
+    {
+        'text': "Paul Martin\nBoulanger\nExpérience\n2019 - 2024 : Boulangerie Dupain, Lyon\n"
+                "Fabrication du pain et des viennoiseries",
+        'job_title': "Boulanger",
+        'skills': [],
+    },
+    {
+        'text': "Sophie Leroy\nProfil\nPassionnée par l'analyse de données et la visualisation.\n"
+                "Expérience\n2022 - 2024 : Analyste chez BNP Paribas\nCompétences\nExcel, Power BI, SQL",
+        'job_title': "Data Analyst",
+        'skills': ["Excel", "Power BI", "SQL"],
+    },
+]
+
+
+def same_title(local, expected):
+    """Intitulés équivalents : mêmes mots (l'un contenant l'autre) ou au moins la moitié en commun."""
+    if not local or not expected:
+        return not local and not expected
+    a, b = set(local_parser.tokens(local)), set(local_parser.tokens(expected))
+    return a <= b or b <= a or len(a & b) / len(a | b) >= 0.5
+
+
+def _skill_set(skills):
+    return {local_parser.canonical_skill(skill).lower() for skill in skills or []}
+
+
+class Command(BaseCommand):
+    help = "Taux d'appels Gemini évités par l'extracteur local de CV et accord avec les analyses Gemini."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500,
+                            help="CV analysés par Gemini pris dans l'échantillon (défaut: 500, 0 pour aucun).")
+        parser.add_argument('--labels', help="Fichier JSONL d'étiquettes {text, job_title, skills}.")
+
+    def handle(self, *args, **options):
+        self._production()
+
+        sample = self._sample(options)
+        if not sample:
+            self.stdout.write("Aucun CV étiqueté : échantillon d'exemple.")
+            sample = [dict(example, structure=None) for example in EXAMPLES]
+
+        results, durations = [], []
+        for item in sample:
+            start = time.perf_counter()
+            results.append(local_parser.extract(item['text'], item['structure']))
+            durations.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"Échantillon : {len(sample)} CV, extraction locale {statistics.median(durations):.2f} ms "
+            f"(médiane), {max(durations):.2f} ms (max)"
+        )
+
+        configured = local_parser.min_confidence()
+        self.stdout.write(f"{'Seuil':>6} {'Évités':>8} {'Intitulé OK':>12} {'Précision':>10} {'Rappel':>8}")
+        for threshold in sorted(set(THRESHOLDS) | ({configured} if configured is not None else set())):
+            avoided = [(item, result) for item, result in zip(sample, results)
+                       if local_parser.is_confident(result, threshold)]
+            marker = ' <- LOCAL_PARSER_MIN_CONFIDENCE' if threshold == configured else ''
+            self.stdout.write(f"{threshold:>6.2f} {self._pct(len(avoided), len(sample)):>8} "
+                              f"{self._agreement(avoided)}{marker}")
+        self.stdout.write(f"{'tous':>6} {'':>8} {self._agreement(list(zip(sample, results)))}")
+
+    def _production(self):
+        """Sources des analyses enregistrées (CV analysés depuis l'ajout de l'extracteur local)."""
+        counts = {
+            row['source']: row['n'] for row in
+            Resume.objects.filter(parsed_data__analysis__source__isnull=False)
+            .values(source=KT('parsed_data__analysis__source')).annotate(n=Count('id'))
+        }
+        total = sum(counts.values())
+        if not total:
+            self.stdout.write("Production : aucune analyse de CV enregistrée avec sa source.")
+            return
+        local = counts.get(local_parser.ANALYSIS_LOCAL, 0)
+        self.stdout.write(
+            f"Production : {total} analyses, {local} locales ({self._pct(local, total)} d'appels Gemini évités), "
+            f"{counts.get(local_parser.ANALYSIS_GEMINI, 0)} Gemini, "
+            f"{counts.get(local_parser.ANALYSIS_CACHE, 0)} depuis le cache"
+        )
+
+    def _sample(self, options):
+        sample = []
+        if options['limit']:
+            resumes = (
+                Resume.objects.filter(processing_status=Resume.STATUS_READY)
+                .exclude(extracted_text='').exclude(detected_job_title__isnull=True).exclude(detected_job_title='')
+                .exclude(parsed_data__analysis__source=local_parser.ANALYSIS_LOCAL)
+                .order_by('-uploaded_at')[:options['limit']]
+            )
+            sample += [
+                {'text': resume.extracted_text, 'job_title': resume.detected_job_title,
+                 'skills': resume.detected_skills, 'structure': structure_for(resume)}
+                for resume in resumes
+            ]
+        if options['labels']:
+            with open(options['labels'], encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        label = json.loads(line)
+                        sample.append({'text': label['text'], 'job_title': label.get('job_title'),
+                                       'skills': label.get('skills', []), 'structure': None})
+        return sample
+
+    def _agreement(self, pairs):
+        if not pairs:
+            return f"{'-':>12} {'-':>10} {'-':>8}"
+        titles = sum(1 for item, result in pairs if same_title(result['job_title'], item['job_title']))
+        found = expected = common = 0
+        for item, result in pairs:
+            local, labeled = _skill_set(result['skills']), _skill_set(item['skills'])
+            found += len(local)
+            expected += len(labeled)
+            common += len(local & labeled)
+        return (f"{self._pct(titles, len(pairs)):>12} {self._pct(common, found):>10} "
+                f"{self._pct(common, expected):>8}")
+
+    @staticmethod
+    def _pct(part, total):
+        return '-' if not total else f"{part / total:.0%}"
+
@@ -0,0 +1,325 @@
+"""
+Commande Django : python manage.py import_resumes <dossier|archive.zip> --user-map utilisateurs.csv
+Import en masse de CV PDF (école, partenaire) sans passer par upload_resume, CV par CV :
+- extraction du texte dans un pool de processus dédié (--workers, budgets de pdf_parser) ;
+- analyse par l'extracteur local (local_parser) quand il est assez sûr de lui, sinon analyse IA (AIParser)
+  dans une file bornée de --ai-concurrency appels simultanés, file 'background' du répartiteur Gemini, avec
+  --retries réessais ; les textes déjà analysés sont servis par le cache ;
+- écriture des CV par lots (bulk_create) et des fichiers en stockage adressé par contenu ; un PDF déjà connu
+  (même empreinte) reprend le texte et l'analyse existants.
+Aucun crédit n'est consommé (import d'administration).
+
+Le fichier --user-map est un CSV avec les colonnes file (chemin relatif ou nom du PDF), user (identifiant ou
+email) et, facultative, title. Un manifeste JSON (--manifest, par défaut <source>.import.json) enregistre
+l'état de chaque fichier : relancer la commande reprend là où elle s'est arrêtée et retente les échecs.
+"""
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from matching.services.gemini_dispatcher import LANE_BACKGROUND, call_context
+from resumes.models import Resume, resume_upload_path
+from resumes.services import local_parser, pdf_parser
+from resumes.services.ai_parser import AIParser
+from resumes.services.sectionizer import structure_cv
+from resumes.services.uploads import store_blob
+
+
+class Command(BaseCommand):
+    help = "Importe en masse des CV PDF (dossier ou archive ZIP) : extraction en parallèle et analyse IA en file bornée."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Dossier ou archive ZIP contenant les PDF.")
+        parser.add_argument('--user-map', help="CSV file,user[,title] : propriétaire de chaque PDF.")
+        parser.add_argument('--user', help="Propriétaire par défaut des PDF absents de --user-map.")
+        parser.add_argument('--manifest', help="Manifeste de reprise (défaut: <source>.import.json).")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processus d'extraction (défaut: PDF_EXTRACTION_WORKERS).")
+        parser.add_argument('--ai-concurrency', type=int, default=4,
+                            help="Analyses IA simultanées (défaut: 4).")
+        parser.add_argument('--retries', type=int, default=2,
+                            help="Réessais par fichier en cas d'échec (défaut: 2).")
+        parser.add_argument('--batch-size', type=int, default=50, help="CV écrits par lot (défaut: 50).")
+        parser.add_argument('--no-ai', action='store_true', help="Extraire le texte sans analyse IA.")
+
+    def handle(self, *args, **options):
+        source = options['source'].rstrip('/')
+        if not os.path.exists(source):
+            raise CommandError(f"Source introuvable : {source}")
+        if not options['user_map'] and not options['user']:
+            raise CommandError("Indiquer --user-map et/ou --user.")
+        self.options = options
+        self.manifest_path = options['manifest'] or f"{source}.import.json"
+        self.manifest = self._load_manifest()
+        self.lock = threading.Lock()
+        self.stats = {'extracted': 0, 'reused': 0, 'ai_calls': 0, 'ai_cached': 0, 'local': 0, 'written': 0, 'failed': 0}
+
+        with _opened_source(source) as (root, names):
+            owners = self._owners(names)
+            todo = [name for name in names
+                    if self.manifest['files'].get(name, {}).get('status') != 'done']
+            self.stdout.write(f"{len(names)} PDF, {len(names) - len(todo)} déjà importés, {len(todo)} à traiter")
+            start = time.perf_counter()
+            for attempt in range(options['retries'] + 1):
+                if not todo:
+                    break
+                if attempt:
+                    self.stdout.write(f"Nouvel essai ({attempt}/{options['retries']}) pour {len(todo)} fichier(s)")
+                todo = self._run_pass(root, todo, owners)
+            elapsed = time.perf_counter() - start
+
+        self._save_manifest()
+        failed = [name for name, entry in self.manifest['files'].items() if entry.get('status') == 'failed']
+        stats = self.stats
+        self.stdout.write(
+            f"{stats['written']} CV importés en {elapsed:.1f} s ({stats['written'] / max(elapsed, 1e-6):.1f} CV/s) : "
+            f"{stats['extracted']} extraits, {stats['reused']} déjà connus, "
+            f"{stats['ai_calls']} analyses IA ({stats['ai_cached']} depuis le cache), {stats['local']} locales"
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{len(failed)} échec(s), voir {self.manifest_path} :"))
+            for name in failed[:20]:
+                self.stdout.write(f"  {name} : {self.manifest['files'][name].get('error')}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Import terminé sans échec."))
+
+    # --- Une passe : empreintes, extraction, analyse, écriture ---
+
+    def _run_pass(self, root, names, owners):
+        """Traite les fichiers ; retourne ceux à retenter (échecs d'extraction ou d'analyse)."""
+        retry = []
+        by_hash = {}
+        for name in names:
+            if owners.get(name) is None:
+                self._fail(name, "Aucun utilisateur associé (--user-map / --user)")
+                continue
+            by_hash.setdefault(_sha256(os.path.join(root, name)), []).append(name)
+
+        known = {}
+        for resume in (Resume.objects.filter(content_hash__in=list(by_hash), processing_status=Resume.STATUS_READY)
+                       .exclude(extracted_text='').order_by('uploaded_at')):
+            known[resume.content_hash] = resume
+
+        pending = []
+        ai_futures = []
+        slots = threading.BoundedSemaphore(self.options['ai_concurrency'] * 2)
+        executor = ThreadPoolExecutor(max_workers=self.options['ai_concurrency'], thread_name_prefix='import-ai')
+
+        def submit(digest, text, parsed_data, analysis, structured_data):
+            slots.acquire()
+            future = executor.submit(self._analyze, text, analysis, structured_data, owners[by_hash[digest][0]][0])
+            future.add_done_callback(lambda _: slots.release())
+            ai_futures.append((future, digest, text, parsed_data, structured_data))
+
+        def collect(block=False):
+            done, _ = wait([f for f, *_ in ai_futures], timeout=None if block else 0)
+            for item in [item for item in ai_futures if item[0] in done]:
+                ai_futures.remove(item)
+                future, digest, text, parsed_data, structured_data = item
+                try:
+                    analysis, info = future.result()
+                except Exception as e:
+                    for name in by_hash[digest]:
+                        self._fail(name, f"Analyse IA : {e}")
+                        retry.append(name)
+                    continue
+                if info is not None:
+                    parsed_data = {**parsed_data, 'analysis': info}
+                pending.extend((name, digest, text, parsed_data, structured_data, analysis)
+                               for name in by_hash[digest])
+            if len(pending) >= self.options['batch_size'] or (block and pending):
+                self._write(root, pending, owners)
+                pending.clear()
+
+        try:
+            for digest, resume in known.items():
+                self.stats['reused'] += len(by_hash[digest])
+                analysis = ({'job_title': resume.detected_job_title, 'skills': resume.detected_skills}
+                            if resume.detected_job_title or resume.detected_skills else None)
+                submit(digest, resume.extracted_text, {**resume.parsed_data, 'reused_from': resume.pk}, analysis,
+                       resume.structured_data or structure_cv(resume.extracted_text))
+
+            to_extract = {os.path.join(root, by_hash[digest][0]): digest for digest in by_hash if digest not in known}
+            extraction_start = time.perf_counter()
+            for path, pages, error in pdf_parser.extract_documents(list(to_extract), workers=self.options['workers']):
+                digest = to_extract[path]
+                text = "".join(text + "\n" for text, _, _ in pages or [] if text)
+                if error is not None or not text.strip():
+                    reason = f"Extraction : {error}" if error is not None else "Aucun texte extrait du PDF"
+                    for name in by_hash[digest]:
+                        self._fail(name, reason)
+                        # Seuls les budgets dépassés (charge, processus tué) valent un nouvel essai
+                        if isinstance(error, pdf_parser.ExtractionBudgetExceeded):
+                            retry.append(name)
+                    continue
+                self.stats['extracted'] += 1
+                structured_data = structure_cv(text)
+                parsed_data = {
+                    'email': structured_data['contact']['email'],
+                    'phone': structured_data['contact']['phone'],
+                    'extraction': {
+                        'pages': len(pages),
+                        'total_ms': round(sum(ms for _, ms, _ in pages), 1),
+                        'engines': dict(Counter(engine for _, _, engine in pages)),
+                    },
+                }
+                submit(digest, text, parsed_data, None, structured_data)
+                collect()
+            if to_extract:
+                elapsed = time.perf_counter() - extraction_start
+                self.stdout.write(f"Extraction : {len(to_extract)} PDF en {elapsed:.1f} s "
+                                  f"({len(to_extract) / max(elapsed, 1e-6):.1f} PDF/s)")
+            collect(block=True)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._save_manifest()
+        return retry
+
+    def _analyze(self, text, analysis, structured_data, user):
+        """
+        Analyse du texte (thread de la file bornée) ; analysis : résultat déjà connu à reprendre.
+        Retourne (résultat, entrée parsed_data['analysis'] ou None si rien n'a été analysé).
+        """
+        try:
+            if analysis is not None or self.options['no_ai']:
+                return analysis or {'job_title': None, 'skills': []}, None
+            local = local_parser.extract(text, structured_data)
+            if local_parser.is_confident(local):
+                with self.lock:
+                    self.stats['local'] += 1
+                return local, local_parser.analysis_info(local_parser.ANALYSIS_LOCAL, local['confidence'])
+            cached = AIParser.cached_result(text)
+            if cached is not None:
+                with self.lock:
+                    self.stats['ai_cached'] += 1
+                return cached, local_parser.analysis_info(local_parser.ANALYSIS_CACHE, local['confidence'])
+            for attempt in range(self.options['retries'] + 1):
+                try:
+                    with call_context(user=user, lane=LANE_BACKGROUND):
+                        result = AIParser().extract_job_info(
+                            text, use_cache=False, sections=structured_data['sections'],
+                        )
+                    with self.lock:
+                        self.stats['ai_calls'] += 1
+                    return result, local_parser.analysis_info(local_parser.ANALYSIS_GEMINI, local['confidence'])
+                except Exception:
+                    if attempt == self.options['retries']:
+                        raise
+                    time.sleep(2 ** attempt)
+        finally:
+            # Connexion base ouverte par ce thread (cache LLM)
+            connections.close_all()
+
+    def _write(self, root, records, owners):
+        """Fichiers (adressés par contenu) puis CV en un bulk_create ; met à jour le manifeste."""
+        resumes = []
+        for name, digest, text, parsed_data, structured_data, analysis in records:
+            resume = Resume(
+                user=owners[name][0],
+                title=owners[name][1] or os.path.splitext(os.path.basename(name))[0][:100],
+                content_hash=digest,
+                extracted_text=text,
+                parsed_data=parsed_data,
+                structured_data=structured_data,
+                detected_job_title=analysis.get('job_title'),
+                detected_skills=analysis.get('skills', []),
+                processing_status=Resume.STATUS_READY,
+            )
+            path = resume_upload_path(resume, name)
+            with open(os.path.join(root, name), 'rb') as f:
+                store_blob(default_storage, path, File(f))
+            resume.file = path
+            resumes.append(resume)
+        Resume.objects.bulk_create(resumes)
+        for (name, *_), resume in zip(records, resumes):
+            self.manifest['files'][name] = {'status': 'done', 'resume_id': resume.pk}
+        self.stats['written'] += len(resumes)
+        self._save_manifest()
+        self.stdout.write(f"  {self.stats['written']} CV écrits")
+
+    # --- Utilisateurs et manifeste ---
+
+    def _owners(self, names):
+        """{nom du fichier: (utilisateur, titre)} d'après --user-map et --user ; None si inconnu."""
+        rows = {}
+        if self.options['user_map']:
+            with open(self.options['user_map'], newline='', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    if row.get('file') and row.get('user'):
+                        rows[row['file'].strip()] = (row['user'].strip(), (row.get('title') or '').strip())
+        identifiers = {user for user, _ in rows.values()} | ({self.options['user']} if self.options['user'] else set())
+        users = {}
+        for user in get_user_model().objects.filter(Q(username__in=identifiers) | Q(email__in=identifiers)):
+            users[user.username] = user
+            users.setdefault(user.email, user)
+        for identifier in identifiers - set(users):
+            self.stdout.write(self.style.WARNING(f"Utilisateur inconnu : {identifier}"))
+
+        owners = {}
+        for name in names:
+            identifier, title = rows.get(name) or rows.get(os.path.basename(name)) or (self.options['user'], '')
+            user = users.get(identifier)
+            owners[name] = (user, title) if user is not None else None
+        return owners
+
+    def _fail(self, name, error):
+        entry = self.manifest['files'].setdefault(name, {})
+        entry.update(status='failed', error=str(error), attempts=entry.get('attempts', 0) + 1)
+        self.stats['failed'] += 1
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        return {'version': 1, 'files': {}}
+
+    def _save_manifest(self):
+        # Écriture atomique : un arrêt brutal laisse l'ancien manifeste intact
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+
+@contextlib.contextmanager
+def _opened_source(source):
+    """(dossier racine, chemins relatifs des PDF triés) ; une archive ZIP est décompressée dans un dossier temporaire."""
+    if zipfile.is_zipfile(source):
+        with tempfile.TemporaryDirectory(prefix='import_resumes_') as root:
+            with zipfile.ZipFile(source) as archive:
+                names = [info.filename for info in archive.infolist()
+                         if not info.is_dir() and info.filename.lower().endswith('.pdf')]
+                for name in names:
+                    archive.extract(name, root)
+            yield root, sorted(names)
+        return
+    if not os.path.isdir(source):
+        raise CommandError(f"{source} n'est ni un dossier ni une archive ZIP")
+    names = []
+    for directory, _, files in os.walk(source):
+        names += [os.path.relpath(os.path.join(directory, filename), source)
+                  for filename in files if filename.lower().endswith('.pdf')]
+    yield source, sorted(names)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,53 @@
+"""
+Commande Django : python manage.py llm_cache
+Affiche les statistiques du cache des réponses IA (succès / échecs par fonctionnalité, entrées)
+et permet d'appliquer l'éviction (--prune, à lancer en cron) ou de vider le cache (--clear).
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from matching.models import LLMCacheEntry, LLMCacheStat
+from matching.services import llm_cache
+
+
+class Command(BaseCommand):
+    help = "Statistiques et maintenance du cache des réponses IA."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Supprimer les entrées expirées et les moins récemment utilisées au-delà de LLM_CACHE_MAX_ENTRIES.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Vider complètement le cache (les compteurs sont conservés).',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = LLMCacheEntry.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} entrée(s) supprimée(s)."))
+        elif options['prune']:
+            deleted = llm_cache.prune()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} entrée(s) supprimée(s)."))
+
+        entries = {
+            row['feature']: row
+            for row in LLMCacheEntry.objects.values('feature').annotate(count=Count('pk'), hits=Sum('hits'))
+        }
+        stats = {stat.feature: stat for stat in LLMCacheStat.objects.all()}
+        features = sorted(set(entries) | set(stats))
+        if not features:
+            self.stdout.write("Cache vide.")
+            return
+
+        self.stdout.write(f"{'Fonctionnalité':<16} {'Entrées':>8} {'Succès':>8} {'Échecs':>8} {'Taux':>7}")
+        for feature in features:
+            stat = stats.get(feature)
+            count = entries.get(feature, {}).get('count', 0)
+            hits = stat.hits if stat else 0
+            misses = stat.misses if stat else 0
+            rate = stat.hit_rate if stat else 0.0
+            self.stdout.write(f"{feature:<16} {count:>8} {hits:>8} {misses:>8} {rate:>6.0%}")
@@ -0,0 +1,122 @@
+"""
+Commande Django : python manage.py run_task_worker
+Exécute les tâches en arrière-plan (BackgroundTask) : recherche d'offres, etc.
+Plusieurs processus peuvent tourner en parallèle (--processes), la base garantit qu'une tâche
+n'est réservée que par un seul worker. Si TASK_BROKER_URL (Redis) est configuré, les workers
+sont réveillés dès qu'une tâche est créée au lieu d'attendre le prochain polling.
+"""
+import logging
+import multiprocessing
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from matching.models import BackgroundTask
+from matching.services.tasks import claim_next_task, get_broker, load_task_modules, run_task
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Lance un ou plusieurs workers qui exécutent les tâches en arrière-plan (BackgroundTask)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Nombre de processus workers (défaut: 1).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Attente en secondes quand la file est vide (défaut: 2).',
+        )
+        parser.add_argument(
+            '--kinds',
+            nargs='*',
+            default=None,
+            help='Ne traiter que ces types de tâches (défaut: tous).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Vider la file puis s\'arrêter (utile en cron ou en test).',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=900,
+            help='Remettre en attente les tâches "en cours" depuis plus de N secondes (worker mort, défaut: 900).',
+        )
+
+    def handle(self, *args, **options):
+        load_task_modules()
+        self._requeue_stale_tasks(options['stale_after'])
+
+        processes = max(1, options['processes'])
+        if processes == 1:
+            _worker_loop(options['poll_interval'], options['kinds'], options['once'])
+            return
+
+        # Les connexions ne doivent pas être partagées entre processus forkés
+        connections.close_all()
+        children = [
+            multiprocessing.Process(
+                target=_worker_loop,
+                args=(options['poll_interval'], options['kinds'], options['once']),
+                name=f"task-worker-{i}",
+            )
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+        self.stdout.write(f"{processes} workers démarrés.")
+
+        def _terminate(signum, frame):
+            for child in children:
+                child.terminate()
+
+        signal.signal(signal.SIGTERM, _terminate)
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            _terminate(None, None)
+
+    def _requeue_stale_tasks(self, stale_after):
+        limit = timezone.now() - timedelta(seconds=stale_after)
+        count = BackgroundTask.objects.filter(
+            status=BackgroundTask.STATUS_RUNNING,
+            started_at__lt=limit,
+        ).update(status=BackgroundTask.STATUS_PENDING)
+        if count:
+            self.stdout.write(self.style.WARNING(f"{count} tâche(s) bloquée(s) remise(s) en attente."))
+
+
+def _worker_loop(poll_interval, kinds, once):
+    """Boucle d'un worker : réserve et exécute les tâches jusqu'à arrêt."""
+    broker = get_broker()
+    logger.info("Worker de tâches démarré (broker=%s)", 'redis' if broker else 'polling')
+    while True:
+        close_old_connections()
+        task = claim_next_task(kinds)
+        if task is not None:
+            logger.info("Tâche %s (%s) réservée", task.pk, task.kind)
+            run_task(task)
+            continue
+        if once:
+            return
+        if broker is not None:
+            try:
+                broker.wait(poll_interval)
+                continue
+            except Exception as e:
+                logger.warning("Broker Redis indisponible (%s), repli sur le polling", e)
+        time.sleep(poll_interval)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:43
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_description_excerpt(apps, schema_editor):
+    """Calcule l'extrait des offres déjà en base (par lots pour limiter la mémoire)."""
+    JobOffer = apps.get_model('matching', 'JobOffer')
+    batch = []
+    for offer in JobOffer.objects.only('id', 'description').iterator(chunk_size=500):
+        if not offer.description:
+            continue
+        offer.description_excerpt = Truncator(offer.description).words(30)[:400]
+        batch.append(offer)
+        if len(batch) >= 500:
+            JobOffer.objects.bulk_update(batch, ['description_excerpt'])
+            batch = []
+    if batch:
+        JobOffer.objects.bulk_update(batch, ['description_excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0006_jobalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joboffer',
+            name='description_excerpt',
+            field=models.CharField(blank=True, max_length=400, verbose_name='Extrait de description'),
+        ),
+        migrations.RunPython(fill_description_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:44
+
+import json
+import zlib
+
+from django.db import migrations, transaction
+
+
+BACKFILL_CHUNK_SIZE = 500
+
+
+def backfill_job_offer_raw(apps, schema_editor):
+    """
+    Copie raw_api_data vers JobOfferRaw par lots, chaque lot dans sa propre transaction.
+    Reprenable : la table existe déjà (0008_joboffer_raw, enregistrée à part) et seules les offres sans ligne
+    JobOfferRaw sont traitées, donc relancer la migration après une interruption reprend là où elle
+    s'était arrêtée.
+    """
+    JobOffer = apps.get_model('matching', 'JobOffer')
+    JobOfferRaw = apps.get_model('matching', 'JobOfferRaw')
+    last_pk = 0
+    while True:
+        offers = list(
+            JobOffer.objects.filter(pk__gt=last_pk, raw__isnull=True)
+            .order_by('pk')
+            .values_list('pk', 'raw_api_data')[:BACKFILL_CHUNK_SIZE]
+        )
+        if not offers:
+            break
+        with transaction.atomic():
+            JobOfferRaw.objects.bulk_create(
+                [
+                    JobOfferRaw(
+                        job_offer_id=pk,
+                        payload=zlib.compress(
+                            json.dumps(data or {}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                        ),
+                    )
+                    for pk, data in offers
+                ],
+                ignore_conflicts=True,
+            )
+        last_pk = offers[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # Chaque lot du backfill est commité séparément (voir backfill_job_offer_raw)
+    atomic = False
+
+    dependencies = [
+        ('matching', '0008_joboffer_raw'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_job_offer_raw, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_payload_storage_external(apps, schema_editor):
+    """
+    Le payload est déjà compressé (zlib) : sous PostgreSQL on demande un stockage
+    TOAST hors ligne sans recompression (EXTERNAL) pour éviter un travail inutile.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE matching_jobofferraw ALTER COLUMN payload SET STORAGE EXTERNAL'
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Table des données brutes, créée dans une transaction ; la copie des données est faite par la migration
+    suivante (0008_backfill_joboffer_raw), non atomique.
+    """
+
+    dependencies = [
+        ('matching', '0007_joboffer_description_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobOfferRaw',
+            fields=[
+                ('job_offer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw', serialize=False, to='matching.joboffer')),
+                ('payload', models.BinaryField(verbose_name='Données brutes API (JSON compressé zlib)')),
+            ],
+        ),
+        migrations.RunPython(set_payload_storage_external, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Suppression de la colonne JSON de la table chaude, une fois le backfill terminé
+    (on peut s'arrêter à 0008_backfill_joboffer_raw pour vérifier avant de l'appliquer).
+    """
+
+    dependencies = [
+        ('matching', '0008_backfill_joboffer_raw'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='joboffer',
+            name='raw_api_data',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0011_llm_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobmatch',
+            name='cv_suggestions',
+            field=models.JSONField(blank=True, null=True, verbose_name='Suggestions CV'),
+        ),
+        migrations.AddField(
+            model_name='jobmatch',
+            name='cv_suggestions_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobmatch',
+            name='cv_suggestions_source',
+            field=models.CharField(blank=True, choices=[('precomputed', 'Pré-calculées'), ('on_demand', 'À la demande')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='jobmatch',
+            name='cv_suggestions_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0012_jobmatch_cv_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobmatch',
+            name='letter_refinement_hashes',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Empreintes des paragraphes améliorés'),
+        ),
+    ]
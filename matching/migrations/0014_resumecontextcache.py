@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0013_jobmatch_letter_refinement_hashes'),
+        ('resumes', '0003_alter_resume_parsed_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeContextCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('backend', models.CharField(max_length=50)),
+                ('model_name', models.CharField(max_length=100)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('cache_name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='context_caches', to='resumes.resume')),
+            ],
+            options={
+                'unique_together': {('resume', 'backend', 'model_name')},
+            },
+        ),
+    ]
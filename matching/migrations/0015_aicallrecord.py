@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-19 11:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0014_resumecontextcache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('feature', models.CharField(max_length=50, verbose_name='Fonctionnalité')),
+                ('model_name', models.CharField(max_length=100)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('response_tokens', models.PositiveIntegerField(default=0)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0, verbose_name='Latence (ms)')),
+                ('retries', models.PositiveSmallIntegerField(default=0, verbose_name='Réessais')),
+                ('cache_hit', models.BooleanField(default=False, verbose_name='Servi par le cache')),
+                ('status', models.CharField(choices=[('ok', 'Réussi'), ('error', 'Erreur'), ('overloaded', 'Refusé (surcharge)'), ('cancelled', 'Annulé (client déconnecté)')], default='ok', max_length=20)),
+                ('cost_usd', models.FloatField(default=0, verbose_name='Coût estimé (USD)')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ai_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'appel IA',
+                'verbose_name_plural': 'appels IA',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['feature', 'created_at'], name='aicall_feature_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-19 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0015_aicallrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiCallLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True)),
+                ('lane', models.PositiveSmallIntegerField(verbose_name='File')),
+                ('user_key', models.BigIntegerField(blank=True, null=True)),
+                ('slot', models.PositiveSmallIntegerField(blank=True, null=True, unique=True)),
+                ('user_slot', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': "place d'appel Gemini",
+                'verbose_name_plural': "places d'appel Gemini",
+                'constraints': [models.UniqueConstraint(fields=('user_key', 'user_slot'), name='gemini_lease_user_slot_uniq')],
+            },
+        ),
+    ]
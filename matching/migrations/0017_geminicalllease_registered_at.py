@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 20:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0016_geminicalllease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geminicalllease',
+            name='registered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Inscrit le'),
+        ),
+    ]
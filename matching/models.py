@@ -1,9 +1,48 @@
+import json
+import zlib
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from django.utils.text import Truncator
 
 from resumes.models import Resume
 
 
+# Longueur de l'extrait de description affiché sur les cartes (résultats, dashboard)
+DESCRIPTION_EXCERPT_WORDS = 30
+DESCRIPTION_EXCERPT_MAX_LENGTH = 400
+
+
+class JobOfferQuerySet(models.QuerySet):
+
+    def for_list(self):
+        """
+        Projection légère pour les listes : on ne charge pas la description complète,
+        seulement l'extrait pré-calculé (le JSON brut vit dans JobOfferRaw).
+        """
+        return self.defer('description')
+
+    def with_raw(self):
+        """Charge aussi le JSON brut (table annexe) en une seule requête."""
+        return self.select_related('raw')
+
+
+class JobMatchQuerySet(models.QuerySet):
+
+    def for_list(self):
+        """
+        Projection légère pour les listes de matches (résultats de recherche, dashboard).
+        Joint l'offre mais laisse de côté les colonnes lourdes (description, JSON brut, lettre).
+        """
+        return self.select_related('job_offer').defer(
+            'cover_letter_content',
+            'letter_refinement_hashes',
+            'cv_suggestions',
+            'job_offer__description',
+        )
+
+
 class JobOffer(models.Model):
     """
     Stocke une offre récupérée depuis l'API pour éviter de la redemander à chaque fois.
@@ -14,6 +53,8 @@ class JobOffer(models.Model):
     title = models.CharField("Intitulé du poste", max_length=255)
     company_name = models.CharField("Entreprise", max_length=255, blank=True)
     description = models.TextField("Description", blank=True)
+    # Extrait court calculé à l'ingestion, utilisé par les vues liste à la place de la description complète
+    description_excerpt = models.CharField("Extrait de description", max_length=DESCRIPTION_EXCERPT_MAX_LENGTH, blank=True)
 
     # URL pour postuler
     url = models.URLField("Lien offre", max_length=500, blank=True)
@@ -24,12 +65,61 @@ class JobOffer(models.Model):
     date_posted = models.DateTimeField("Date de publication", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # On garde tout le JSON brut de l'API au cas où on veut afficher un détail oublié
-    raw_api_data = models.JSONField("Données brutes API", default=dict)
+    objects = JobOfferQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.title} chez {self.company_name}"
 
+    @property
+    def raw_api_data(self):
+        """
+        JSON brut de l'API, stocké compressé dans JobOfferRaw.
+        Chargé paresseusement : une requête au premier accès (sauf si with_raw() a été utilisé).
+        """
+        try:
+            return self.raw.data
+        except JobOfferRaw.DoesNotExist:
+            return {}
+
+    @staticmethod
+    def build_description_excerpt(description):
+        """Tronque la description (même rendu que |truncatewords:30) pour l'extrait stocké."""
+        if not description:
+            return ''
+        excerpt = Truncator(description).words(DESCRIPTION_EXCERPT_WORDS)
+        return excerpt[:DESCRIPTION_EXCERPT_MAX_LENGTH]
+
+
+class JobOfferRaw(models.Model):
+    """
+    JSON brut de l'API France Travail pour une offre, sorti de la table JobOffer
+    (qui est lue à chaque liste) et stocké compressé (zlib).
+    On le garde au cas où on veut afficher un détail oublié.
+    """
+    job_offer = models.OneToOneField(JobOffer, on_delete=models.CASCADE, primary_key=True, related_name='raw')
+    payload = models.BinaryField("Données brutes API (JSON compressé zlib)")
+
+    def __str__(self):
+        return f"Données brutes de l'offre {self.job_offer_id}"
+
+    @staticmethod
+    def compress(data):
+        """Sérialise et compresse un dict JSON en octets."""
+        return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def decompress(payload):
+        """Inverse de compress()."""
+        if not payload:
+            return {}
+        return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data_cache'):
+            self._data_cache = self.decompress(self.payload)
+        return self._data_cache
+
 
 class JobMatch(models.Model):
     """
@@ -54,6 +144,24 @@ class JobMatch(models.Model):
     
     # Lettre de motivation (brouillon)
     cover_letter_content = models.TextField("Lettre de motivation", blank=True)
+    # Empreintes des paragraphes après la dernière amélioration IA, par type et instructions (amélioration par
+    # paragraphe, voir letter_refinement.baseline_key) : {"grammar:9c1e...": ["3f2a...", ...]}
+    letter_refinement_hashes = models.JSONField("Empreintes des paragraphes améliorés", default=dict, blank=True)
+
+    # Suggestions du CV Optimizer, calculées à la demande ou à l'avance (matching/services/precompute.py)
+    SUGGESTIONS_PRECOMPUTED = 'precomputed'
+    SUGGESTIONS_ON_DEMAND = 'on_demand'
+    SUGGESTIONS_SOURCE_CHOICES = [
+        (SUGGESTIONS_PRECOMPUTED, 'Pré-calculées'),
+        (SUGGESTIONS_ON_DEMAND, 'À la demande'),
+    ]
+    cv_suggestions = models.JSONField("Suggestions CV", null=True, blank=True)
+    cv_suggestions_source = models.CharField(max_length=20, choices=SUGGESTIONS_SOURCE_CHOICES, blank=True)
+    cv_suggestions_at = models.DateTimeField(null=True, blank=True)
+    # Première consultation des suggestions (les pré-calculs jamais consultés sont du travail perdu)
+    cv_suggestions_used_at = models.DateTimeField(null=True, blank=True)
+
+    objects = JobMatchQuerySet.as_manager()
 
     class Meta:
         # Un CV ne peut avoir qu'un seul "Match" pour une même offre
@@ -82,4 +190,182 @@ class JobAlert(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Alerte pour {self.resume.title} (actif={self.is_active})"
\ No newline at end of file
+        return f"Alerte pour {self.resume.title} (actif={self.is_active})"
+
+class BackgroundTask(models.Model):
+    """
+    Tâche exécutée hors requête par les workers (python manage.py run_task_worker).
+    La table sert de file d'attente : les workers réservent les tâches avec
+    SELECT ... FOR UPDATE SKIP LOCKED. Redis (optionnel) ne sert qu'à les réveiller.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_DONE, 'Terminée'),
+        (STATUS_FAILED, 'Échouée'),
+    ]
+
+    kind = models.CharField("Type de tâche", max_length=50)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    payload = models.JSONField("Paramètres", default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Les tâches de plus haute priorité sont exécutées en premier
+    priority = models.IntegerField("Priorité", default=0)
+    # Avancement lisible par l'endpoint de suivi (ex: {"stage": "saving", "saved": 3, "total": 10})
+    progress = models.JSONField("Avancement", default=dict, blank=True)
+    result = models.JSONField("Résultat", default=dict, blank=True)
+    error = models.TextField("Erreur", blank=True)
+    attempts = models.PositiveIntegerField("Tentatives", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'created_at'], name='bgtask_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def update_progress(self, **values):
+        """Met à jour l'avancement (fusionné avec l'existant) et le persiste immédiatement."""
+        self.progress = {**self.progress, **values}
+        self.save(update_fields=['progress'])
+
+
+class LLMCacheEntry(models.Model):
+    """
+    Réponse IA déjà analysée (CV Optimizer, analyse de CV...), adressée par le hash
+    de (fonctionnalité, modèle, version du prompt, entrées normalisées).
+    Expire après LLM_CACHE_TTL ; au-delà de LLM_CACHE_MAX_ENTRIES, les entrées les moins
+    récemment utilisées sont supprimées (voir matching/services/llm_cache.py).
+    """
+    key = models.CharField(max_length=64, unique=True)
+    feature = models.CharField("Fonctionnalité", max_length=50, db_index=True)
+    model_name = models.CharField(max_length=100)
+    result = models.JSONField("Résultat")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.feature} {self.key[:12]} ({self.hits} hits)"
+
+
+class LLMCacheStat(models.Model):
+    """Compteurs de succès / échecs du cache IA, par fonctionnalité."""
+    feature = models.CharField(max_length=50, primary_key=True)
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.feature} : {self.hits} hits / {self.misses} misses"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResumeContextCache(models.Model):
+    """
+    Contexte mis en cache côté fournisseur (context caching Gemini) contenant le texte d'un CV :
+    les prompts de lettre et du CV Optimizer n'envoient plus que la partie propre à l'offre.
+    Voir services/context_cache.py.
+    """
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='context_caches')
+    backend = models.CharField(max_length=50)
+    model_name = models.CharField(max_length=100)
+    # Empreinte du texte mis en cache : un texte différent invalide le contexte
+    text_hash = models.CharField(max_length=64)
+    cache_name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('resume', 'backend', 'model_name')
+
+    def __str__(self):
+        return f"Contexte {self.cache_name} (CV {self.resume_id}, {self.model_name})"
+
+
+class AICallRecord(models.Model):
+    """
+    Un appel IA : appel Gemini (tokens, latence, réessais, coût estimé) ou réponse servie par le cache.
+    Écrit par lots par services/telemetry.py, agrégé en histogrammes sur une fenêtre glissante.
+    """
+    STATUS_OK = 'ok'
+    STATUS_ERROR = 'error'
+    STATUS_OVERLOADED = 'overloaded'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_OK, 'Réussi'),
+        (STATUS_ERROR, 'Erreur'),
+        (STATUS_OVERLOADED, 'Refusé (surcharge)'),
+        (STATUS_CANCELLED, 'Annulé (client déconnecté)'),
+    ]
+
+    created_at = models.DateTimeField(db_index=True)
+    feature = models.CharField("Fonctionnalité", max_length=50)
+    model_name = models.CharField(max_length=100)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='ai_calls')
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    response_tokens = models.PositiveIntegerField(default=0)
+    # Part des tokens du prompt lue depuis un contexte en cache (facturée à tarif réduit)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField("Latence (ms)", default=0)
+    retries = models.PositiveSmallIntegerField("Réessais", default=0)
+    cache_hit = models.BooleanField("Servi par le cache", default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OK)
+    cost_usd = models.FloatField("Coût estimé (USD)", default=0)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "appel IA"
+        verbose_name_plural = "appels IA"
+        indexes = [
+            models.Index(fields=['feature', 'created_at'], name='aicall_feature_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.feature} {self.model_name} ({self.latency_ms} ms, {self.status})"
+
+
+class GeminiCallLease(models.Model):
+    """
+    Place d'appel Gemini partagée par tous les processus (services/gemini_leases.py) : réservée (slot renseigné)
+    ou attendue (slot vide). Les index uniques sur slot et sur (user_key, user_slot) empêchent de prendre deux
+    fois la même place ; une place dont l'échéance est passée (processus tué) est reprise. Les places libres vont
+    aux appels en attente par file, puis à l'utilisateur qui a le moins d'appels en vol, puis par ancienneté.
+    """
+    token = models.CharField(max_length=32, unique=True)
+    lane = models.PositiveSmallIntegerField("File")
+    user_key = models.BigIntegerField(null=True, blank=True)
+    slot = models.PositiveSmallIntegerField(null=True, blank=True, unique=True)
+    user_slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    registered_at = models.DateTimeField("Inscrit le", default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "place d'appel Gemini"
+        verbose_name_plural = "places d'appel Gemini"
+        constraints = [
+            models.UniqueConstraint(fields=['user_key', 'user_slot'], name='gemini_lease_user_slot_uniq'),
+        ]
+
+    def __str__(self):
+        state = f"place {self.slot}" if self.slot is not None else "en attente"
+        return f"{self.token} ({state}, jusqu'à {self.expires_at:%H:%M:%S})"
@@ -1,3 +1,3 @@
-from .credits import consume_credit
+from .credits import consume_credit, refund_credit
 
-__all__ = ['consume_credit']
+__all__ = ['consume_credit', 'refund_credit']
@@ -1,20 +1,24 @@
 """
 Service pour la génération automatique de lettres de motivation par IA.
 """
-import os
-from typing import Optional
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
 from io import BytesIO
 from datetime import datetime
-import google.generativeai as genai
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from asgiref.sync import sync_to_async
+from .gemini_client import get_model
+from . import context_cache, letter_refinement, letter_render, telemetry
+from .telemetry import FEATURE_COVER_LETTER, FEATURE_LETTER_REFINEMENT
+from .gemini_dispatcher import GeminiOverloaded
+from .letter_refinement import MODE_FULL, MODE_PARAGRAPHS, MODE_UNCHANGED
+from .prompt_compactor import compact_cv, compact_offer
+from resumes.services.sectionizer import cv_sections
 
 
+logger = logging.getLogger(__name__)
 
 
 class AILetterGenerator:
@@ -25,17 +29,10 @@ class AILetterGenerator:
 
     def __init__(self):
         """
-        Initialise le service avec la clé API Google Gemini.
+        Récupère le modèle Gemini partagé du processus (voir gemini_client).
         La clé doit être dans les variables d'environnement (GEMINI_API_KEY).
         """
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError(
-                "GEMINI_API_KEY n'est pas définie dans les variables d'environnement. "
-                "Ajoutez-la dans votre fichier .env"
-            )
-        genai.configure(api_key=api_key)
-        self.client = genai.GenerativeModel('gemini-2.5-flash')
+        self.client = get_model()
 
     def generate_cover_letter(
             self,
@@ -60,17 +57,118 @@ class AILetterGenerator:
             ValueError: Si les données nécessaires sont manquantes
             Exception: Si l'appel à l'API échoue
         """
-        # Validation des données
+        self._validate_generation_inputs(resume, job_match)
+
+        try:
+            # Appel à l'API Gemini (CV dans le contexte en cache quand c'est possible, voir context_cache)
+            with telemetry.feature(FEATURE_COVER_LETTER):
+                response = context_cache.generate(
+                    resume, self.client.name,
+                    lambda cv_in_context: self._build_generation_prompt(
+                        resume, job_match, custom_instructions, tone, cv_in_context),
+                    self.client,
+                )
+            return self._extract_text(response)
+
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la génération de la lettre de motivation : {str(e)}")
+
+    async def agenerate_cover_letter(
+            self,
+            resume,
+            job_match,
+            custom_instructions: Optional[str] = None,
+            tone: str = "professional"
+    ) -> str:
+        """
+        Version asynchrone de generate_cover_letter.
+        resume et job_match.job_offer doivent déjà être chargés (pas d'accès ORM ici).
+        """
+        self._validate_generation_inputs(resume, job_match)
+
+        try:
+            with telemetry.feature(FEATURE_COVER_LETTER):
+                response = await context_cache.agenerate(
+                    resume, self.client.name,
+                    lambda cv_in_context: self._build_generation_prompt(
+                        resume, job_match, custom_instructions, tone, cv_in_context),
+                    self.client,
+                )
+            return self._extract_text(response)
+
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la génération de la lettre de motivation : {str(e)}")
+
+    async def astream_cover_letter(
+            self,
+            resume,
+            job_match,
+            custom_instructions: Optional[str] = None,
+            tone: str = "professional",
+            metrics: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Version streaming de agenerate_cover_letter : produit le texte au fil des tokens Gemini.
+        Voir _astream pour les métriques et l'annulation.
+        """
+        self._validate_generation_inputs(resume, job_match)
+        metrics = metrics if metrics is not None else {}
+        model = await context_cache.aget_cached_model(resume, self.client.name)
+        if model is not None:
+            prompt = self._build_generation_prompt(resume, job_match, custom_instructions, tone, cv_in_context=True)
+            try:
+                async with aclosing(self._astream(prompt, 'generate', metrics, model=model)) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
+                context_cache.record_prompt(True, prompt)
+                return
+            except context_cache.CONTEXT_GONE_ERRORS as e:
+                # Contexte disparu avant le premier fragment : nouvel essai avec le prompt complet
+                if metrics.get('chunks'):
+                    raise
+                logger.info("Contexte du CV %s disparu (%s) : prompt complet", resume.pk, e)
+                await sync_to_async(context_cache.invalidate)(resume, reason='expired')
+        prompt = self._build_generation_prompt(resume, job_match, custom_instructions, tone)
+        async with aclosing(self._astream(prompt, 'generate', metrics)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+        context_cache.record_prompt(False, prompt)
+
+    @staticmethod
+    def _validate_generation_inputs(resume, job_match):
+        """
+        Raises:
+            ValueError: Si les données nécessaires sont manquantes
+        """
         if not resume or not resume.extracted_text:
             raise ValueError("Le CV doit contenir du texte extrait (extracted_text)")
 
         if not job_match or not job_match.job_offer:
             raise ValueError("Le match doit contenir une offre d'emploi")
 
-        # Préparation des données
-        cv_text = resume.extracted_text
+    def _build_generation_prompt(self, resume, job_match, custom_instructions=None, tone="professional",
+                                 cv_in_context=False) -> str:
+        """
+        Construit le prompt de génération de lettre.
+        cv_in_context : le CV est déjà dans le contexte en cache du modèle, il n'est pas répété.
+
+        Raises:
+            ValueError: Si les données nécessaires sont manquantes
+        """
+        self._validate_generation_inputs(resume, job_match)
+
+        # Préparation des données (sections pertinentes dans le budget de tokens, voir prompt_compactor)
         job_offer = job_match.job_offer
-        job_desc = job_offer.description or ""
+        if cv_in_context:
+            cv_text = context_cache.CV_IN_CONTEXT
+        else:
+            cv_text = compact_cv(resume.extracted_text, 'cover_letter', offer_text=job_offer.description,
+                                 sections=cv_sections(resume, resume.extracted_text))
+        job_desc = compact_offer(job_offer.description or "", 'cover_letter', cv_text=resume.extracted_text)
         company = job_offer.company_name or "cette entreprise"
         title = job_offer.title or "ce poste"
 
@@ -119,22 +217,17 @@ class AILetterGenerator:
         if custom_instructions:
             prompt += f"\n\nINSTRUCTIONS PERSONNALISÉES :\n{custom_instructions}\n"
 
-        try:
-            # Appel à l'API Gemini
-            response = self.client.generate_content(prompt)
-
-            # Extraction du texte de la réponse
-            if hasattr(response, 'text'):
-                cover_letter = response.text.strip()
-            elif hasattr(response, 'candidates') and response.candidates:
-                cover_letter = response.candidates[0].content.parts[0].text.strip()
-            else:
-                raise ValueError("Format de réponse inattendu de l'API Gemini")
-
-            return cover_letter
+        return prompt
 
-        except Exception as e:
-            raise Exception(f"Erreur lors de la génération de la lettre de motivation : {str(e)}")
+    @staticmethod
+    def _extract_text(response) -> str:
+        """Extrait le texte d'une réponse Gemini."""
+        if hasattr(response, 'text'):
+            return response.text.strip()
+        elif hasattr(response, 'candidates') and response.candidates:
+            return response.candidates[0].content.parts[0].text.strip()
+        else:
+            raise ValueError("Format de réponse inattendu de l'API Gemini")
 
     def refine_cover_letter(
             self,
@@ -156,13 +249,189 @@ class AILetterGenerator:
             ValueError: Si la lettre ou les instructions sont vides
             Exception: Si l'appel à l'API échoue
         """
+        prompt = self._build_refinement_prompt(existing_letter, instructions)
+
+        try:
+            with telemetry.feature(FEATURE_LETTER_REFINEMENT):
+                response = self.client.generate_content(prompt)
+            return self._extract_text(response)
+
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de l'amélioration de la lettre : {str(e)}")
+
+    async def arefine_cover_letter(self, existing_letter: str, instructions: str) -> str:
+        """Version asynchrone de refine_cover_letter."""
+        prompt = self._build_refinement_prompt(existing_letter, instructions)
+
+        try:
+            with telemetry.feature(FEATURE_LETTER_REFINEMENT):
+                response = await self.client.generate_content_async(prompt)
+            return self._extract_text(response)
+
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de l'amélioration de la lettre : {str(e)}")
+
+    def refine_letter(
+            self,
+            existing_letter: str,
+            instructions: str,
+            improvement_type: str = "custom",
+            baselines: Optional[dict] = None,
+            targets: Optional[list] = None
+    ) -> tuple:
+        """
+        Amélioration incrémentale (voir letter_refinement) : quand c'est possible, seuls les paragraphes
+        désignés (targets, indices) ou modifiés depuis la dernière amélioration du même type avec les mêmes
+        instructions (baselines)
+        sont envoyés à Gemini, puis fusionnés dans la lettre. Sinon, réécriture complète.
+
+        Returns:
+            tuple[str, dict]: Lettre améliorée et rapport (mode, paragraphes, tokens économisés)
+
+        Raises:
+            ValueError: Si la lettre ou les instructions sont vides
+            Exception: Si l'appel à l'API échoue
+        """
+        full_prompt = self._build_refinement_prompt(existing_letter, instructions)
+        mode, paragraphs, targets = letter_refinement.plan(
+            existing_letter, improvement_type, instructions, baselines, targets
+        )
+        if mode == MODE_UNCHANGED:
+            return existing_letter, self._refinement_report(mode, paragraphs, targets, full_prompt)
+        if mode == MODE_PARAGRAPHS:
+            prompt = letter_refinement.build_prompt(paragraphs, targets, instructions)
+            try:
+                with telemetry.feature(FEATURE_LETTER_REFINEMENT):
+                    output = self._extract_text(self.client.generate_content(prompt))
+                merged = letter_refinement.merge(paragraphs, targets, output)
+                report = self._refinement_report(mode, paragraphs, targets, full_prompt, prompt, output)
+                return letter_refinement.join_paragraphs(merged), report
+            except GeminiOverloaded:
+                raise
+            except ValueError as e:
+                logger.warning("Amélioration par paragraphe inexploitable, réécriture complète : %s", e)
+            except Exception as e:
+                raise Exception(f"Erreur lors de l'amélioration de la lettre : {str(e)}")
+        letter = self.refine_cover_letter(existing_letter, instructions)
+        return letter, self._refinement_report(MODE_FULL, paragraphs, range(len(paragraphs)), full_prompt)
+
+    async def arefine_letter(
+            self,
+            existing_letter: str,
+            instructions: str,
+            improvement_type: str = "custom",
+            baselines: Optional[dict] = None,
+            targets: Optional[list] = None
+    ) -> tuple:
+        """Version asynchrone de refine_letter."""
+        full_prompt = self._build_refinement_prompt(existing_letter, instructions)
+        mode, paragraphs, targets = letter_refinement.plan(
+            existing_letter, improvement_type, instructions, baselines, targets
+        )
+        if mode == MODE_UNCHANGED:
+            return existing_letter, self._refinement_report(mode, paragraphs, targets, full_prompt)
+        if mode == MODE_PARAGRAPHS:
+            prompt = letter_refinement.build_prompt(paragraphs, targets, instructions)
+            try:
+                with telemetry.feature(FEATURE_LETTER_REFINEMENT):
+                    output = self._extract_text(await self.client.generate_content_async(prompt))
+                merged = letter_refinement.merge(paragraphs, targets, output)
+                report = self._refinement_report(mode, paragraphs, targets, full_prompt, prompt, output)
+                return letter_refinement.join_paragraphs(merged), report
+            except GeminiOverloaded:
+                raise
+            except ValueError as e:
+                logger.warning("Amélioration par paragraphe inexploitable, réécriture complète : %s", e)
+            except Exception as e:
+                raise Exception(f"Erreur lors de l'amélioration de la lettre : {str(e)}")
+        letter = await self.arefine_cover_letter(existing_letter, instructions)
+        return letter, self._refinement_report(MODE_FULL, paragraphs, range(len(paragraphs)), full_prompt)
+
+    @staticmethod
+    def _refinement_report(mode, paragraphs, targets, full_prompt, prompt=None, output=''):
+        report = letter_refinement.report(mode, paragraphs, list(targets), full_prompt, prompt, output)
+        logger.info(
+            "Amélioration de lettre (%s) : paragraphes %s sur %s, %s tokens au lieu de %s",
+            mode, report['paragraphs'], report['total_paragraphs'], report['tokens_sent'], report['tokens_full'],
+        )
+        return report
+
+    async def astream_refine_cover_letter(
+            self,
+            existing_letter: str,
+            instructions: str,
+            metrics: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Version streaming de arefine_cover_letter."""
+        prompt = self._build_refinement_prompt(existing_letter, instructions)
+        async with aclosing(self._astream(prompt, 'refine', metrics)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def _astream(self, prompt: str, operation: str, metrics: Optional[dict] = None,
+                       model=None) -> AsyncIterator[str]:
+        """
+        Appelle Gemini en streaming (stream=True) et produit chaque fragment de texte dès sa réception.
+        model : modèle à utiliser à la place de self.client (contexte en cache, voir context_cache).
+
+        metrics (optionnel) est complété au fil de l'eau : ttft_ms (délai avant le premier token),
+        duration_ms, chunks, chars et cancelled.
+        Si l'appelant est annulé (client déconnecté, CancelledError) ou ferme le générateur,
+        la lecture du flux s'arrête : Gemini ne produit plus de tokens que personne ne lira.
+        """
+        metrics = metrics if metrics is not None else {}
+        metrics.update({'ttft_ms': None, 'duration_ms': None, 'chunks': 0, 'chars': 0, 'cancelled': False})
+        start = time.perf_counter()
+        feature = FEATURE_COVER_LETTER if operation == 'generate' else FEATURE_LETTER_REFINEMENT
+        try:
+            with telemetry.feature(feature):
+                async with aclosing((model or self.client).stream_content_async(prompt)) as response:
+                    async for chunk in response:
+                        text = self._chunk_text(chunk)
+                        if not text:
+                            continue
+                        if metrics['ttft_ms'] is None:
+                            metrics['ttft_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                        metrics['chunks'] += 1
+                        metrics['chars'] += len(text)
+                        yield text
+        except (asyncio.CancelledError, GeneratorExit):
+            metrics['cancelled'] = True
+            raise
+        finally:
+            metrics['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(
+                "Streaming Gemini %s : ttft=%s ms, durée=%s ms, %s fragments, %s caractères%s",
+                operation, metrics['ttft_ms'], metrics['duration_ms'], metrics['chunks'], metrics['chars'],
+                ' (annulé par le client)' if metrics['cancelled'] else '',
+            )
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Texte d'un fragment de réponse en streaming (vide si le fragment n'a pas de contenu)."""
+        try:
+            return chunk.text
+        except (ValueError, IndexError, AttributeError):
+            return ''
+
+    def _build_refinement_prompt(self, existing_letter: str, instructions: str) -> str:
+        """
+        Construit le prompt d'amélioration d'une lettre.
+
+        Raises:
+            ValueError: Si la lettre ou les instructions sont vides
+        """
         if not existing_letter:
             raise ValueError("La lettre de motivation ne peut pas être vide")
 
         if not instructions:
             raise ValueError("Les instructions d'amélioration sont requises")
 
-        prompt = f"""Tu es un expert en rédaction de lettres de motivation professionnelles.
+        return f"""Tu es un expert en rédaction de lettres de motivation professionnelles.
 Ta mission est d'améliorer cette lettre de motivation selon les instructions fournies, tout en conservant son essence et ses informations factuelles.
 
 LETTRE ACTUELLE :
@@ -186,21 +455,6 @@ RÈGLES STRICTES À SUIVRE :
 
 Retourne maintenant la lettre améliorée :
 """
-
-        try:
-            response = self.client.generate_content(prompt)
-
-            if hasattr(response, 'text'):
-                refined_letter = response.text.strip()
-            elif hasattr(response, 'candidates') and response.candidates:
-                refined_letter = response.candidates[0].content.parts[0].text.strip()
-            else:
-                raise ValueError("Format de réponse inattendu de l'API Gemini")
-
-            return refined_letter
-
-        except Exception as e:
-            raise Exception(f"Erreur lors de l'amélioration de la lettre : {str(e)}")
     
     def _build_refinement_instructions(self, custom_instructions: str, improvement_type: str) -> str:
         """
@@ -274,8 +528,68 @@ De plus, applique ces instructions personnalisées :
         except Exception as e:
             raise Exception(f"Impossible de se connecter à l'API Gemini : {str(e)}")
     
+    @staticmethod
+    def file_key(
+            cover_letter_content: str,
+            user_name: Optional[str] = None,
+            user_email: Optional[str] = None,
+            user_address: Optional[str] = None,
+            job_title: Optional[str] = None,
+            company_name: Optional[str] = None,
+            recipient_name: Optional[str] = None,
+            file_format: str = letter_render.FORMAT_PDF
+    ) -> str:
+        """
+        Empreinte du fichier d'une lettre (PDF ou DOCX) : contenu, champs de l'en-tête et mise en page du format.
+        Sert de clé au cache des fichiers rendus et d'ETag à la vue d'export.
+        """
+        return letter_render.letter_key(
+            cover_letter_content, fmt=file_format, user_name=user_name, user_email=user_email,
+            user_address=user_address, job_title=job_title, company_name=company_name, recipient_name=recipient_name,
+        )
+
+    @staticmethod
+    def render_file(
+            cover_letter_content: str,
+            user_name: Optional[str] = None,
+            user_email: Optional[str] = None,
+            user_address: Optional[str] = None,
+            job_title: Optional[str] = None,
+            company_name: Optional[str] = None,
+            recipient_name: Optional[str] = None,
+            file_format: str = letter_render.FORMAT_PDF
+    ) -> tuple:
+        """
+        Fichier d'une lettre de motivation au format file_format (octets) et son empreinte (file_key). Une lettre
+        identique déjà exportée dans ce format est servie depuis le cache du processus, sans nouveau rendu.
+
+        Raises:
+            ValueError: Si le contenu de la lettre est vide
+            Exception: Si la génération du fichier échoue
+        """
+        if not cover_letter_content or not cover_letter_content.strip():
+            raise ValueError("Le contenu de la lettre de motivation ne peut pas être vide")
+        header = dict(user_name=user_name, user_email=user_email, user_address=user_address, job_title=job_title,
+                      company_name=company_name, recipient_name=recipient_name)
+        key = AILetterGenerator.file_key(cover_letter_content, file_format=file_format, **header)
+        data = letter_render.cached(key)
+        if data is None:
+            data = letter_render.build(file_format, cover_letter_content, **header)
+            letter_render.store(key, data)
+        return data, key
+
+    @staticmethod
+    def render_pdf(cover_letter_content: str, **header) -> tuple:
+        """PDF d'une lettre de motivation et son empreinte (voir render_file)."""
+        return AILetterGenerator.render_file(cover_letter_content, file_format=letter_render.FORMAT_PDF, **header)
+
+    @staticmethod
+    def render_docx(cover_letter_content: str, **header) -> tuple:
+        """DOCX d'une lettre de motivation et son empreinte (voir render_file)."""
+        return AILetterGenerator.render_file(cover_letter_content, file_format=letter_render.FORMAT_DOCX, **header)
+
+    @staticmethod
     def export_to_pdf(
-            self,
             cover_letter_content: str,
             user_name: Optional[str] = None,
             user_email: Optional[str] = None,
@@ -303,96 +617,43 @@ De plus, applique ces instructions personnalisées :
             ValueError: Si le contenu de la lettre est vide
             Exception: Si la génération du PDF échoue
         """
-        if not cover_letter_content or not cover_letter_content.strip():
-            raise ValueError("Le contenu de la lettre de motivation ne peut pas être vide")
-        
-        # Créer un buffer en mémoire pour le PDF
-        buffer = BytesIO()
-        
-        # Créer le document PDF
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
+        pdf, _ = AILetterGenerator.render_pdf(
+            cover_letter_content, user_name=user_name, user_email=user_email, user_address=user_address,
+            job_title=job_title, company_name=company_name, recipient_name=recipient_name,
         )
-        
-        # Styles pour le PDF
-        styles = getSampleStyleSheet()
-        
-        # Style pour l'en-tête (nom, adresse, etc.)
-        header_style = ParagraphStyle(
-            'CustomHeader',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor='black',
-            alignment=TA_LEFT,
-            spaceAfter=12,
-        )
-        
-        # Style pour le titre (objet)
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor='black',
-            alignment=TA_LEFT,
-            spaceAfter=12,
-            spaceBefore=12,
-        )
-        
-        # Style pour le corps de la lettre
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor='black',
-            alignment=TA_JUSTIFY,
-            spaceAfter=12,
-            leading=14,
-        )
-        
-        # Style pour la signature
-        signature_style = ParagraphStyle(
-            'CustomSignature',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor='black',
-            alignment=TA_LEFT,
-            spaceBefore=24,
-        )
-        
-        # Construire le contenu du PDF
-        story = []
-        
-        
+        return BytesIO(pdf)
 
-        # Objet
-        if job_title:
-            story.append(Paragraph(f"<b>Objet : Candidature pour le poste de {job_title}</b>", title_style))
-            story.append(Spacer(1, 0.3*cm))
-        
-        # Corps de la lettre
-        # Convertir le texte en paragraphes (séparés par des sauts de ligne doubles)
-        paragraphs = cover_letter_content.split('\n\n')
-        
-        for para in paragraphs:
-            para = para.strip()
-            if para:
-                # Remplacer les sauts de ligne simples par <br/>
-                para_html = para.replace('\n', '<br/>')
-                # Échapper les caractères HTML spéciaux et convertir en paragraphe
-                story.append(Paragraph(para_html, body_style))
-                story.append(Spacer(1, 0.3*cm))
-        
+    @staticmethod
+    def export_to_docx(
+            cover_letter_content: str,
+            user_name: Optional[str] = None,
+            user_email: Optional[str] = None,
+            user_address: Optional[str] = None,
+            job_title: Optional[str] = None,
+            company_name: Optional[str] = None,
+            recipient_name: Optional[str] = None
+    ) -> BytesIO:
+        """
+        Exporte une lettre de motivation en document Word (DOCX), modifiable par le candidat.
 
-        
-        # Générer le PDF
-        try:
-            doc.build(story)
-            buffer.seek(0)
-            return buffer
-        except Exception as e:
-            raise Exception(f"Erreur lors de la génération du PDF : {str(e)}")
+        Args:
+            cover_letter_content: Contenu de la lettre de motivation
+            user_name: Nom complet de l'utilisateur (optionnel)
+            user_email: Email de l'utilisateur (optionnel)
+            user_address: Adresse de l'utilisateur (optionnel)
+            job_title: Titre du poste (optionnel)
+            company_name: Nom de l'entreprise (optionnel)
+            recipient_name: Nom du destinataire (optionnel, par défaut "Madame, Monsieur")
+
+        Returns:
+            BytesIO: Buffer contenant le DOCX généré
+
+        Raises:
+            ValueError: Si le contenu de la lettre est vide
+            Exception: Si la génération du DOCX échoue
+        """
+        docx, _ = AILetterGenerator.render_docx(
+            cover_letter_content, user_name=user_name, user_email=user_email, user_address=user_address,
+            job_title=job_title, company_name=company_name, recipient_name=recipient_name,
+        )
+        return BytesIO(docx)
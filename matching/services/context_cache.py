@@ -0,0 +1,225 @@
+"""
+Contexte mis en cache côté fournisseur pour un CV réutilisé sur de nombreuses offres.
+
+Un même CV sert à générer lettres et suggestions du CV Optimizer pour des dizaines d'offres : au lieu de
+renvoyer son texte dans chaque prompt, il est placé une fois dans un contexte en cache (context caching
+Gemini, tokens facturés à tarif réduit) et les prompts ne contiennent plus que la partie propre à l'offre.
+
+Un contexte par (CV, backend, modèle), enregistré en base (ResumeContextCache) pour être partagé entre
+processus. Il est recréé à l'expiration (CONTEXT_CACHE_TTL) ou quand le texte du CV change (empreinte),
+et supprimé avec le CV. Les CV trop courts (sous CONTEXT_CACHE_MIN_TOKENS, minimum imposé par Gemini)
+gardent le prompt complet, de même si la création échoue ; un contexte disparu côté fournisseur
+(NotFound) est invalidé et l'appel refait avec le prompt complet.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from google.api_core import exceptions as google_exceptions
+
+from ..models import ResumeContextCache
+from .gemini_client import DEFAULT_MODEL, GeminiModel
+from .llm_backends import get_backend
+from .prompt_compactor import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+# Remplace le texte du CV dans les prompts envoyés avec le contexte en cache
+CV_IN_CONTEXT = "(CV complet du candidat : voir le contexte fourni)"
+
+SYSTEM_INSTRUCTION = (
+    "Le contexte contient le CV complet d'un candidat. Les demandes qui suivent (lettre de motivation, "
+    "adaptation du CV à une offre d'emploi) portent sur ce CV."
+)
+
+# Un contexte sur le point d'expirer est recréé plutôt qu'utilisé
+EXPIRY_MARGIN = timedelta(seconds=60)
+
+# Erreurs du fournisseur signalant un contexte expiré, supprimé ou inaccessible
+CONTEXT_GONE_ERRORS = (google_exceptions.NotFound, google_exceptions.PermissionDenied)
+
+# Modèles adossés à un contexte gardés par processus (évite de relire le contexte à chaque appel)
+MAX_MODELS = 256
+
+_lock = threading.Lock()
+_models = OrderedDict()
+_stats = Counter()
+_pid = os.getpid()
+
+
+def is_enabled():
+    return getattr(settings, 'CONTEXT_CACHE_ENABLED', True)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_cached_model(resume, model_name=DEFAULT_MODEL):
+    """
+    Modèle dont le contexte contient le texte du CV, créé ou recréé si besoin ; None si le cache est
+    désactivé, le CV trop court ou la création impossible (l'appelant envoie alors le prompt complet).
+    Accès base et réseau : depuis du code asynchrone, passer par aget_cached_model.
+    """
+    if not is_enabled() or resume is None or resume.pk is None:
+        return None
+    text = (resume.extracted_text or '').strip()
+    tokens = estimate_tokens(text)
+    if tokens < getattr(settings, 'CONTEXT_CACHE_MIN_TOKENS', 1024):
+        _record('skipped_small')
+        return None
+
+    backend = get_backend()
+    digest = text_hash(text)
+    try:
+        entry = ResumeContextCache.objects.filter(
+            resume_id=resume.pk, backend=backend.name, model_name=model_name,
+        ).first()
+        if entry is not None:
+            if entry.text_hash == digest and entry.expires_at > timezone.now() + EXPIRY_MARGIN:
+                model = _model_for(backend, entry.cache_name, model_name)
+                if model is not None:
+                    ResumeContextCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1)
+                    _record('hits')
+                    return model
+            _discard(backend, entry)
+            _record('expired' if entry.text_hash == digest else 'invalidated')
+
+        ttl = getattr(settings, 'CONTEXT_CACHE_TTL', 3600)
+        cache_name, expires_at = backend.create_cached_context(
+            model_name, contents=[text], system_instruction=SYSTEM_INSTRUCTION,
+            ttl_seconds=ttl, display_name=f"resume-{resume.pk}",
+        )
+        ResumeContextCache.objects.update_or_create(
+            resume_id=resume.pk, backend=backend.name, model_name=model_name,
+            defaults={
+                'text_hash': digest,
+                'cache_name': cache_name,
+                'expires_at': expires_at or timezone.now() + timedelta(seconds=ttl),
+                'hits': 0,
+            },
+        )
+        _record('created')
+        _record('tokens_cached', tokens)
+        logger.info("Contexte %s créé pour le CV %s (%s tokens, %s s)", cache_name, resume.pk, tokens, ttl)
+        return _model_for(backend, cache_name, model_name)
+    except Exception as e:
+        logger.warning("Contexte en cache indisponible pour le CV %s : %s", resume.pk, e)
+        _record('errors')
+        return None
+
+
+async def aget_cached_model(resume, model_name=DEFAULT_MODEL):
+    return await sync_to_async(get_cached_model)(resume, model_name)
+
+
+def invalidate(resume, reason='invalidated'):
+    """Supprime les contextes en cache d'un CV (base et fournisseur)."""
+    for entry in ResumeContextCache.objects.filter(resume_id=resume.pk):
+        _discard(get_backend(entry.backend), entry)
+        _record(reason)
+
+
+def generate(resume, model_name, build_prompt, fallback_model):
+    """
+    Appelle le modèle avec le CV en contexte (prompt build_prompt(True)) si possible, sinon fallback_model
+    avec le prompt complet (build_prompt(False)).
+    """
+    model = get_cached_model(resume, model_name)
+    if model is not None:
+        prompt = build_prompt(True)
+        try:
+            response = model.generate_content(prompt)
+            _record_prompt('cached', prompt)
+            return response
+        except CONTEXT_GONE_ERRORS as e:
+            logger.info("Contexte du CV %s disparu (%s) : prompt complet", resume.pk, e)
+            invalidate(resume, reason='expired')
+    prompt = build_prompt(False)
+    response = fallback_model.generate_content(prompt)
+    _record_prompt('full', prompt)
+    return response
+
+
+async def agenerate(resume, model_name, build_prompt, fallback_model):
+    """Version asynchrone de generate."""
+    model = await aget_cached_model(resume, model_name)
+    if model is not None:
+        prompt = build_prompt(True)
+        try:
+            response = await model.generate_content_async(prompt)
+            _record_prompt('cached', prompt)
+            return response
+        except CONTEXT_GONE_ERRORS as e:
+            logger.info("Contexte du CV %s disparu (%s) : prompt complet", resume.pk, e)
+            await sync_to_async(invalidate)(resume, reason='expired')
+    prompt = build_prompt(False)
+    response = await fallback_model.generate_content_async(prompt)
+    _record_prompt('full', prompt)
+    return response
+
+
+def record_prompt(cv_in_context, prompt):
+    """Comptabilise un prompt envoyé hors de generate / agenerate (streaming)."""
+    _record_prompt('cached' if cv_in_context else 'full', prompt)
+
+
+def get_context_cache_stats():
+    """
+    Compteurs du processus : contextes créés, réutilisés (hits), expirés, invalidés, CV trop courts,
+    erreurs, et appels / tokens de prompt envoyés avec ('cached') ou sans ('full') contexte.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def _model_for(backend, cache_name, model_name):
+    global _pid
+    with _lock:
+        if os.getpid() != _pid:
+            # Processus forké : pas de modèles (ni de clients) hérités du parent
+            _models.clear()
+            _pid = os.getpid()
+        model = _models.get(cache_name)
+        if model is not None:
+            _models.move_to_end(cache_name)
+            return model
+    try:
+        model = GeminiModel(model_name, backend.model_from_cached_context(cache_name))
+    except CONTEXT_GONE_ERRORS:
+        return None
+    with _lock:
+        _models[cache_name] = model
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def _discard(backend, entry):
+    entry.delete()
+    with _lock:
+        _models.pop(entry.cache_name, None)
+    try:
+        backend.delete_cached_context(entry.cache_name)
+    except Exception as e:
+        # Déjà expiré côté fournisseur le plus souvent
+        logger.debug("Suppression du contexte %s : %s", entry.cache_name, e)
+
+
+def _record(counter, value=1):
+    with _lock:
+        _stats[counter] += value
+
+
+def _record_prompt(mode, prompt):
+    with _lock:
+        _stats[f'calls_{mode}'] += 1
+        _stats[f'prompt_tokens_{mode}'] += estimate_tokens(prompt)
@@ -23,3 +23,14 @@ def consume_credit(user):
         user.refresh_from_db()
         return True
     return False
+
+
+def refund_credit(user):
+    """
+    Rend le crédit consommé pour un appel IA qui n'a pas pu aboutir (service saturé).
+    Sans effet pour un utilisateur premium (aucun crédit n'a été déduit).
+    """
+    if user.is_premium:
+        return
+    user.__class__.objects.filter(pk=user.pk).update(ai_credits=F('ai_credits') + 1)
+    user.refresh_from_db(fields=['ai_credits'])
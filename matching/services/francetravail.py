@@ -1,16 +1,38 @@
+import asyncio
 import os
+import weakref
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 import logging
-from django.db import IntegrityError
-from ..models import JobOffer, JobMatch
-import re
+from django.db import IntegrityError, transaction
+from ..models import JobOffer, JobOfferRaw, JobMatch
+from resumes.services.sectionizer import score_words, structure_for
 from django.utils.dateparse import parse_datetime
 
 
+# Délai max (secondes) des appels HTTP asynchrones à France Travail
+ASYNC_HTTP_TIMEOUT = 30.0
+
+# Un client httpx par boucle d'évènements : connexions et contexte TLS réutilisés entre requêtes
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Client httpx partagé de la boucle d'évènements courante (créé au premier appel)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=ASYNC_HTTP_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
 
 class FranceTravail:
 
+    TOKEN_URL = "https://entreprise.francetravail.fr/connexion/oauth2/access_token?realm=/partenaire"
+
     def __init__(self):
         self.client_id = settings.CLIENT_ID
         self.client_secret = settings.CLIENT_SECRET_KEY
@@ -18,12 +40,8 @@ class FranceTravail:
         self.token = None
 
 
-    def get_access_token(self, client_id, client_secret):
-        """
-        Récupère le token OAuth2 nécessaire pour interroger l'API.
-        """
-        url = "https://entreprise.francetravail.fr/connexion/oauth2/access_token?realm=/partenaire"
-
+    def _token_request(self, client_id, client_secret):
+        """Paramètres de la requête OAuth2 (partagés par les versions synchrone et asynchrone)."""
         # Le scope est crucial pour définir à quelle API on veut accéder
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         payload = {
@@ -33,26 +51,37 @@ class FranceTravail:
             "scope": "api_offresdemploiv2 o2dsoffre",
             "realm": "/partenaire"
         }
+        return payload, headers
 
-        response = requests.post(url, data=payload, headers=headers)
-
-        if response.status_code == 200:
+    def _handle_token_response(self, status_code, get_json, text):
+        if status_code == 200:
             logging.info("✅ Authentification réussie !")
-            return response.json()['access_token']
+            return get_json()['access_token']
         else:
-            logging.info(f"❌ Erreur Auth : {response.status_code}")
-            logging.info(response.text)
+            logging.info(f"❌ Erreur Auth : {status_code}")
+            logging.info(text)
             return None
 
-    def search_jobs(self, keywords, page: int =1, limit: int = 10):
-
+    def get_access_token(self, client_id, client_secret):
+        """
+        Récupère le token OAuth2 nécessaire pour interroger l'API.
+        """
+        payload, headers = self._token_request(client_id, client_secret)
+        response = requests.post(self.TOKEN_URL, data=payload, headers=headers)
+        return self._handle_token_response(response.status_code, response.json, response.text)
+
+    async def aget_access_token(self, client, client_id, client_secret):
+        """Version asynchrone de get_access_token (client : httpx.AsyncClient)."""
+        payload, headers = self._token_request(client_id, client_secret)
+        response = await client.post(self.TOKEN_URL, data=payload, headers=headers)
+        return self._handle_token_response(response.status_code, response.json, response.text)
+
+    def _search_request(self, token, keywords, page, limit):
+        """En-têtes et paramètres de la recherche d'offres."""
         # 1. Calcul des bornes (Pagination)
         start_index = (page - 1) * limit
         end_index = start_index + limit - 1
 
-        """Cherche des jobs basés sur une liste de mots-clés"""
-        token = self.get_access_token(self.client_id, self.client_secret)
-
         headers = {
             'Authorization': f'Bearer {token}',
             'Accept': 'application/json'
@@ -72,27 +101,50 @@ class FranceTravail:
         }
 
         logging.info(f"🔍 Recherche France Travail avec : {q}")
+        return headers, params
 
-        response = requests.get(self.api_url, headers=headers, params=params)
-
-        if response.status_code == 200 or response.status_code == 206:
-            return response.json().get('resultats', [])
-        elif response.status_code == 204:  # Pas de résultats
+    def _handle_search_response(self, status_code, get_json, text):
+        if status_code == 200 or status_code == 206:
+            return get_json().get('resultats', [])
+        elif status_code == 204:  # Pas de résultats
             return []
         else:
-            logging.info(f"Erreur API : {response.status_code} - {response.text}")
+            logging.info(f"Erreur API : {status_code} - {text}")
             return []
 
+    def search_jobs(self, keywords, page: int =1, limit: int = 10):
+        """Cherche des jobs basés sur une liste de mots-clés"""
+        token = self.get_access_token(self.client_id, self.client_secret)
+        headers, params = self._search_request(token, keywords, page, limit)
+        response = requests.get(self.api_url, headers=headers, params=params)
+        return self._handle_search_response(response.status_code, response.json, response.text)
 
+    async def asearch_jobs(self, keywords, page: int = 1, limit: int = 10, client=None):
+        """
+        Version asynchrone de search_jobs (httpx) : l'attente réseau ne bloque pas de thread,
+        utilisable depuis les vues async servies par JobPilot/asgi.py.
+        client (optionnel) : httpx.AsyncClient à utiliser, par défaut celui de la boucle courante.
+        """
+        client = client or get_async_client()
+        token = await self.aget_access_token(client, self.client_id, self.client_secret)
+        headers, params = self._search_request(token, keywords, page, limit)
+        response = await client.get(self.api_url, headers=headers, params=params)
+        return self._handle_search_response(response.status_code, response.json, response.text)
 
+    async def asave_jobs(self, jobs_data, user, resume, on_match=None):
+        """Version asynchrone de save_jobs : les écritures ORM sont exécutées hors de la boucle d'évènements."""
+        return await sync_to_async(self.save_jobs)(jobs_data, user, resume, on_match=on_match)
 
-
-    def save_jobs(self, jobs_data, user, resume):
+    def save_jobs(self, jobs_data, user, resume, on_match=None):
         """
         Prend une liste d'offres (JSON) et les sauvegarde en BDD.
         Crée aussi le lien 'Match' avec l'utilisateur.
+        on_match (optionnel) est appelé avec chaque JobMatch dès qu'il est enregistré
+        (suivi de l'avancement des tâches en arrière-plan).
         """
         saved_matches = []
+        # Vocabulaire du CV calculé une fois (structure enregistrée à l'upload) et non pour chaque offre
+        resume_words = set(structure_for(resume)['words'])
 
         for job_data in jobs_data:
             # 1. On crée ou récupère l'offre (pour éviter les doublons)
@@ -109,23 +161,28 @@ class FranceTravail:
                 logging.info(f"⚠️ Offre ignorée : pas d'ID")
                 continue
                 
-            offer, created = JobOffer.objects.get_or_create(
-                remote_id=remote_id,
-                defaults={
-                    'title': job_data.get('intitule', 'Titre non disponible'),
-                    'company_name': job_data.get('entreprise', {}).get('nom', 'Non spécifié') if isinstance(job_data.get('entreprise'), dict) else 'Non spécifié',
-                    'description': job_data.get('description', ''),
-                    'url': url,
-                    'location': job_data.get('lieuTravail', {}).get('libelle', '') if isinstance(job_data.get('lieuTravail'), dict) else '',
-                    'contract_type': job_data.get('typeContrat', ''),
-                    'date_posted': parse_datetime(job_data.get('dateCreation')) if job_data.get('dateCreation') else None,
-                    'raw_api_data': job_data
-                }
-            )
+            with transaction.atomic():
+                offer, created = JobOffer.objects.get_or_create(
+                    remote_id=remote_id,
+                    defaults={
+                        'title': job_data.get('intitule', 'Titre non disponible'),
+                        'company_name': job_data.get('entreprise', {}).get('nom', 'Non spécifié') if isinstance(job_data.get('entreprise'), dict) else 'Non spécifié',
+                        'description': job_data.get('description', ''),
+                        'description_excerpt': JobOffer.build_description_excerpt(job_data.get('description', '')),
+                        'url': url,
+                        'location': job_data.get('lieuTravail', {}).get('libelle', '') if isinstance(job_data.get('lieuTravail'), dict) else '',
+                        'contract_type': job_data.get('typeContrat', ''),
+                        'date_posted': parse_datetime(job_data.get('dateCreation')) if job_data.get('dateCreation') else None,
+                    }
+                )
+                if created:
+                    # JSON brut stocké compressé dans la table annexe (hors des listes), dans la même transaction
+                    # que l'offre : une offre ne peut pas rester sans son JSON brut
+                    JobOfferRaw.objects.create(job_offer=offer, payload=JobOfferRaw.compress(job_data))
 
             # 2. Calcul du score de matching
             description_offre = job_data.get('description', '')
-            score = self.calculate_match_score(resume.extracted_text, description_offre)
+            score = self.calculate_match_score(resume.extracted_text, description_offre, resume_words=resume_words)
 
             # 3. On crée le Match pour ce CV spécifique (s'il n'existe pas déjà)
             # unique_together = ('resume', 'job_offer') permet d'avoir plusieurs matches pour la même offre avec des CVs différents
@@ -149,6 +206,8 @@ class FranceTravail:
 
             saved_matches.append(match)
             logging.info(f"  ✓ Offre sauvegardée: {offer.title} (Score: {score}%)")
+            if on_match is not None:
+                on_match(match)
 
         return saved_matches
 
@@ -157,22 +216,20 @@ class FranceTravail:
 
 
 
-    def calculate_match_score(self, resume_text, job_description):
+    def calculate_match_score(self, resume_text, job_description, resume_words=None):
         """
         Compare le texte du CV et la description du job pour calculer un score (0-100).
         Algorithme simple : Présence de mots-clés communs.
+        resume_words (optionnel) : vocabulaire du CV déjà calculé (Resume.structured_data['words']).
         """
-        if not resume_text or not job_description:
+        if resume_words is None:
+            resume_words = score_words(resume_text)
+        if not resume_words or not job_description:
             return 0
 
         # 1. Nettoyage basique (minuscules, set de mots uniques)
-        resume_words = set(re.findall(r'\w+', resume_text.lower()))
-        job_words = set(re.findall(r'\w+', job_description.lower()))
-
         # 2. On filtre les "stopwords" (le, la, de, et...) qui font du bruit
-        stopwords = {'le', 'la', 'les', 'de', 'du', 'des', 'et', 'en', 'un', 'une', 'pour', 'avec', 'nous', 'vous'}
-        resume_words = resume_words - stopwords
-        job_words = job_words - stopwords
+        job_words = score_words(job_description)
 
         # 3. Calcul de l'intersection (mots communs)
         common_words = resume_words.intersection(job_words)
@@ -0,0 +1,145 @@
+"""
+Registre des modèles Gemini partagés par tout le processus.
+
+AIParser, AIOptimizer et AILetterGenerator récupèrent ici un modèle déjà configuré au lieu
+d'appeler genai.configure et de construire un GenerativeModel à chaque requête : les clients
+(et leurs connexions) sont créés une seule fois par processus puis réutilisés.
+Le modèle sous-jacent est fourni par le backend configuré (LLM_BACKEND, voir llm_backends) :
+Gemini en production, stub local pour les benchmarks.
+Chaque modèle compte ses appels (get_call_counts), par processus, et les confie au répartiteur
+(gemini_dispatcher) : plafond de concurrence, priorités et réessais sur erreur de quota.
+Chaque appel est mesuré par la télémétrie (tokens, latence, réessais : voir telemetry).
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import aclosing
+
+from django.conf import settings
+
+from . import telemetry
+from .gemini_dispatcher import get_dispatcher
+from .llm_backends import get_backend, reset_backends
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
+_lock = threading.Lock()
+_models = {}
+_call_counts = Counter()
+_pid = os.getpid()
+
+
+class GeminiModel:
+    """
+    Modèle Gemini partagé : délègue à genai.GenerativeModel via le répartiteur et compte les appels.
+    Les attributs non surchargés (model_name, count_tokens...) sont ceux du modèle sous-jacent.
+    """
+
+    def __init__(self, model_name, model):
+        self.name = model_name
+        self._model = model
+
+    def generate_content(self, *args, **kwargs):
+        _record_call(self.name)
+        with telemetry.measure(self.name, args) as call:
+            call.response = get_dispatcher().call(self._model.generate_content, *args, **kwargs)
+        return call.response
+
+    async def generate_content_async(self, *args, **kwargs):
+        _record_call(self.name)
+        with telemetry.measure(self.name, args) as call:
+            call.response = await get_dispatcher().acall(self._model.generate_content_async, *args, **kwargs)
+        return call.response
+
+    async def stream_content_async(self, *args, **kwargs):
+        """Fragments de generate_content_async(stream=True) ; la place du répartiteur est tenue jusqu'à la fin."""
+        _record_call(self.name)
+        with telemetry.measure(self.name, args) as call:
+            async with aclosing(get_dispatcher().astream(self._model.generate_content_async, *args, **kwargs)) as chunks:
+                async for chunk in chunks:
+                    call.add_chunk(chunk)
+                    yield chunk
+
+    def __getattr__(self, attr):
+        return getattr(self._model, attr)
+
+
+def get_api_key():
+    return os.getenv('GEMINI_API_KEY') or getattr(settings, 'GEMINI_API_KEY', None)
+
+
+def get_model(model_name=DEFAULT_MODEL, **model_kwargs):
+    """
+    Retourne le modèle partagé pour ce nom et ces paramètres (generation_config, system_instruction...),
+    en le créant au premier appel avec le backend configuré. Thread-safe.
+
+    Raises:
+        ValueError: Si GEMINI_API_KEY n'est pas définie (backend Gemini)
+    """
+    _reset_after_fork()
+    backend = get_backend()
+    key = (backend.name, model_name, _freeze(model_kwargs))
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = GeminiModel(model_name, backend.create_model(model_name, **model_kwargs))
+            _models[key] = model
+            logger.info("Modèle %s initialisé (backend %s)", model_name, backend.name)
+    return model
+
+
+def get_call_counts():
+    """Nombre d'appels par modèle depuis le démarrage du processus."""
+    with _lock:
+        return dict(_call_counts)
+
+
+def warm_up():
+    """
+    Prépare le modèle par défaut et le client gRPC au démarrage d'un worker (wsgi.py / asgi.py),
+    pour que la première requête ne paie pas l'initialisation. Sans clé API (backend Gemini)
+    ou si GEMINI_WARMUP est désactivé, ne fait rien. Doit s'exécuter dans le processus worker (pas de gunicorn --preload :
+    les connexions gRPC ne survivent pas à un fork).
+    """
+    backend = get_backend()
+    if not getattr(settings, 'GEMINI_WARMUP', True) or (backend.name == 'gemini' and not get_api_key()):
+        return
+    try:
+        get_model()
+        backend.warm_up()
+    except Exception as e:
+        logger.warning("Préchauffage Gemini impossible : %s", e)
+
+
+def _record_call(model_name):
+    with _lock:
+        _call_counts[model_name] += 1
+
+
+def _freeze(value):
+    """Clé hashable pour des paramètres de modèle (dicts et listes imbriqués)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _reset_after_fork():
+    """Un processus forké (workers de tâches) ne réutilise pas les clients de son parent."""
+    global _pid
+    if os.getpid() != _pid:
+        with _lock:
+            if os.getpid() != _pid:
+                _models.clear()
+                _call_counts.clear()
+                reset_backends()
+                _pid = os.getpid()
@@ -0,0 +1,546 @@
+"""
+Répartiteur des appels Gemini : plafond de concurrence, files par priorité et équité entre utilisateurs.
+
+Tous les appels passent par GeminiModel (gemini_client), qui les confie au répartiteur :
+- au plus GEMINI_MAX_CONCURRENCY appels en vol, GEMINI_MAX_CONCURRENCY_PER_USER par utilisateur, tous processus
+  confondus : l'appel admis par la file du processus réserve ensuite une place commune tenue en base
+  (gemini_leases), attribuée dans le même ordre entre tous les processus ; avec GEMINI_SHARED_LIMIT=False, le plafond ne vaut que par processus ;
+- les appels en attente sont servis par file (LANE_INTERACTIVE, puis LANE_PREMIUM, LANE_STANDARD,
+  LANE_BACKGROUND), puis en privilégiant l'utilisateur qui a le moins d'appels en vol, puis dans l'ordre d'arrivée ;
+- contrôle d'admission, sur la file du processus et les appels des autres processus en attente d'une place
+  commune : si la file est pleine (GEMINI_MAX_QUEUE) ou si l'attente estimée dépasse
+  GEMINI_QUEUE_TIMEOUT, l'appel est refusé tout de suite (GeminiOverloaded, à renvoyer en 429 avec Retry-After)
+  au lieu d'immobiliser un thread de plus ; les tâches de fond attendent jusqu'à GEMINI_BACKGROUND_QUEUE_TIMEOUT ;
+- les erreurs de quota (429 / ResourceExhausted, 503) sont réessayées GEMINI_MAX_RETRIES fois avec un backoff
+  exponentiel, place libérée pendant l'attente.
+
+La file et la priorité de l'appel viennent du contexte courant (call_context), posé par les vues et les tâches.
+Les compteurs (profondeur de file par priorité, refus, réessais, attente moyenne) sont lus par get_dispatcher_stats.
+"""
+import asyncio
+import contextvars
+import itertools
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from google.api_core import exceptions as google_exceptions
+
+from .gemini_leases import SharedLimiter
+
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = 0
+LANE_PREMIUM = 1
+LANE_STANDARD = 2
+LANE_BACKGROUND = 3
+LANE_NAMES = {
+    LANE_INTERACTIVE: 'interactive',
+    LANE_PREMIUM: 'premium',
+    LANE_STANDARD: 'standard',
+    LANE_BACKGROUND: 'background',
+}
+
+# Erreurs de quota / surcharge côté Gemini : réessayées avec backoff
+QUOTA_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+# Durée d'appel supposée tant qu'aucun appel n'a été mesuré (estimation de l'attente)
+INITIAL_CALL_SECONDS = 3.0
+# Intervalle (s) entre deux tentatives de réservation d'une place commune
+SHARED_POLL_SECONDS = (0.1, 0.5)
+
+_context = contextvars.ContextVar('gemini_call_context', default=(LANE_STANDARD, None))
+# Réessais de l'appel en cours, relevés par la télémétrie (count_retries)
+_retries = contextvars.ContextVar('gemini_call_retries', default=None)
+_lock = threading.Lock()
+_dispatcher = None
+_pid = os.getpid()
+
+
+class GeminiOverloaded(Exception):
+    """Appel Gemini refusé (file pleine, attente trop longue ou quota épuisé) ; retry_after en secondes."""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Le service IA est très sollicité, réessayez dans {retry_after} s.")
+
+
+def lane_for(user, interactive=False):
+    """File d'un appel : retouches interactives d'abord, puis utilisateurs premium, puis les autres."""
+    if interactive:
+        return LANE_INTERACTIVE
+    if user is not None and getattr(user, 'is_premium', False):
+        return LANE_PREMIUM
+    return LANE_STANDARD
+
+
+@contextmanager
+def call_context(user=None, lane=None, interactive=False):
+    """
+    Définit la file et l'utilisateur des appels Gemini effectués dans ce bloc (thread ou tâche asyncio).
+    Sans lane explicite, la file est déduite de l'utilisateur (lane_for).
+    """
+    if lane is None:
+        lane = lane_for(user, interactive)
+    token = _context.set((lane, getattr(user, 'pk', None)))
+    try:
+        yield
+    finally:
+        try:
+            _context.reset(token)
+        except ValueError:
+            # Générateur asynchrone refermé depuis un autre contexte : rien à restaurer ici
+            pass
+
+
+def current_user_key():
+    """Utilisateur (pk) des appels du contexte courant, ou None."""
+    return _context.get()[1]
+
+
+@contextmanager
+def count_retries():
+    """Compte les réessais sur erreur de quota des appels effectués dans ce bloc ; retourne [n]."""
+    counter = [0]
+    token = _retries.set(counter)
+    try:
+        yield counter
+    finally:
+        try:
+            _retries.reset(token)
+        except ValueError:
+            pass
+
+
+class _Waiter:
+    __slots__ = ('lane', 'user_key', 'seq', 'enqueued_at', 'granted', 'event', 'loop', 'future')
+
+    def __init__(self, lane, user_key, seq, event=None, loop=None, future=None):
+        self.lane = lane
+        self.user_key = user_key
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+    def grant(self):
+        self.granted = True
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class Dispatcher:
+    """
+    Sémaphore à priorités partagé par les threads et les boucles asyncio du processus ; shared (SharedLimiter)
+    étend le plafond à tous les processus.
+    """
+
+    def __init__(self, max_concurrency=8, max_per_user=2, max_queue=50, queue_timeout=20.0,
+                 background_queue_timeout=600.0, max_retries=3, retry_base_delay=1.0, shared=None):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.background_queue_timeout = background_queue_timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._per_user = Counter()
+        self._waiting = []
+        self._avg_call_seconds = INITIAL_CALL_SECONDS
+        self._counters = Counter()
+        self._wait_seconds = 0.0
+        self._peak_queue = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_concurrency=getattr(settings, 'GEMINI_MAX_CONCURRENCY', 8),
+            max_per_user=getattr(settings, 'GEMINI_MAX_CONCURRENCY_PER_USER', 2),
+            max_queue=getattr(settings, 'GEMINI_MAX_QUEUE', 50),
+            queue_timeout=getattr(settings, 'GEMINI_QUEUE_TIMEOUT', 20.0),
+            background_queue_timeout=getattr(settings, 'GEMINI_BACKGROUND_QUEUE_TIMEOUT', 600.0),
+            max_retries=getattr(settings, 'GEMINI_MAX_RETRIES', 3),
+            retry_base_delay=getattr(settings, 'GEMINI_RETRY_BASE_DELAY', 1.0),
+            shared=SharedLimiter.from_settings() if getattr(settings, 'GEMINI_SHARED_LIMIT', True) else None,
+        )
+
+    # --- Appels -----------------------------------------------------------------------------------
+
+    def call(self, func, *args, **kwargs):
+        """Exécute func dans une place du répartiteur ; les erreurs de quota sont réessayées."""
+        for attempt in itertools.count():
+            try:
+                with self.slot():
+                    return func(*args, **kwargs)
+            except QUOTA_ERRORS as e:
+                delay = self._retry_delay(attempt, e)
+            time.sleep(delay)
+
+    async def acall(self, func, *args, **kwargs):
+        """Version asynchrone de call (func est une coroutine function)."""
+        for attempt in itertools.count():
+            try:
+                async with self.aslot():
+                    return await func(*args, **kwargs)
+            except QUOTA_ERRORS as e:
+                delay = self._retry_delay(attempt, e)
+            await asyncio.sleep(delay)
+
+    async def astream(self, func, *args, **kwargs):
+        """
+        Appel en streaming (func(..., stream=True)) : la place est tenue jusqu'à la fin du flux.
+        Seul le démarrage est réessayé : un flux interrompu après les premiers fragments ne l'est pas.
+        """
+        for attempt in itertools.count():
+            async with self.aslot():
+                try:
+                    response = await func(*args, stream=True, **kwargs)
+                except QUOTA_ERRORS as e:
+                    delay = self._retry_delay(attempt, e)
+                else:
+                    async for chunk in response:
+                        yield chunk
+                    return
+            await asyncio.sleep(delay)
+
+    @contextmanager
+    def slot(self):
+        user_key = self.acquire()
+        try:
+            token = self._shared_acquire()
+        except BaseException:
+            self.release(user_key, None)
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._shared_release(token)
+            self.release(user_key, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self):
+        user_key = await self.aacquire()
+        try:
+            token = await self._ashared_acquire()
+        except BaseException:
+            self.release(user_key, None)
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            try:
+                if token is not None:
+                    await sync_to_async(self._shared_release)(token)
+            finally:
+                self.release(user_key, time.monotonic() - start)
+
+    # --- Places -----------------------------------------------------------------------------------
+
+    def acquire(self):
+        """Attend une place (thread bloqué) ; retourne la clé utilisateur à passer à release."""
+        lane, user_key = _context.get()
+        waiter = _Waiter(lane, user_key, next(self._seq), event=threading.Event())
+        shared = self._shared_snapshot()
+        with self._lock:
+            self._enqueue(waiter, shared)
+        if not waiter.granted and not waiter.event.wait(self._timeout(lane)):
+            with self._lock:
+                if not waiter.granted:
+                    self._give_up(waiter)
+        return user_key
+
+    async def aacquire(self):
+        """Attend une place sans bloquer la boucle d'évènements."""
+        lane, user_key = _context.get()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(lane, user_key, next(self._seq), loop=loop, future=loop.create_future())
+        shared = None
+        if self.shared is not None:
+            shared = self.shared.cached_snapshot() or await sync_to_async(self._shared_snapshot)()
+        with self._lock:
+            self._enqueue(waiter, shared)
+        if waiter.granted:
+            return user_key
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self._timeout(lane))
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    self._give_up(waiter)
+        except asyncio.CancelledError:
+            # Client déconnecté pendant l'attente : on rend la place si elle vient d'être accordée
+            with self._lock:
+                if waiter.granted:
+                    self._release_locked(user_key, None)
+                else:
+                    self._waiting.remove(waiter)
+            raise
+        return user_key
+
+    def release(self, user_key, duration):
+        with self._lock:
+            self._release_locked(user_key, duration)
+
+    def _enqueue(self, waiter, shared=None):
+        """
+        Sous verrou : inscrit l'appel, l'admet tout de suite s'il y a de la place, sinon applique l'admission.
+        shared : état global (SharedLimiter.snapshot) ; si toutes les places communes sont prises, l'appel admis
+        par le processus attendra encore, derrière les appels des autres processus : l'admission s'applique aussi.
+        """
+        self._waiting.append(waiter)
+        self._dispatch()
+        shared_full = shared is not None and shared['in_flight'] >= self.max_concurrency
+        if waiter.granted and not shared_full:
+            return
+        if waiter.lane != LANE_BACKGROUND:
+            ahead = sum(1 for w in self._waiting if w is not waiter and w.lane <= waiter.lane)
+            queued = sum(1 for w in self._waiting if w is not waiter)
+            if shared is not None:
+                ahead += sum(n for lane, n in shared['waiting_by_lane'].items() if lane <= waiter.lane)
+                queued += shared['waiting']
+            estimated = self._avg_call_seconds * (ahead + 1) / self.max_concurrency
+            if queued >= self.max_queue or estimated > self.queue_timeout:
+                if waiter.granted:
+                    self._release_locked(waiter.user_key, None)
+                else:
+                    self._waiting.remove(waiter)
+                self._counters['rejected'] += 1
+                retry_after = self._retry_after(ahead)
+                logger.warning(
+                    "Appel Gemini refusé (file %s) : %s en attente, attente estimée %.1f s, Retry-After %s s",
+                    LANE_NAMES[waiter.lane], queued, estimated, retry_after,
+                )
+                raise GeminiOverloaded(retry_after)
+        if waiter.granted:
+            return
+        self._counters['queued'] += 1
+        self._peak_queue = max(self._peak_queue, len(self._waiting))
+
+    def _dispatch(self):
+        """Sous verrou : accorde les places libres aux appels en attente, par ordre de priorité."""
+        while self._in_flight < self.max_concurrency and self._waiting:
+            eligible = [
+                w for w in self._waiting
+                if w.user_key is None or self._per_user[w.user_key] < self.max_per_user
+            ]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: (w.lane, self._per_user[w.user_key] if w.user_key else 0, w.seq))
+            self._waiting.remove(waiter)
+            self._in_flight += 1
+            if waiter.user_key is not None:
+                self._per_user[waiter.user_key] += 1
+            self._counters['admitted'] += 1
+            self._counters[f'admitted_{LANE_NAMES[waiter.lane]}'] += 1
+            self._wait_seconds += time.monotonic() - waiter.enqueued_at
+            waiter.grant()
+
+    def _release_locked(self, user_key, duration):
+        self._in_flight -= 1
+        if user_key is not None:
+            self._per_user[user_key] -= 1
+            if self._per_user[user_key] <= 0:
+                del self._per_user[user_key]
+        if duration is not None:
+            # Moyenne glissante de la durée des appels : sert à estimer l'attente et le Retry-After
+            self._avg_call_seconds = 0.8 * self._avg_call_seconds + 0.2 * duration
+        self._dispatch()
+
+    def _give_up(self, waiter):
+        self._waiting.remove(waiter)
+        self._counters['timeouts'] += 1
+        logger.warning("Appel Gemini abandonné après %.0f s d'attente (file %s)",
+                       self._timeout(waiter.lane), LANE_NAMES[waiter.lane])
+        raise GeminiOverloaded(self._retry_after(len(self._waiting) + self._shared_waiting()))
+
+    def _timeout(self, lane):
+        return self.background_queue_timeout if lane == LANE_BACKGROUND else self.queue_timeout
+
+    def _retry_after(self, ahead):
+        return max(1, math.ceil(self._avg_call_seconds * (ahead + 1) / self.max_concurrency))
+
+    # --- Places communes (tous processus) -----------------------------------------------------------
+
+    def _shared_snapshot(self):
+        """État global des places communes, ou None (pas de limiteur partagé, base indisponible)."""
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.snapshot()
+        except DatabaseError as e:
+            logger.warning("État des places Gemini communes illisible : %s", e)
+            return None
+
+    def _shared_waiting(self):
+        """Appels de tous les processus en attente d'une place commune, d'après le dernier état lu."""
+        snapshot = self.shared.cached_snapshot() if self.shared is not None else None
+        return snapshot['waiting'] if snapshot is not None else 0
+
+    def _shared_register(self, lane, user_key):
+        """
+        Inscrit l'appel en attente d'une place commune ; retourne son jeton, ou None si l'appel s'en passe
+        (pas de limiteur partagé, transaction en cours, base indisponible : plafond du processus seul).
+        """
+        if self.shared is None or not self.shared.usable():
+            return None
+        try:
+            return self.shared.register(lane, user_key, self._timeout(lane))
+        except DatabaseError as e:
+            logger.warning("Place Gemini commune non réservée, plafond du processus seul : %s", e)
+            return None
+
+    def _shared_claim(self, token, user_key):
+        """Vrai si la place commune est obtenue (ou si la base ne répond plus : l'appel part sans elle)."""
+        try:
+            return self.shared.try_claim(token, user_key)
+        except DatabaseError as e:
+            logger.warning("Place Gemini commune non réservée, plafond du processus seul : %s", e)
+            return True
+
+    def _shared_release(self, token):
+        if token is None:
+            return
+        try:
+            self.shared.release(token)
+        except DatabaseError as e:
+            # La place sera reprise à son échéance (GEMINI_LEASE_SECONDS)
+            logger.warning("Place Gemini commune non libérée : %s", e)
+
+    def _shared_give_up(self, lane):
+        with self._lock:
+            self._counters['shared_timeouts'] += 1
+        logger.warning("Appel Gemini abandonné après %.0f s d'attente d'une place commune (file %s)",
+                       self._timeout(lane), LANE_NAMES[lane])
+        raise GeminiOverloaded(self._retry_after(self._shared_waiting()))
+
+    def _shared_acquire(self):
+        """Après la place du processus : attend une place commune ; retourne son jeton (None sans place commune)."""
+        lane, user_key = _context.get()
+        token = self._shared_register(lane, user_key)
+        if token is None:
+            return None
+        deadline = time.monotonic() + self._timeout(lane)
+        try:
+            while not self._shared_claim(token, user_key):
+                if time.monotonic() >= deadline:
+                    self._shared_give_up(lane)
+                time.sleep(random.uniform(*SHARED_POLL_SECONDS))
+        except BaseException:
+            self._shared_release(token)
+            raise
+        return token
+
+    async def _ashared_acquire(self):
+        """Version asynchrone de _shared_acquire : attente sans bloquer la boucle d'évènements."""
+        if self.shared is None:
+            return None
+        lane, user_key = _context.get()
+        token = await sync_to_async(self._shared_register)(lane, user_key)
+        if token is None:
+            return None
+        deadline = time.monotonic() + self._timeout(lane)
+        try:
+            while not await sync_to_async(self._shared_claim)(token, user_key):
+                if time.monotonic() >= deadline:
+                    self._shared_give_up(lane)
+                await asyncio.sleep(random.uniform(*SHARED_POLL_SECONDS))
+        except BaseException:
+            # Client déconnecté pendant l'attente : l'inscription ne doit pas rester jusqu'à son échéance
+            await asyncio.shield(sync_to_async(self._shared_release)(token))
+            raise
+        return token
+
+    def _retry_delay(self, attempt, error):
+        """Délai avant le prochain essai après une erreur de quota, ou GeminiOverloaded si les essais sont épuisés."""
+        with self._lock:
+            self._counters['quota_errors'] += 1
+            if attempt >= self.max_retries:
+                self._counters['quota_exhausted'] += 1
+                exhausted = True
+            else:
+                self._counters['retries'] += 1
+                exhausted = False
+        delay = self.retry_base_delay * (2 ** attempt)
+        counter = _retries.get()
+        if counter is not None and not exhausted:
+            counter[0] += 1
+        if exhausted:
+            logger.warning("Quota Gemini toujours dépassé après %s essai(s) : %s", attempt + 1, error)
+            raise GeminiOverloaded(max(1, math.ceil(delay))) from error
+        logger.info("Quota Gemini dépassé (essai %s/%s), nouvel essai dans ~%.1f s : %s",
+                    attempt + 1, self.max_retries + 1, delay, error)
+        # Jitter : les appels refusés ensemble ne reviennent pas tous au même instant
+        return random.uniform(delay / 2, delay)
+
+    # --- Mesures ----------------------------------------------------------------------------------
+
+    def stats(self):
+        shared = self._shared_snapshot()
+        with self._lock:
+            queued_by_lane = Counter(LANE_NAMES[w.lane] for w in self._waiting)
+            admitted = self._counters['admitted']
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self._in_flight,
+                'queued': len(self._waiting),
+                'queued_by_lane': {name: queued_by_lane.get(name, 0) for name in LANE_NAMES.values()},
+                'peak_queue': self._peak_queue,
+                'avg_wait_ms': round(self._wait_seconds * 1000 / admitted, 1) if admitted else 0.0,
+                'avg_call_ms': round(self._avg_call_seconds * 1000, 1),
+                'counters': dict(self._counters),
+                # Places communes, tous processus confondus (None : plafond par processus)
+                'shared': None if shared is None else {
+                    'in_flight': shared['in_flight'],
+                    'waiting': shared['waiting'],
+                    'waiting_by_lane': {
+                        name: shared['waiting_by_lane'].get(lane, 0) for lane, name in LANE_NAMES.items()
+                    },
+                },
+            }
+
+
+def get_dispatcher():
+    """Répartiteur du processus (recréé après un fork : les verrous et files du parent ne sont pas repris)."""
+    global _dispatcher, _pid
+    if _dispatcher is None or os.getpid() != _pid:
+        with _lock:
+            if _dispatcher is None or os.getpid() != _pid:
+                _dispatcher = Dispatcher.from_settings()
+                _pid = os.getpid()
+    return _dispatcher
+
+
+def get_dispatcher_stats():
+    """
+    Profondeur de file par priorité, appels en vol et compteurs depuis le démarrage du processus,
+    et places communes à tous les processus ('shared').
+    """
+    return get_dispatcher().stats()
@@ -0,0 +1,174 @@
+"""
+Places d'appel Gemini partagées par tous les processus (workers web, run_task_worker, import_resumes...) :
+le plafond GEMINI_MAX_CONCURRENCY (et GEMINI_MAX_CONCURRENCY_PER_USER) vaut pour l'ensemble du déploiement,
+pas pour chaque processus. Les places sont tenues en base (GeminiCallLease).
+
+Le répartiteur du processus (gemini_dispatcher) ordonne sa propre file ; chaque appel qu'il admet s'inscrit
+ensuite en attente d'une place numérotée. Les places libres vont aux inscrits dans le même ordre que dans un
+processus, tous processus confondus : par file (LANE_INTERACTIVE d'abord), puis à l'utilisateur qui a le moins
+d'appels en vol, puis par ancienneté d'inscription. Chaque inscrit relit l'état (une requête) et ne réserve que
+si son rang lui donne une place libre.
+Les index uniques sur le numéro de place, et sur le couple utilisateur / numéro de place de l'utilisateur,
+garantissent qu'une place n'est jamais prise deux fois, quelle que soit la base.
+Chaque place a une échéance (GEMINI_LEASE_SECONDS) : celle d'un processus tué est supprimée à expiration, à la
+relecture de l'état global (snapshot). Les inscrits en attente donnent à tous les processus la profondeur de la
+file globale, utilisée pour le contrôle d'admission et le Retry-After.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import GeminiCallLease
+
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité de l'état global lu par le contrôle d'admission (une requête par seconde au plus)
+SNAPSHOT_TTL = 1.0
+# Marge ajoutée à l'échéance d'une inscription en attente, au-delà du délai d'attente de sa file
+WAITING_GRACE_SECONDS = 30
+
+
+class SharedLimiter:
+    """Places d'appel communes à tous les processus, réservées par mise à jour conditionnelle en base."""
+
+    def __init__(self, max_concurrency=8, max_per_user=2, lease_seconds=300):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_at = 0.0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_concurrency=getattr(settings, 'GEMINI_MAX_CONCURRENCY', 8),
+            max_per_user=getattr(settings, 'GEMINI_MAX_CONCURRENCY_PER_USER', 2),
+            lease_seconds=getattr(settings, 'GEMINI_LEASE_SECONDS', 300),
+        )
+
+    @staticmethod
+    def usable():
+        """
+        Faux dans une transaction en cours : une place écrite là serait invisible des autres processus
+        jusqu'au commit (et ses index uniques les bloqueraient). L'appel n'a alors que le plafond du processus.
+        """
+        return not connection.in_atomic_block
+
+    def register(self, lane, user_key, timeout):
+        """Inscrit un appel en attente d'une place ; retourne son jeton."""
+        token = uuid.uuid4().hex
+        now = timezone.now()
+        GeminiCallLease.objects.create(
+            token=token, lane=lane, user_key=user_key, registered_at=now,
+            expires_at=now + timedelta(seconds=timeout + WAITING_GRACE_SECONDS),
+        )
+        return token
+
+    def try_claim(self, token, user_key):
+        """
+        Réserve une place pour l'appel inscrit sous token si son rang parmi les inscrits lui en donne une ;
+        faux sinon (places prises, inscrits prioritaires, ou place prise entre-temps : réessayer).
+        """
+        now = timezone.now()
+        rows = list(GeminiCallLease.objects.values(
+            'token', 'lane', 'user_key', 'slot', 'user_slot', 'registered_at', 'expires_at',
+        ))
+        held = [row for row in rows if row['slot'] is not None]
+        if any(row['expires_at'] < now for row in held):
+            # Place d'un processus tué, encore tenue par l'index unique : supprimée avant d'être réattribuée
+            self.purge_expired()
+            return False
+        taken = {row['slot'] for row in held}
+        free = iter(slot for slot in range(self.max_concurrency) if slot not in taken)
+        per_user = Counter(row['user_key'] for row in held if row['user_key'] is not None)
+        user_taken = defaultdict(set)
+        for row in held:
+            if row['user_key'] is not None:
+                user_taken[row['user_key']].add(row['user_slot'])
+
+        waiting = sorted(
+            (row for row in rows if row['slot'] is None and row['expires_at'] >= now),
+            key=lambda row: (row['lane'], per_user[row['user_key']] if row['user_key'] is not None else 0,
+                             row['registered_at'], row['token']),
+        )
+        # Attribution simulée des places libres dans l'ordre des inscrits, jusqu'au nôtre
+        for row in waiting:
+            user_slot = None
+            if row['user_key'] is not None:
+                user_slot = next((slot for slot in range(self.max_per_user)
+                                  if slot not in user_taken[row['user_key']]), None)
+                if user_slot is None:
+                    # Utilisateur à son plafond : ses appels ne passent pas devant les autres
+                    continue
+            slot = next(free, None)
+            if slot is None:
+                return False
+            if row['token'] != token:
+                if user_slot is not None:
+                    user_taken[row['user_key']].add(user_slot)
+                continue
+            try:
+                with transaction.atomic():
+                    claimed = GeminiCallLease.objects.filter(token=token, slot__isnull=True).update(
+                        slot=slot, user_slot=user_slot, expires_at=now + timedelta(seconds=self.lease_seconds),
+                    )
+            except IntegrityError:
+                # Place (ou place de l'utilisateur) prise entre-temps : l'état est relu au prochain essai
+                return False
+            return bool(claimed)
+        # Inscription absente (expirée) ou utilisateur à son plafond
+        return False
+
+    def purge_expired(self):
+        """Supprime les places et inscriptions échues (processus tués, inscriptions abandonnées)."""
+        return GeminiCallLease.objects.filter(expires_at__lt=timezone.now()).delete()[0]
+
+    def release(self, token):
+        GeminiCallLease.objects.filter(token=token).delete()
+
+    def cached_snapshot(self):
+        """État global encore frais (voir snapshot), sans requête ; None s'il faut le relire."""
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._snapshot_at < SNAPSHOT_TTL:
+                return self._snapshot
+        return None
+
+    def snapshot(self):
+        """
+        Appels en vol et en attente d'une place, tous processus confondus :
+        {'in_flight': n, 'waiting': n, 'waiting_by_lane': Counter}. Relu au plus une fois par SNAPSHOT_TTL,
+        après suppression des places échues.
+        """
+        cached = self.cached_snapshot()
+        if cached is not None:
+            return cached
+        self.purge_expired()
+        rows = (
+            GeminiCallLease.objects.filter(expires_at__gte=timezone.now())
+            .values('lane')
+            .annotate(in_flight=Count('id', filter=Q(slot__isnull=False)),
+                      waiting=Count('id', filter=Q(slot__isnull=True)))
+        )
+        waiting_by_lane = Counter()
+        in_flight = 0
+        for row in rows:
+            in_flight += row['in_flight']
+            waiting_by_lane[row['lane']] += row['waiting']
+        snapshot = {
+            'in_flight': in_flight,
+            'waiting': sum(waiting_by_lane.values()),
+            'waiting_by_lane': waiting_by_lane,
+        }
+        with self._lock:
+            self._snapshot, self._snapshot_at = snapshot, time.monotonic()
+        return snapshot
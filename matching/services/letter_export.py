@@ -0,0 +1,146 @@
+"""
+Export en masse des lettres de motivation d'un utilisateur en archive ZIP (vue export_cover_letters_zip).
+
+L'archive est envoyée au fil de l'eau : l'index des lettres (lettres.csv) part immédiatement, puis chaque fichier
+(PDF ou DOCX) dès qu'il est rendu. Les fichiers absents du cache (letter_render) sont rendus dans le pool de
+processus de letter_render, hors du worker qui sert la requête, avec au plus 2 x LETTER_EXPORT_WORKERS rendus en
+cours : la mémoire utilisée ne dépend pas du nombre de lettres. Les fichiers sont stockés sans recompression (PDF
+et DOCX sont déjà compressés) ; une lettre dont le rendu échoue est signalée dans erreurs.txt, en fin d'archive.
+"""
+import asyncio
+import csv
+import io
+import logging
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from ..models import JobMatch
+from . import letter_render
+
+
+logger = logging.getLogger(__name__)
+
+ZIP_INDEX_NAME = 'lettres.csv'
+ZIP_ERRORS_NAME = 'erreurs.txt'
+
+
+class _ZipOutput:
+    """Sortie du ZipFile sans retour en arrière possible : les octets écrits sont repris par take()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def letter_header(user):
+    """Champs de l'en-tête des lettres exportées pour cet utilisateur (hors offre)."""
+    user_name = f"{user.first_name} {user.last_name}".strip() if (user.first_name or user.last_name) else user.username
+    return {
+        'user_name': user_name,
+        'user_email': user.email if user.email else None,
+        'user_address': None,
+        'recipient_name': None,
+    }
+
+
+def letter_filename(job_title, company_name, extension='pdf'):
+    """Nom du fichier exporté : lettre_motivation_<poste>_<entreprise>, sans caractères spéciaux."""
+    filename = f"lettre_motivation_{job_title or 'candidature'}_{company_name or 'entreprise'}"
+    filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_')).strip()
+    return f"{filename.replace(' ', '_')}.{extension}"
+
+
+async def letters_zip_stream(user, status=None, fmt=letter_render.FORMAT_PDF):
+    """
+    Générateur asynchrone des octets de l'archive ZIP des lettres non vides de l'utilisateur au format fmt,
+    filtrées par statut de candidature si status est donné.
+    """
+    matches = JobMatch.objects.filter(user=user).exclude(cover_letter_content='')
+    if status:
+        matches = matches.filter(status=status)
+    rows = [
+        row async for row in matches.order_by('-matched_at', 'pk')
+        .values_list('pk', 'status', 'matched_at', 'job_offer__title', 'job_offer__company_name')
+    ]
+    header = letter_header(user)
+
+    # Noms uniques dans l'archive : numéro d'ordre devant le nom de l'export unitaire
+    names = {pk: f"{position:03d}_{letter_filename(title, company, extension=fmt)}"
+             for position, (pk, _, _, title, company) in enumerate(rows, start=1)}
+    output = _ZipOutput()
+    archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED)
+    index = io.StringIO()
+    writer = csv.writer(index)
+    writer.writerow(['fichier', 'poste', 'entreprise', 'statut', 'date'])
+    for pk, match_status, matched_at, title, company in rows:
+        writer.writerow([names[pk], title, company, match_status, matched_at.date().isoformat()])
+    archive.writestr(ZIP_INDEX_NAME, index.getvalue())
+    yield output.take()
+
+    window = max(1, getattr(settings, 'LETTER_EXPORT_WORKERS', 2)) * 2
+    pending = {}
+    errors = []
+    try:
+        # Textes des lettres lus par lots de la taille de la fenêtre de rendu
+        pks = list(names)
+        for start in range(0, len(pks), window):
+            letters = JobMatch.objects.filter(pk__in=pks[start:start + window]).order_by('-matched_at', 'pk')
+            async for pk, content, title, company in letters.values_list(
+                    'pk', 'cover_letter_content', 'job_offer__title', 'job_offer__company_name'):
+                letter = {'cover_letter_content': content, **header, 'job_title': title, 'company_name': company}
+                key = letter_render.letter_key(fmt=fmt, **letter)
+                data = letter_render.cached(key)
+                if data is not None:
+                    archive.writestr(names[pk], data)
+                    yield output.take()
+                    continue
+                future = asyncio.wrap_future(letter_render.get_pool().submit(letter_render.build, fmt, **letter))
+                pending[future] = (names[pk], key)
+                if len(pending) >= window:
+                    await _write_done(archive, pending, errors)
+                    yield output.take()
+        while pending:
+            await _write_done(archive, pending, errors)
+            yield output.take()
+
+        if errors:
+            archive.writestr(ZIP_ERRORS_NAME, "\n".join(errors) + "\n")
+        archive.close()
+        yield output.take()
+    finally:
+        # Client déconnecté ou erreur : les rendus restants sont abandonnés
+        for future in pending:
+            future.cancel()
+
+
+async def _write_done(archive, pending, errors):
+    """Ajoute à l'archive les fichiers rendus parmi pending (retirés de pending) ; les échecs vont dans errors."""
+    done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+    for future in done:
+        name, key = pending.pop(future)
+        try:
+            data = future.result()
+        except BrokenProcessPool:
+            # Processus de rendu tué : le pool est recréé pour les lettres suivantes
+            letter_render.reset_pool()
+            errors.append(f"{name} : rendu interrompu")
+            continue
+        except Exception as e:
+            logger.warning("Export ZIP : échec du rendu de %s : %s", name, e)
+            errors.append(f"{name} : {e}")
+            continue
+        letter_render.store(key, data)
+        archive.writestr(name, data)
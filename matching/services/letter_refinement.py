@@ -0,0 +1,226 @@
+"""
+Amélioration incrémentale des lettres de motivation, paragraphe par paragraphe.
+
+Au lieu de renvoyer toute la lettre à Gemini pour une réécriture complète, la lettre est découpée en
+paragraphes et seuls ceux à retravailler sont envoyés, accompagnés d'un extrait de leurs voisins pour
+la cohérence ; la réponse (JSON numéroté) est fusionnée dans la lettre.
+
+Paragraphes retravaillés : ceux désignés par l'utilisateur, sinon ceux modifiés depuis la dernière
+amélioration du même type avec les mêmes instructions (empreintes stockées sur le match,
+JobMatch.letter_refinement_hashes, par baseline_key) : une nouvelle consigne porte sur toute la lettre.
+Seuls les types locaux (PARAGRAPH_SCOPED_TYPES) en bénéficient sans désignation explicite ;
+'length' et 'structure' portent toujours sur la lettre entière.
+
+Chaque amélioration produit un rapport de tokens (réécriture complète estimée vs envoyés) agrégé
+par mode (get_refinement_stats).
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict
+
+from .prompt_compactor import estimate_tokens
+
+
+MODE_FULL = 'full'
+MODE_PARAGRAPHS = 'paragraphs'
+MODE_UNCHANGED = 'unchanged'
+
+# Types d'amélioration applicables à un paragraphe isolé
+PARAGRAPH_SCOPED_TYPES = {'grammar', 'tone'}
+# Types qui portent sur l'ensemble de la lettre, même si des paragraphes sont désignés
+LETTER_SCOPED_TYPES = {'length', 'structure'}
+
+# Extrait des paragraphes voisins envoyé comme contexte
+CONTEXT_CHARS = 200
+
+_paragraph_split_re = re.compile(r'\n\s*\n')
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'calls': 0, 'tokens_full': 0, 'tokens_sent': 0})
+
+
+def split_paragraphs(text):
+    return [p.strip() for p in _paragraph_split_re.split((text or '').strip()) if p.strip()]
+
+
+def join_paragraphs(paragraphs):
+    return "\n\n".join(paragraphs)
+
+
+def paragraph_hash(paragraph):
+    normalized = re.sub(r'\s+', ' ', paragraph).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def baseline_key(improvement_type, instructions):
+    """
+    Clé des empreintes d'une amélioration : son type et ses instructions finales. Une même consigne déjà
+    appliquée n'a rien à reprendre sur les paragraphes inchangés ; une consigne différente (texte libre
+    du formulaire) n'est jamais comparée aux empreintes d'une autre.
+    """
+    normalized = re.sub(r'\s+', ' ', instructions or '').strip()
+    return f"{improvement_type}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]}"
+
+
+def updated_baselines(baselines, improvement_type, instructions, letter):
+    """
+    Empreintes des paragraphes de la lettre améliorée, enregistrées pour ce type et ces instructions ; elles
+    remplacent celles des instructions précédentes du même type (une seule clé par type sur le match).
+    """
+    key = baseline_key(improvement_type, instructions)
+    baselines = {
+        name: hashes for name, hashes in (baselines or {}).items()
+        if name.split(':', 1)[0] != improvement_type
+    }
+    baselines[key] = [paragraph_hash(p) for p in split_paragraphs(letter)]
+    return baselines
+
+
+def parse_targets(value):
+    """Numéros de paragraphes désignés ("2,4" ou liste, à partir de 1) → indices (à partir de 0)."""
+    if not value:
+        return None
+    items = value.split(',') if isinstance(value, str) else value
+    targets = set()
+    for item in items:
+        try:
+            number = int(str(item).strip())
+        except ValueError:
+            continue
+        if number >= 1:
+            targets.add(number - 1)
+    return sorted(targets) or None
+
+
+def plan(letter, improvement_type, instructions, baselines=None, targets=None):
+    """
+    Choisit le mode d'amélioration et les paragraphes concernés (instructions : instructions finales,
+    voir baseline_key). Retourne (mode, paragraphes, indices ciblés).
+    """
+    paragraphs = split_paragraphs(letter)
+    if improvement_type in LETTER_SCOPED_TYPES or len(paragraphs) < 2:
+        return MODE_FULL, paragraphs, list(range(len(paragraphs)))
+    if targets:
+        selected = [i for i in targets if i < len(paragraphs)]
+    elif improvement_type in PARAGRAPH_SCOPED_TYPES:
+        baseline = (baselines or {}).get(baseline_key(improvement_type, instructions))
+        if baseline is None:
+            selected = list(range(len(paragraphs)))
+        else:
+            known = set(baseline)
+            selected = [i for i, p in enumerate(paragraphs) if paragraph_hash(p) not in known]
+            if not selected:
+                return MODE_UNCHANGED, paragraphs, []
+    else:
+        selected = list(range(len(paragraphs)))
+    if not selected or len(selected) == len(paragraphs):
+        # Tous les paragraphes à reprendre : la réécriture complète coûte autant et reste plus cohérente
+        return MODE_FULL, paragraphs, list(range(len(paragraphs)))
+    return MODE_PARAGRAPHS, paragraphs, selected
+
+
+def build_prompt(paragraphs, targets, instructions):
+    """Prompt ne contenant que les paragraphes ciblés et un extrait de leurs voisins non ciblés."""
+    targets = set(targets)
+    context = set()
+    for i in targets:
+        context.update(j for j in (i - 1, i + 1) if 0 <= j < len(paragraphs) and j not in targets)
+    blocks = []
+    for i in sorted(targets | context):
+        if i in targets:
+            blocks.append(f"[À AMÉLIORER {i + 1}]\n{paragraphs[i]}")
+        else:
+            excerpt = paragraphs[i]
+            if len(excerpt) > CONTEXT_CHARS:
+                excerpt = excerpt[:CONTEXT_CHARS].rsplit(' ', 1)[0] + ' […]'
+            blocks.append(f"[CONTEXTE {i + 1}]\n{excerpt}")
+    numbers = ', '.join(str(i + 1) for i in sorted(targets))
+
+    return f"""Tu es un expert en rédaction de lettres de motivation professionnelles.
+Améliore UNIQUEMENT les paragraphes marqués [À AMÉLIORER] d'une lettre de motivation, selon les instructions.
+Les extraits [CONTEXTE] sont les paragraphes voisins, fournis pour la cohérence : ne les modifie pas et ne les renvoie pas.
+
+PARAGRAPHES :
+---
+{chr(10).join(blocks)}
+---
+
+INSTRUCTIONS D'AMÉLIORATION :
+{instructions}
+
+RÈGLES STRICTES À SUIVRE :
+1. Conserve TOUTES les informations factuelles (noms d'entreprises, dates, compétences mentionnées)
+2. Chaque paragraphe amélioré reste un seul paragraphe, qui s'enchaîne naturellement avec ses voisins
+3. Applique uniquement les améliorations demandées dans les instructions
+4. Réponds UNIQUEMENT avec un JSON valide, sans markdown : {{"paragraphs": {{"<numéro>": "paragraphe amélioré"}}}}
+   avec exactement les numéros {numbers}
+"""
+
+
+def merge(paragraphs, targets, response_text):
+    """
+    Remplace les paragraphes ciblés par ceux de la réponse.
+
+    Raises:
+        ValueError: Réponse illisible ou paragraphe ciblé absent
+    """
+    text = response_text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1]
+    if text.endswith('```'):
+        text = text[:-3]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        found = re.search(r'\{[\s\S]*\}', text)
+        if not found:
+            raise ValueError("Réponse de l'amélioration par paragraphe illisible")
+        data = json.loads(found.group(0))
+    refined = data.get('paragraphs') if isinstance(data, dict) else None
+    if not isinstance(refined, dict):
+        raise ValueError("Réponse de l'amélioration par paragraphe sans paragraphes")
+
+    merged = list(paragraphs)
+    for i in targets:
+        value = refined.get(str(i + 1))
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"Paragraphe {i + 1} absent de la réponse")
+        # Un paragraphe reste un paragraphe : pas de ligne vide introduite par le modèle
+        merged[i] = _paragraph_split_re.sub('\n', value.strip())
+    return merged
+
+
+def report(mode, paragraphs, targets, full_prompt, sent_prompt=None, output_text=''):
+    """
+    Rapport de tokens : réécriture complète estimée (prompt complet + lettre entière en sortie)
+    comparée aux tokens réellement échangés.
+    """
+    letter = join_paragraphs(paragraphs)
+    tokens_full = estimate_tokens(full_prompt) + estimate_tokens(letter)
+    if mode == MODE_UNCHANGED:
+        tokens_sent = 0
+    elif mode == MODE_PARAGRAPHS:
+        tokens_sent = estimate_tokens(sent_prompt) + estimate_tokens(output_text)
+    else:
+        tokens_sent = tokens_full
+    result = {
+        'mode': mode,
+        'paragraphs': [i + 1 for i in targets],
+        'total_paragraphs': len(paragraphs),
+        'tokens_full': tokens_full,
+        'tokens_sent': tokens_sent,
+        'tokens_saved': tokens_full - tokens_sent,
+    }
+    with _stats_lock:
+        stats = _stats[mode]
+        stats['calls'] += 1
+        stats['tokens_full'] += tokens_full
+        stats['tokens_sent'] += tokens_sent
+    return result
+
+
+def get_refinement_stats():
+    """Améliorations par mode depuis le démarrage du processus (tokens réécriture complète vs envoyés)."""
+    with _stats_lock:
+        return {mode: dict(values) for mode, values in _stats.items()}
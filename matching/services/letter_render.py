@@ -0,0 +1,329 @@
+"""
+Rendu des lettres de motivation en fichiers (PDF, DOCX), séparé du générateur IA (ai_letter_generator.py) pour être
+importable sans les modèles Django : les exports en masse (letter_export.py) rendent les lettres dans un pool
+de processus démarrés par 'spawn' (LETTER_EXPORT_WORKERS).
+
+Styles et police du PDF, comme le document modèle du DOCX, sont préparés une fois par processus au chargement
+du module : chaque DOCX part d'une copie en mémoire du modèle, sans relire ni analyser de fichier. Les fichiers
+rendus sont gardés dans un cache du processus, indexé par l'empreinte de la lettre (letter_key : format, contenu,
+champs de l'en-tête, version de la mise en page), du moins au plus récemment servi et borné en taille
+(LETTER_PDF_CACHE_MAX_MB, fichiers des deux formats).
+Temps de rendu et mémoire par lettre : python manage.py bench_letter_export.
+"""
+import copy
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Cm, Mm, Pt
+from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_PDF = 'pdf'
+FORMAT_DOCX = 'docx'
+CONTENT_TYPES = {
+    FORMAT_PDF: 'application/pdf',
+    FORMAT_DOCX: 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+# Mise en page des lettres exportées en PDF. À incrémenter à chaque changement de mise en page (styles,
+# marges, contenu de l'en-tête) : les PDF déjà en cache ne sont plus servis
+PDF_TEMPLATE_VERSION = 1
+
+PDF_FONT_NAME = 'LetterFont'
+
+# Mise en page des lettres exportées en DOCX, même règle que PDF_TEMPLATE_VERSION
+DOCX_TEMPLATE_VERSION = 1
+
+# Styles de paragraphe des lettres DOCX, ajoutés au modèle s'il ne les définit pas déjà
+DOCX_TITLE_STYLE = 'Lettre - Objet'
+DOCX_BODY_STYLE = 'Lettre - Corps'
+
+# Caractères de contrôle refusés par le XML du DOCX (sauts de page, restes de l'extraction des PDF...)
+_XML_INVALID_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Champs de l'en-tête d'une lettre, dans l'ordre de l'empreinte
+HEADER_FIELDS = ('user_name', 'user_email', 'user_address', 'job_title', 'company_name', 'recipient_name')
+
+
+def _register_pdf_fonts():
+    """
+    Police TTF des lettres (LETTER_PDF_FONT et sa variante grasse LETTER_PDF_FONT_BOLD), enregistrée une fois
+    au chargement du module ; Helvetica (police standard, non embarquée) sinon. Retourne (normale, grasse).
+    """
+    path = getattr(settings, 'LETTER_PDF_FONT', None)
+    if not path:
+        return 'Helvetica', 'Helvetica-Bold'
+    bold = f'{PDF_FONT_NAME}-Bold'
+    try:
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+        pdfmetrics.registerFont(TTFont(bold, getattr(settings, 'LETTER_PDF_FONT_BOLD', None) or path))
+    except Exception as e:
+        logger.warning("Police %s inutilisable pour les lettres PDF (%s) : Helvetica utilisée", path, e)
+        return 'Helvetica', 'Helvetica-Bold'
+    # <b> dans les paragraphes : variante grasse de la même famille
+    pdfmetrics.registerFontFamily(PDF_FONT_NAME, normal=PDF_FONT_NAME, bold=bold, italic=PDF_FONT_NAME,
+                                  boldItalic=bold)
+    return PDF_FONT_NAME, bold
+
+
+def _build_pdf_styles(font, bold_font):
+    """Styles des lettres PDF : en-tête (nom, adresse...), objet, corps et signature."""
+    styles = getSampleStyleSheet()
+    return {
+        'header': ParagraphStyle(
+            'CustomHeader', parent=styles['Normal'], fontName=font, fontSize=10, textColor='black',
+            alignment=TA_LEFT, spaceAfter=12,
+        ),
+        'title': ParagraphStyle(
+            'CustomTitle', parent=styles['Heading2'], fontName=bold_font, fontSize=12, textColor='black',
+            alignment=TA_LEFT, spaceAfter=12, spaceBefore=12,
+        ),
+        'body': ParagraphStyle(
+            'CustomBody', parent=styles['Normal'], fontName=font, fontSize=11, textColor='black',
+            alignment=TA_JUSTIFY, spaceAfter=12, leading=14,
+        ),
+        'signature': ParagraphStyle(
+            'CustomSignature', parent=styles['Normal'], fontName=font, fontSize=11, textColor='black',
+            alignment=TA_LEFT, spaceBefore=24,
+        ),
+    }
+
+
+def _load_docx_template():
+    """
+    Document modèle des lettres DOCX, chargé une fois au chargement du module : LETTER_DOCX_TEMPLATE (papier à
+    en-tête, police de l'entreprise...) dont le contenu précède la lettre, ou document vierge A4 aux marges du PDF.
+    Retourne (document, empreinte du fichier modèle ou None).
+    """
+    path = getattr(settings, 'LETTER_DOCX_TEMPLATE', None)
+    document = fingerprint = None
+    if path:
+        try:
+            with open(path, 'rb') as f:
+                source = f.read()
+            document = Document(BytesIO(source))
+            fingerprint = hashlib.sha256(source).hexdigest()
+        except Exception as e:
+            logger.warning("Modèle %s inutilisable pour les lettres DOCX (%s) : modèle vierge utilisé", path, e)
+            document = None
+    if document is None:
+        document = Document()
+        section = document.sections[0]
+        section.page_width, section.page_height = Mm(210), Mm(297)
+        section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = Cm(2)
+
+    styles = document.styles
+    names = {style.name for style in styles}
+    if DOCX_TITLE_STYLE not in names:
+        title = styles.add_style(DOCX_TITLE_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        title.base_style = styles['Normal']
+        title.font.bold = True
+        title.font.size = Pt(12)
+        title.paragraph_format.space_before = title.paragraph_format.space_after = Pt(12)
+    if DOCX_BODY_STYLE not in names:
+        body = styles.add_style(DOCX_BODY_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        body.base_style = styles['Normal']
+        body.font.size = Pt(11)
+        body.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        body.paragraph_format.space_after = Pt(12)
+        body.paragraph_format.line_spacing = Pt(14)
+    # Propriétés du document créées dès maintenant : les copies n'écrivent jamais dans le modèle partagé
+    document.core_properties.author = ''
+    return document, fingerprint
+
+
+# Construits une fois par processus, partagés par tous les exports (lecture seule pendant le rendu)
+PDF_FONTS = _register_pdf_fonts()
+PDF_STYLES = _build_pdf_styles(*PDF_FONTS)
+DOCX_TEMPLATE, DOCX_TEMPLATE_ID = _load_docx_template()
+
+# Éléments de l'empreinte propres à chaque format : ce qui change la mise en page des fichiers rendus
+_LAYOUTS = {
+    FORMAT_PDF: (PDF_TEMPLATE_VERSION, PDF_FONTS),
+    FORMAT_DOCX: (FORMAT_DOCX, DOCX_TEMPLATE_VERSION, DOCX_TEMPLATE_ID),
+}
+
+# Fichiers déjà rendus (empreinte -> octets), du moins au plus récemment servi ; taille totale bornée par
+# LETTER_PDF_CACHE_MAX_MB, les plus anciens sont évincés
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_size = 0
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def letter_key(cover_letter_content, fmt=FORMAT_PDF, **header):
+    """
+    Empreinte du fichier d'une lettre au format fmt : contenu, champs de l'en-tête et mise en page du format
+    (version, police du PDF, modèle du DOCX). Sert de clé au cache des fichiers rendus et d'ETag à la vue d'export.
+    """
+    payload = json.dumps(
+        [*_LAYOUTS[fmt], cover_letter_content, *(header.get(field) for field in HEADER_FIELDS)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cached(key):
+    """Fichier rendu en cache pour cette empreinte (None si absent)."""
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+        return data
+
+
+def store(key, data):
+    global _cache_size
+    max_size = getattr(settings, 'LETTER_PDF_CACHE_MAX_MB', 16) * 1024 * 1024
+    if len(data) > max_size:
+        return
+    with _cache_lock:
+        previous = _cache.pop(key, None)
+        _cache_size -= len(previous) if previous is not None else 0
+        _cache[key] = data
+        _cache_size += len(data)
+        while _cache_size > max_size:
+            _, evicted = _cache.popitem(last=False)
+            _cache_size -= len(evicted)
+
+
+def build_pdf(cover_letter_content, user_name=None, user_email=None, user_address=None, job_title=None,
+              company_name=None, recipient_name=None) -> bytes:
+    """Rendu reportlab de la lettre avec les styles préchargés (PDF_STYLES), sans passer par le cache."""
+    # Créer un buffer en mémoire pour le PDF
+    buffer = BytesIO()
+
+    # Créer le document PDF
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm,
+        # Sortie identique pour une même lettre (date et identifiant du document fixes) : l'ETag vaut
+        # pour tous les processus
+        invariant=True,
+    )
+    title_style = PDF_STYLES['title']
+    body_style = PDF_STYLES['body']
+
+    # Construire le contenu du PDF
+    story = []
+
+    # Objet
+    if job_title:
+        story.append(Paragraph(f"<b>Objet : Candidature pour le poste de {job_title}</b>", title_style))
+        story.append(Spacer(1, 0.3*cm))
+
+    # Corps de la lettre
+    # Convertir le texte en paragraphes (séparés par des sauts de ligne doubles)
+    paragraphs = cover_letter_content.split('\n\n')
+
+    for para in paragraphs:
+        para = para.strip()
+        if para:
+            # Remplacer les sauts de ligne simples par <br/>
+            para_html = para.replace('\n', '<br/>')
+            # Échapper les caractères HTML spéciaux et convertir en paragraphe
+            story.append(Paragraph(para_html, body_style))
+            story.append(Spacer(1, 0.3*cm))
+
+    # Générer le PDF
+    try:
+        doc.build(story)
+        return buffer.getvalue()
+    except Exception as e:
+        raise Exception(f"Erreur lors de la génération du PDF : {str(e)}")
+
+
+def build_docx(cover_letter_content, user_name=None, user_email=None, user_address=None, job_title=None,
+               company_name=None, recipient_name=None) -> bytes:
+    """Rendu python-docx de la lettre dans une copie du modèle préchargé (DOCX_TEMPLATE), sans passer par le cache."""
+    # Copie de l'arbre XML déjà chargé : ni lecture de l'archive du modèle ni analyse de ses parties
+    document = copy.deepcopy(DOCX_TEMPLATE)
+    document.core_properties.author = user_name or ''
+    document.core_properties.title = (
+        f"Lettre de motivation - {job_title}" if job_title else "Lettre de motivation"
+    )
+
+    # Objet
+    if job_title:
+        document.add_paragraph(_docx_text(f"Objet : Candidature pour le poste de {job_title}"),
+                               style=DOCX_TITLE_STYLE)
+
+    # Corps de la lettre : paragraphes séparés par des sauts de ligne doubles, sauts simples conservés
+    for para in cover_letter_content.split('\n\n'):
+        para = para.strip()
+        if para:
+            run = document.add_paragraph(style=DOCX_BODY_STYLE).add_run()
+            for index, line in enumerate(_docx_text(para).split('\n')):
+                if index:
+                    run.add_break()
+                run.add_text(line)
+
+    buffer = BytesIO()
+    try:
+        document.save(buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        raise Exception(f"Erreur lors de la génération du DOCX : {str(e)}")
+
+
+def _docx_text(text):
+    return _XML_INVALID_RE.sub('', text)
+
+
+_BUILDERS = {FORMAT_PDF: build_pdf, FORMAT_DOCX: build_docx}
+
+
+def build(fmt, cover_letter_content, **header) -> bytes:
+    """Rendu de la lettre au format fmt (FORMAT_PDF ou FORMAT_DOCX), sans passer par le cache."""
+    return _BUILDERS[fmt](cover_letter_content, **header)
+
+
+def get_pool():
+    """
+    Pool de processus de rendu des exports en masse du processus courant, créé au premier usage.
+    Processus démarrés par 'spawn' : rien n'est hérité du worker (connexions base, clients gRPC).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'LETTER_EXPORT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
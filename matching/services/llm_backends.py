@@ -0,0 +1,371 @@
+"""
+Backends des modèles de langage utilisés par gemini_client.get_model.
+
+LLM_BACKEND choisit l'implémentation : 'gemini' (google.generativeai, par défaut) ou 'stub', un modèle local
+déterministe pour les benchmarks et les tests de charge sans clé ni réseau. Un chemin pointé
+('monpaquet.module.MonBackend') permet d'en brancher un autre.
+
+Un backend expose create_model(model_name, **model_kwargs), qui retourne un objet compatible avec
+genai.GenerativeModel (generate_content, generate_content_async, stream=True) ; les appels restent
+enveloppés par GeminiModel (répartiteur, comptage).
+Il gère aussi les contextes mis en cache côté fournisseur (voir context_cache) : create_cached_context,
+model_from_cached_context et delete_cached_context. Un contexte expiré ou supprimé lève NotFound à l'appel.
+
+Le stub reconnaît le type de prompt (analyse de CV, CV Optimizer, génération ou amélioration de lettre,
+entière ou par paragraphe) et renvoie une réponse au bon format, construite à partir du prompt :
+même prompt, même réponse.
+Latence et pannes sont réglables par LLM_STUB (latency_ms, jitter_ms, stream_chunk_ms, failure_rate,
+quota_error_rate, seed). Ses contextes en cache sont gardés en mémoire et expirent comme ceux de Gemini.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import google.generativeai as genai
+from google.generativeai import caching
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from google.api_core import exceptions as google_exceptions
+
+from .prompt_compactor import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STUB_CONFIG = {
+    'latency_ms': 800,
+    'jitter_ms': 200,
+    'stream_chunk_ms': 40,
+    'failure_rate': 0.0,
+    'quota_error_rate': 0.0,
+    'seed': 0,
+}
+
+_lock = threading.Lock()
+_backends = {}
+
+
+class GeminiBackend:
+    """Modèles google.generativeai ; la clé API est configurée une fois par processus."""
+
+    name = 'gemini'
+
+    def __init__(self):
+        self._configured_key = None
+
+    def create_model(self, model_name, **model_kwargs):
+        """
+        Raises:
+            ValueError: Si GEMINI_API_KEY n'est pas définie
+        """
+        self._configure()
+        return genai.GenerativeModel(model_name, **model_kwargs)
+
+    def create_cached_context(self, model_name, contents, system_instruction=None, ttl_seconds=3600,
+                              display_name=None):
+        """Crée un contexte mis en cache par Gemini ; retourne (nom, date d'expiration)."""
+        self._configure()
+        cached = caching.CachedContent.create(
+            model=model_name, display_name=display_name, system_instruction=system_instruction,
+            contents=contents, ttl=timedelta(seconds=ttl_seconds),
+        )
+        return cached.name, cached.expire_time
+
+    def model_from_cached_context(self, name, **model_kwargs):
+        self._configure()
+        return genai.GenerativeModel.from_cached_content(name, **model_kwargs)
+
+    def delete_cached_context(self, name):
+        self._configure()
+        caching.CachedContent.get(name).delete()
+
+    def _configure(self):
+        from .gemini_client import get_api_key
+
+        api_key = get_api_key()
+        if not api_key:
+            raise ValueError(
+                "GEMINI_API_KEY manquant. "
+                "Définissez la variable d'environnement GEMINI_API_KEY ou dans settings.py"
+            )
+        if self._configured_key != api_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+
+    def cache_namespace(self, model_name):
+        return model_name
+
+    def warm_up(self):
+        from google.generativeai import client as genai_client
+        genai_client.get_default_generative_client()
+
+
+class StubBackend:
+    """Modèle local déterministe (voir StubModel), configuré par LLM_STUB."""
+
+    name = 'stub'
+
+    def __init__(self):
+        self._contexts = {}
+        self._contexts_lock = threading.Lock()
+
+    def create_model(self, model_name, **model_kwargs):
+        return StubModel(model_name, self._config())
+
+    def create_cached_context(self, model_name, contents, system_instruction=None, ttl_seconds=3600,
+                              display_name=None):
+        time.sleep(self._config()['latency_ms'] / 1000)
+        name = f"cachedContents/stub-{uuid.uuid4().hex[:12]}"
+        expire_time = timezone.now() + timedelta(seconds=ttl_seconds)
+        text = '\n\n'.join([system_instruction or '', *(str(part) for part in contents)]).strip()
+        with self._contexts_lock:
+            self._contexts[name] = (text, expire_time)
+        return name, expire_time
+
+    def model_from_cached_context(self, name, **model_kwargs):
+        self.cached_context(name)
+        return StubModel(name, self._config(), context=(self, name))
+
+    def delete_cached_context(self, name):
+        with self._contexts_lock:
+            self._contexts.pop(name, None)
+
+    def cached_context(self, name):
+        """
+        Texte et expiration d'un contexte en cache.
+
+        Raises:
+            google_exceptions.NotFound: Contexte inconnu, supprimé ou expiré
+        """
+        with self._contexts_lock:
+            entry = self._contexts.get(name)
+            if entry is not None and entry[1] <= timezone.now():
+                del self._contexts[name]
+                entry = None
+        if entry is None:
+            raise google_exceptions.NotFound(f"Stub : contexte {name} introuvable ou expiré")
+        return entry
+
+    @staticmethod
+    def _config():
+        return {**DEFAULT_STUB_CONFIG, **getattr(settings, 'LLM_STUB', {})}
+
+    def cache_namespace(self, model_name):
+        # Les réponses du stub ne doivent jamais être servies à la place de celles de Gemini
+        return f"stub/{model_name}"
+
+    def warm_up(self):
+        pass
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def get_backend(name=None):
+    """Backend configuré (LLM_BACKEND), instancié une fois par processus."""
+    name = name or getattr(settings, 'LLM_BACKEND', GeminiBackend.name)
+    backend = _backends.get(name)
+    if backend is None:
+        with _lock:
+            backend = _backends.get(name)
+            if backend is None:
+                backend_class = BACKENDS.get(name) or import_string(name)
+                backend = _backends[name] = backend_class()
+    return backend
+
+
+def reset_backends():
+    """Oublie les backends instanciés (processus forké, changement de configuration)."""
+    with _lock:
+        _backends.clear()
+
+
+class StubResponse:
+    """
+    Réponse au format de google.generativeai (text, candidates[0].content.parts[0].text, usage_metadata).
+    usage : (tokens du prompt, de la réponse, lus depuis le contexte en cache), estimés.
+    """
+
+    def __init__(self, text, usage=None):
+        self.text = text
+        part = type('Part', (), {'text': text})()
+        content = type('Content', (), {'parts': [part]})()
+        self.candidates = [type('Candidate', (), {'content': content})()]
+        self.usage_metadata = None
+        if usage is not None:
+            self.usage_metadata = type('UsageMetadata', (), {
+                'prompt_token_count': usage[0],
+                'candidates_token_count': usage[1],
+                'cached_content_token_count': usage[2],
+            })()
+
+
+class StubStream:
+    """Réponse en streaming : fragments de quelques mots, espacés de stream_chunk_ms."""
+
+    def __init__(self, text, chunk_delay, usage=None):
+        self._chunks = re.findall(r'\S+\s*|\s+', text)
+        self._chunk_delay = chunk_delay
+        self._usage = usage
+
+    async def __aiter__(self):
+        for start in range(0, len(self._chunks), 4):
+            await asyncio.sleep(self._chunk_delay)
+            # Comme Gemini, le dernier fragment porte l'usage de tout l'appel
+            last = start + 4 >= len(self._chunks)
+            yield StubResponse(''.join(self._chunks[start:start + 4]), self._usage if last else None)
+
+
+class StubModel:
+    """
+    Remplaçant local de genai.GenerativeModel : latence simulée, pannes injectées
+    (erreur générique ou erreur de quota, réessayée par le répartiteur) et réponses au format attendu.
+    context : (backend, nom) d'un contexte en cache, ajouté devant chaque prompt tant qu'il n'a pas expiré.
+    """
+
+    SKILLS = (
+        'Python', 'Django', 'SQL', 'PostgreSQL', 'Docker', 'JavaScript', 'React', 'Git', 'Java',
+        'Excel', 'Linux', 'AWS', 'Communication', 'Gestion de projet', 'Anglais',
+    )
+
+    def __init__(self, model_name, config, context=None):
+        self.model_name = model_name
+        self.config = config
+        self.context = context
+        self._random = random.Random(config['seed'])
+        self._random_lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self._latency())
+        self._maybe_fail()
+        full_prompt = self._with_context(prompt)
+        text = self.render(full_prompt)
+        return StubResponse(text, self._usage(prompt, full_prompt, text))
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        full_prompt = self._with_context(prompt)
+        text = self.render(full_prompt)
+        usage = self._usage(prompt, full_prompt, text)
+        if stream:
+            return StubStream(text, self.config['stream_chunk_ms'] / 1000, usage)
+        return StubResponse(text, usage)
+
+    def render(self, prompt):
+        """Réponse déterministe au format attendu par l'appelant, déduit du prompt."""
+        prompt = str(prompt)
+        if '"missing_keywords"' in prompt:
+            return self._optimizer_response(prompt)
+        if '"job_title"' in prompt:
+            return self._parser_response(prompt)
+        if '[À AMÉLIORER' in prompt:
+            return self._refined_paragraphs(prompt)
+        if 'LETTRE ACTUELLE' in prompt:
+            return self._refined_letter(prompt)
+        return self._generated_letter(prompt)
+
+    def _with_context(self, prompt):
+        if self.context is None:
+            return prompt
+        backend, name = self.context
+        text, _ = backend.cached_context(name)
+        return f"{text}\n\n{prompt}"
+
+    @staticmethod
+    def _usage(prompt, full_prompt, text):
+        prompt_tokens = estimate_tokens(full_prompt)
+        return prompt_tokens, estimate_tokens(text), prompt_tokens - estimate_tokens(str(prompt))
+
+    def _latency(self):
+        with self._random_lock:
+            jitter = self._random.uniform(-1, 1) * self.config['jitter_ms']
+        return max(0.0, self.config['latency_ms'] + jitter) / 1000
+
+    def _maybe_fail(self):
+        with self._random_lock:
+            draw = self._random.random()
+        if draw < self.config['quota_error_rate']:
+            raise google_exceptions.ResourceExhausted("Stub : quota dépassé (erreur injectée)")
+        if draw < self.config['quota_error_rate'] + self.config['failure_rate']:
+            raise RuntimeError("Stub : erreur injectée")
+
+    def _skills_in(self, text):
+        lowered = text.lower()
+        return [skill for skill in self.SKILLS if skill.lower() in lowered]
+
+    def _parser_response(self, prompt):
+        cv_text = prompt.split('Texte du CV :', 1)[-1]
+        lines = [line.strip() for line in cv_text.splitlines() if line.strip()]
+        job_title = lines[0][:60] if lines else None
+        return json.dumps({'job_title': job_title, 'skills': self._skills_in(cv_text)}, ensure_ascii=False)
+
+    def _optimizer_response(self, prompt):
+        cv_part, _, offer_part = prompt.partition('DOCUMENT 2')
+        offer_part = offer_part.split('Analyse les deux documents', 1)[0]
+        cv_words = set(re.findall(r'\w{4,}', cv_part.lower()))
+        missing = []
+        for word in re.findall(r'\w{5,}', offer_part):
+            if word.lower() not in cv_words and word not in missing and not word.isdigit():
+                missing.append(word)
+        title = _search(r'Titre du poste : (.+)', offer_part) or 'ce poste'
+        skills = self._skills_in(cv_part)[:3] or ['vos compétences']
+        return json.dumps({
+            'missing_keywords': missing[:8],
+            'suggested_summary': (
+                f"Candidat motivé pour le poste de {title}, avec une expérience en {', '.join(skills)}. "
+                f"Prêt à mettre ces compétences au service de vos projets."
+            ),
+            'experience_suggestions': [
+                {'experience': 'Expérience la plus récente',
+                 'suggestion': f"Mettre en avant {missing[0] if missing else skills[0]} et les résultats obtenus."},
+            ],
+        }, ensure_ascii=False)
+
+    def _generated_letter(self, prompt):
+        title = _search(r'poste de : (.+)', prompt) or 'ce poste'
+        company = _search(r"Chez l'entreprise : (.+)", prompt) or 'votre entreprise'
+        skills = self._skills_in(prompt)[:4] or ['mes compétences']
+        variant = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % 3
+        hooks = (
+            f"Votre offre pour le poste de {title} chez {company} a retenu toute mon attention.",
+            f"C'est avec un vif intérêt que je vous adresse ma candidature au poste de {title} chez {company}.",
+            f"Rejoindre {company} en tant que {title} correspond pleinement à mon projet professionnel.",
+        )
+        return (
+            "Madame, Monsieur,\n\n"
+            f"{hooks[variant]}\n\n"
+            f"Au cours de mon parcours, j'ai développé des compétences en {', '.join(skills)}, "
+            "que je souhaite mettre au service de vos équipes.\n\n"
+            "Rigoureux et curieux, j'apprécie le travail en équipe et les nouveaux défis.\n\n"
+            "Je serais heureux de vous exposer ma motivation lors d'un entretien.\n\n"
+            "Bien cordialement"
+        )
+
+    def _refined_letter(self, prompt):
+        letter = prompt.split('LETTRE ACTUELLE :', 1)[1].split('---', 2)[1]
+        paragraphs = [re.sub(r'[ \t]+', ' ', p).strip() for p in letter.strip().split('\n\n')]
+        return '\n\n'.join(p for p in paragraphs if p)
+
+    def _refined_paragraphs(self, prompt):
+        blocks = re.findall(r'\[À AMÉLIORER (\d+)\]\n(.*?)(?=\n\[|\n---)', prompt, re.DOTALL)
+        return json.dumps(
+            {'paragraphs': {number: re.sub(r'\s+', ' ', text).strip() for number, text in blocks}},
+            ensure_ascii=False,
+        )
+
+
+def _search(pattern, text):
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else None
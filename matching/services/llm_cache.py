@@ -0,0 +1,138 @@
+"""
+Cache des réponses IA adressé par contenu.
+
+La clé est le hash SHA-256 de (fonctionnalité, modèle, version du prompt, entrées normalisées) :
+le même CV et la même offre donnent la même clé, et changer le prompt (PROMPT_VERSION) ou le modèle
+invalide naturellement les anciennes réponses. Les résultats déjà analysés (dict JSON) sont stockés
+en base (LLMCacheEntry) avec une durée de vie et une éviction LRU.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import LLMCacheEntry, LLMCacheStat
+from . import telemetry
+from .llm_backends import get_backend
+
+
+logger = logging.getLogger(__name__)
+
+# Fonctionnalités mises en cache
+FEATURE_CV_OPTIMIZER = 'cv_optimizer'
+FEATURE_CV_PARSER = 'cv_parser'
+
+# Probabilité de lancer l'éviction à chaque écriture (évite un COUNT(*) systématique)
+PRUNE_PROBABILITY = 0.01
+
+_whitespace_re = re.compile(r'\s+')
+
+
+def normalize(value):
+    """Normalise une entrée : espaces multiples réduits, bords supprimés."""
+    if value is None:
+        return ''
+    return _whitespace_re.sub(' ', str(value)).strip()
+
+
+def make_key(feature, model_name, prompt_version, *inputs):
+    # Espace de noms du backend : les réponses du stub ne remplacent jamais celles de Gemini
+    model_name = get_backend().cache_namespace(model_name)
+    material = json.dumps(
+        [feature, model_name, prompt_version, [normalize(value) for value in inputs]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def is_enabled():
+    return getattr(settings, 'LLM_CACHE_ENABLED', True)
+
+
+def lookup(feature, key):
+    """
+    Retourne le résultat en cache (ou None) et comptabilise le succès / l'échec de la fonctionnalité.
+    Un succès rafraîchit last_used_at (LRU).
+    """
+    if not is_enabled():
+        return None
+    now = timezone.now()
+    entry = LLMCacheEntry.objects.filter(key=key, expires_at__gt=now).only('pk', 'model_name', 'result').first()
+    if entry is None:
+        _record(feature, hit=False)
+        return None
+    LLMCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=now)
+    _record(feature, hit=True)
+    telemetry.record_cache_hit(feature, entry.model_name)
+    return entry.result
+
+
+def store(feature, key, model_name, result, ttl=None):
+    """Enregistre (ou remplace) le résultat d'un appel IA."""
+    if not is_enabled():
+        return
+    ttl = ttl if ttl is not None else getattr(settings, 'LLM_CACHE_TTL', 30 * 24 * 3600)
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            LLMCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    'feature': feature,
+                    'model_name': model_name,
+                    'result': result,
+                    'last_used_at': now,
+                    'expires_at': now + timedelta(seconds=ttl),
+                },
+            )
+    except IntegrityError:
+        # Deux requêtes ont calculé la même réponse en parallèle : la première écriture suffit
+        pass
+    if random.random() < PRUNE_PROBABILITY:
+        prune()
+
+
+def prune(max_entries=None):
+    """
+    Supprime les entrées expirées puis, au-delà de max_entries (LLM_CACHE_MAX_ENTRIES),
+    les moins récemment utilisées. Retourne le nombre d'entrées supprimées.
+    """
+    max_entries = max_entries if max_entries is not None else getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10000)
+    deleted, _ = LLMCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+    excess = LLMCacheEntry.objects.count() - max_entries
+    if excess > 0:
+        oldest = list(LLMCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:excess])
+        evicted, _ = LLMCacheEntry.objects.filter(pk__in=oldest).delete()
+        deleted += evicted
+    if deleted:
+        logger.info("Cache IA : %s entrée(s) supprimée(s)", deleted)
+    return deleted
+
+
+def cache_hit_consumes_credit(user, feature):
+    """
+    Politique de facturation d'une réponse servie depuis le cache.
+    LLM_CACHE_HIT_CONSUMES_CREDIT vaut un booléen global ou un dict {fonctionnalité: booléen}.
+    """
+    policy = getattr(settings, 'LLM_CACHE_HIT_CONSUMES_CREDIT', False)
+    if isinstance(policy, dict):
+        return bool(policy.get(feature, False))
+    return bool(policy)
+
+
+def _record(feature, hit):
+    field = 'hits' if hit else 'misses'
+    updated = LLMCacheStat.objects.filter(feature=feature).update(**{field: F(field) + 1})
+    if not updated:
+        try:
+            with transaction.atomic():
+                LLMCacheStat.objects.create(feature=feature, **{field: 1})
+        except IntegrityError:
+            LLMCacheStat.objects.filter(feature=feature).update(**{field: F(field) + 1})
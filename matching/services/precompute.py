@@ -0,0 +1,126 @@
+"""
+Pré-calcul des suggestions du CV Optimizer pour les meilleurs nouveaux matches des utilisateurs premium.
+
+Après l'enregistrement des offres d'une recherche (tâche find_jobs, alertes), les N nouveaux matches
+les mieux notés reçoivent une tâche basse priorité : les workers ne la traitent qu'une fois les tâches
+prioritaires vidées, avec une concurrence bornée (BACKGROUND_TASK_CONCURRENCY). Le résultat est stocké
+sur le match : le workspace s'ouvre avec les suggestions déjà prêtes.
+
+Les pré-calculs sont plafonnés par utilisateur et par 24 h selon le plan (CV_PRECOMPUTE_BUDGETS),
+et ceux jamais consultés sont mesurés (precompute_stats).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import BackgroundTask, JobMatch
+from .tasks import enqueue
+
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_TASK = 'precompute_cv_optimization'
+# Sous la priorité par défaut (0) : ne passe qu'en l'absence de tâches interactives
+PRECOMPUTE_PRIORITY = -10
+BUDGET_WINDOW = timedelta(hours=24)
+
+
+def is_enabled():
+    # Sans worker, la tâche s'exécuterait dans la requête : pas de pré-calcul en mode eager
+    return getattr(settings, 'CV_PRECOMPUTE_ENABLED', False) and not getattr(settings, 'BACKGROUND_TASKS_EAGER', False)
+
+
+def plan_budget(user):
+    """Nombre de pré-calculs autorisés par 24 h pour l'utilisateur (0 sans abonnement actif)."""
+    if not user.is_premium:
+        return 0
+    budgets = getattr(settings, 'CV_PRECOMPUTE_BUDGETS', {})
+    return budgets.get(user.subscription_plan, 0)
+
+
+def used_budget(user):
+    """Pré-calculs effectués sur les dernières 24 h plus ceux encore en file."""
+    since = timezone.now() - BUDGET_WINDOW
+    done = JobMatch.objects.filter(
+        user=user,
+        cv_suggestions_source=JobMatch.SUGGESTIONS_PRECOMPUTED,
+        cv_suggestions_at__gte=since,
+    ).count()
+    queued = BackgroundTask.objects.filter(
+        user=user,
+        kind=PRECOMPUTE_TASK,
+        status__in=[BackgroundTask.STATUS_PENDING, BackgroundTask.STATUS_RUNNING],
+    ).count()
+    return done + queued
+
+
+def schedule_cv_precompute(user, matches):
+    """
+    Met en file le pré-calcul pour les meilleurs matches sans suggestions, dans la limite
+    de CV_PRECOMPUTE_TOP_N et du budget restant du plan. Retourne les tâches créées.
+    """
+    if not is_enabled():
+        return []
+    remaining = plan_budget(user) - used_budget(user)
+    if remaining <= 0:
+        return []
+    top_n = getattr(settings, 'CV_PRECOMPUTE_TOP_N', 3)
+    candidates = sorted(
+        (match for match in matches if match.resume_id and match.cv_suggestions is None),
+        key=lambda match: match.score,
+        reverse=True,
+    )[:min(top_n, remaining)]
+    tasks = [
+        enqueue(PRECOMPUTE_TASK, user=user, payload={'match_id': match.pk}, priority=PRECOMPUTE_PRIORITY)
+        for match in candidates
+    ]
+    if tasks:
+        logger.info("Pré-calcul CV Optimizer : %s match(es) en file pour l'utilisateur %s", len(tasks), user.pk)
+    return tasks
+
+
+def store_suggestions(match, suggestions, source):
+    """Enregistre les suggestions sur le match (consultées immédiatement si calculées à la demande)."""
+    now = timezone.now()
+    match.cv_suggestions = suggestions
+    match.cv_suggestions_source = source
+    match.cv_suggestions_at = now
+    match.cv_suggestions_used_at = now if source == JobMatch.SUGGESTIONS_ON_DEMAND else None
+    match.save(update_fields=['cv_suggestions', 'cv_suggestions_source', 'cv_suggestions_at', 'cv_suggestions_used_at'])
+
+
+def mark_suggestions_used(match):
+    """Première consultation de suggestions pré-calculées."""
+    if match.cv_suggestions is not None and match.cv_suggestions_used_at is None:
+        match.cv_suggestions_used_at = timezone.now()
+        JobMatch.objects.filter(pk=match.pk, cv_suggestions_used_at__isnull=True).update(
+            cv_suggestions_used_at=match.cv_suggestions_used_at
+        )
+
+
+def precompute_stats(since):
+    """Pré-calculs par plan depuis `since` : total, consultés, jamais consultés."""
+    rows = (
+        JobMatch.objects.filter(
+            cv_suggestions_source=JobMatch.SUGGESTIONS_PRECOMPUTED,
+            cv_suggestions_at__gte=since,
+        )
+        .values('user__subscription_plan')
+        .annotate(
+            total=Count('pk'),
+            used=Count('pk', filter=Q(cv_suggestions_used_at__isnull=False)),
+        )
+        .order_by('user__subscription_plan')
+    )
+    return [
+        {
+            'plan': row['user__subscription_plan'] or '-',
+            'total': row['total'],
+            'used': row['used'],
+            'unused': row['total'] - row['used'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,273 @@
+"""
+Compaction des textes de CV et d'offre avant de les insérer dans un prompt Gemini.
+
+Au lieu de couper aveuglément à N caractères (ce qui peut supprimer les expériences ou les compétences),
+le texte est découpé en sections (profil, expériences, compétences, formation... pour un CV ;
+missions, profil recherché, entreprise, avantages... pour une offre), les lignes répétées et les
+mentions génériques sont supprimées, puis les sections sont classées (priorité du type de section
+et recouvrement de vocabulaire avec l'autre document) et retenues dans l'ordre du classement
+jusqu'à épuisement du budget de tokens. Les sections retenues sont restituées dans l'ordre d'origine.
+
+Les budgets sont définis par point d'appel dans PROMPT_TOKEN_BUDGETS ; chaque compaction est mesurée
+(tokens avant / après, durée) et agrégée par point d'appel (get_compaction_stats).
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Estimation sans appel réseau : ~4 caractères par token pour du français / anglais
+CHARS_PER_TOKEN = 4
+
+# Budgets par défaut (tokens) : surchargés par settings.PROMPT_TOKEN_BUDGETS
+DEFAULT_TOKEN_BUDGETS = {
+    'cover_letter': {'cv': 1500, 'offer': 1000},
+    'cv_optimizer': {'cv': 1500, 'offer': 1500},
+    'cv_parser': {'cv': 1000},
+}
+
+# Titres de sections reconnus (début de ligne, sans accents ni casse)
+CV_SECTIONS = {
+    'profile': ('profil', 'resume', 'a propos', 'about', 'summary', 'objectif', 'presentation'),
+    'experience': ('experience', 'experiences', 'parcours professionnel', 'emplois', 'stages', 'work experience'),
+    'skills': ('competence', 'skills', 'technologies', 'outils', 'stack', 'savoir-faire', 'langages'),
+    'education': ('formation', 'education', 'diplome', 'etudes', 'cursus', 'scolarite'),
+    'projects': ('projet', 'projects', 'realisations'),
+    'other': ('langue', 'languages', 'centres d\'interet', 'interets', 'loisirs', 'hobbies', 'certification',
+              'benevolat', 'informations complementaires', 'references'),
+}
+OFFER_SECTIONS = {
+    'missions': ('missions', 'vos missions', 'description du poste', 'le poste', 'responsabilites',
+                 'activites', 'descriptif', 'vos taches', 'au quotidien'),
+    'profile': ('profil recherche', 'votre profil', 'profil', 'competences', 'qualifications', 'prerequis',
+                'savoir-etre', 'experience requise', 'vous etes', 'requirements'),
+    'company': ('l\'entreprise', 'entreprise', 'qui sommes-nous', 'qui sommes nous', 'a propos', 'notre societe',
+                'nous sommes'),
+    'benefits': ('avantages', 'remuneration', 'salaire', 'conditions', 'informations complementaires',
+                 'processus de recrutement', 'ce que nous offrons'),
+}
+
+# Priorité de base de chaque type de section ('header' = texte avant le premier titre : nom, poste visé)
+CV_PRIORITIES = {'header': 3.0, 'skills': 2.5, 'experience': 2.5, 'profile': 2.0, 'projects': 1.5,
+                 'education': 1.0, 'languages': 0.3, 'other': 0.3, 'body': 1.0}
+OFFER_PRIORITIES = {'header': 2.0, 'missions': 3.0, 'profile': 3.0, 'body': 2.0, 'company': 0.8,
+                    'benefits': 0.3}
+
+# Mentions génériques sans intérêt pour le modèle
+BOILERPLATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'situation de handicap',
+        r'egalite des chances|diversite',
+        r'\bRGPD\b|donnees personnelles',
+        r'^(h/f|f/h)$',
+        r'^page \d+( sur \d+)?$',
+        r'curriculum vitae',
+        r'^postulez|^candidatez',
+    )
+]
+
+MIN_TRUNCATED_TOKENS = 40
+
+_word_re = re.compile(r'\w{3,}')
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'calls': 0, 'tokens_before': 0, 'tokens_after': 0, 'duration_ms': 0.0})
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_budget(call_site, document):
+    budgets = getattr(settings, 'PROMPT_TOKEN_BUDGETS', DEFAULT_TOKEN_BUDGETS)
+    site = budgets.get(call_site) or DEFAULT_TOKEN_BUDGETS.get(call_site, {})
+    return site.get(document)
+
+
+def compact_cv(text, call_site, offer_text=None, budget=None, sections=None):
+    """
+    Compacte le texte d'un CV ; les sections proches de l'offre (si fournie) sont privilégiées.
+    sections : découpage déjà fait de ce texte (Resume.structured_data, voir resumes/services/sectionizer.py).
+    """
+    budget = budget if budget is not None else get_budget(call_site, 'cv')
+    return _compact(text, call_site, 'cv', CV_SECTIONS, CV_PRIORITIES, offer_text, budget, sections)
+
+
+def compact_offer(text, call_site, cv_text=None, budget=None):
+    """Compacte la description d'une offre ; missions et profil recherché sont privilégiés."""
+    budget = budget if budget is not None else get_budget(call_site, 'offer')
+    return _compact(text, call_site, 'offer', OFFER_SECTIONS, OFFER_PRIORITIES, cv_text, budget)
+
+
+def get_compaction_stats():
+    """Mesures agrégées par point d'appel et document depuis le démarrage du processus."""
+    with _stats_lock:
+        return {key: dict(values) for key, values in _stats.items()}
+
+
+def split_sections(text, headings):
+    """
+    Découpe un texte en sections [(type, lignes)] d'après les titres reconnus.
+    Le texte précédant le premier titre forme la section 'header'.
+    """
+    sections = [('header', [])]
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        kind = _heading_kind(stripped, headings)
+        if kind:
+            sections.append((kind, [stripped]))
+        else:
+            sections[-1][1].append(stripped)
+    return [(kind, lines) for kind, lines in sections if lines]
+
+
+def _compact(text, call_site, document, headings, priorities, reference_text, budget, sections=None):
+    start = time.perf_counter()
+    text = text or ''
+    tokens_before = estimate_tokens(text)
+    if not budget or tokens_before <= budget:
+        result = _dedupe_text(text)
+    else:
+        sections = _dedupe_sections(sections or split_sections(text, headings))
+        if len(sections) == 1 and sections[0][0] == 'header':
+            # Aucun titre reconnu : découpe en blocs pour pouvoir classer quand même
+            sections = [('body', chunk) for chunk in _chunks(sections[0][1])]
+            sections[0] = ('header', sections[0][1])
+        reference_words = _words(reference_text) if reference_text else set()
+        result = _fit(sections, priorities, reference_words, budget)
+    tokens_after = estimate_tokens(result)
+    duration_ms = (time.perf_counter() - start) * 1000
+    with _stats_lock:
+        stats = _stats[f"{call_site}.{document}"]
+        stats['calls'] += 1
+        stats['tokens_before'] += tokens_before
+        stats['tokens_after'] += tokens_after
+        stats['duration_ms'] += duration_ms
+    logger.info(
+        "Compaction %s.%s : %s → %s tokens (budget %s, %.1f ms)",
+        call_site, document, tokens_before, tokens_after, budget, duration_ms,
+    )
+    return result
+
+
+def _fit(sections, priorities, reference_words, budget):
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: _score(sections[i], priorities, reference_words),
+        reverse=True,
+    )
+    kept = {}
+    remaining = budget
+    for index in ranked:
+        kind, lines = sections[index]
+        tokens = estimate_tokens("\n".join(lines))
+        if tokens <= remaining:
+            kept[index] = lines
+            remaining -= tokens
+        elif remaining >= MIN_TRUNCATED_TOKENS:
+            # Section partiellement retenue : on coupe à la ligne, jamais au milieu d'un mot
+            partial = []
+            for line in lines:
+                cost = estimate_tokens(line)
+                if cost > remaining:
+                    if remaining >= MIN_TRUNCATED_TOKENS:
+                        # Ligne très longue (texte PDF sans retours à la ligne) : coupe au dernier mot entier
+                        partial.append(_truncate_words(line, remaining * CHARS_PER_TOKEN))
+                        remaining = 0
+                    break
+                partial.append(line)
+                remaining -= cost
+            if partial:
+                kept[index] = partial
+    return "\n\n".join("\n".join(kept[index]) for index in sorted(kept))
+
+
+def _score(section, priorities, reference_words):
+    kind, lines = section
+    score = priorities.get(kind, 1.0)
+    if reference_words:
+        words = _words(" ".join(lines))
+        if words:
+            # Part du vocabulaire de la section présent dans l'autre document
+            score += 2.0 * len(words & reference_words) / len(words)
+    return score
+
+
+def _dedupe_sections(sections):
+    seen = set()
+    result = []
+    for kind, lines in sections:
+        unique = []
+        for line in lines:
+            key = _normalize(line)
+            if key in seen or _is_boilerplate(key):
+                continue
+            seen.add(key)
+            unique.append(line)
+        if unique:
+            result.append((kind, unique))
+    return result
+
+
+def _dedupe_text(text):
+    """Texte sous le budget : seules les lignes répétées et les mentions génériques sont retirées."""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            if lines and lines[-1]:
+                lines.append('')
+            continue
+        key = _normalize(stripped)
+        if key in seen or _is_boilerplate(key):
+            continue
+        seen.add(key)
+        lines.append(stripped)
+    return "\n".join(lines).strip()
+
+
+def _truncate_words(line, max_chars):
+    if len(line) <= max_chars:
+        return line
+    cut = line[:max_chars].rsplit(' ', 1)[0]
+    return cut + ' […]'
+
+
+def _chunks(lines, size=8):
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+
+def _heading_kind(line, headings):
+    if len(line) > 60:
+        return None
+    normalized = _normalize(line).strip(' :-•*#|')
+    for kind, keywords in headings.items():
+        for keyword in keywords:
+            if normalized == keyword or (normalized.startswith(keyword) and len(normalized) <= len(keyword) + 15):
+                return kind
+    return None
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', value.lower())
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+def _is_boilerplate(normalized_line):
+    return any(pattern.search(normalized_line) for pattern in BOILERPLATE_PATTERNS)
+
+
+def _words(text):
+    return set(_word_re.findall(_normalize(text or '')))
@@ -0,0 +1,174 @@
+"""
+File de tâches en arrière-plan adossée à la base de données.
+
+- enqueue() crée une BackgroundTask ; un worker (python manage.py run_task_worker) la réserve
+  avec SELECT ... FOR UPDATE SKIP LOCKED et exécute le handler enregistré pour son type.
+- Si TASK_BROKER_URL est défini (Redis, cf. docker-compose.yml) et que le paquet redis est installé,
+  l'ID de la tâche est aussi poussé dans une liste Redis pour réveiller immédiatement un worker.
+  La base reste la source de vérité : sans Redis, les workers interrogent la table périodiquement.
+- BACKGROUND_TASKS_EAGER=True exécute les tâches directement dans la requête (développement).
+- BACKGROUND_TASK_CONCURRENCY limite le nombre de tâches d'un type exécutées en même temps
+  (limite approximative : deux workers peuvent réserver simultanément la dernière place).
+"""
+import importlib
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+REDIS_QUEUE_KEY = 'jobpilot:tasks'
+
+# type de tâche -> fonction handler(task)
+TASK_HANDLERS = {}
+
+
+def register_task(kind):
+    """Décorateur : enregistre la fonction comme handler des tâches de type `kind`."""
+    def decorator(func):
+        TASK_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def load_task_modules():
+    """Importe les modules déclarant des handlers (settings.BACKGROUND_TASK_MODULES)."""
+    for module_path in getattr(settings, 'BACKGROUND_TASK_MODULES', []):
+        importlib.import_module(module_path)
+
+
+class RedisBroker:
+    """Canal de réveil des workers via une liste Redis (LPUSH / BRPOP)."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def notify(self, task_id):
+        self.client.lpush(REDIS_QUEUE_KEY, task_id)
+
+    def wait(self, timeout):
+        """Bloque jusqu'à `timeout` secondes ou jusqu'à la prochaine tâche annoncée."""
+        self.client.brpop(REDIS_QUEUE_KEY, timeout=max(1, int(timeout)))
+
+
+_broker = None
+
+
+def get_broker():
+    """Retourne le broker Redis configuré, ou None (les workers interrogent alors la base)."""
+    global _broker
+    url = getattr(settings, 'TASK_BROKER_URL', None)
+    if not url:
+        return None
+    if _broker is None:
+        try:
+            _broker = RedisBroker(url)
+        except ImportError:
+            logger.warning("TASK_BROKER_URL défini mais le paquet redis n'est pas installé : polling de la base.")
+            return None
+    return _broker
+
+
+def enqueue(kind, user=None, payload=None, priority=0):
+    """
+    Crée une tâche en attente et la signale aux workers une fois la transaction commitée.
+    Retourne la BackgroundTask créée.
+    """
+    if kind not in TASK_HANDLERS:
+        load_task_modules()
+    if kind not in TASK_HANDLERS:
+        raise ValueError(f"Type de tâche inconnu : {kind}")
+
+    task = BackgroundTask.objects.create(
+        kind=kind,
+        user=user,
+        payload=payload or {},
+        priority=priority,
+    )
+
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        run_task(task)
+        return task
+
+    broker = get_broker()
+    if broker is not None:
+        def _notify():
+            try:
+                broker.notify(task.pk)
+            except Exception as e:
+                # Pas bloquant : les workers finiront par la trouver en base
+                logger.warning("Notification Redis impossible pour la tâche %s : %s", task.pk, e)
+        transaction.on_commit(_notify)
+    return task
+
+
+def claim_next_task(kinds=None):
+    """
+    Réserve la prochaine tâche en attente (priorité décroissante puis ancienneté)
+    et la passe à l'état 'running'. Retourne None si la file est vide.
+    """
+    with transaction.atomic():
+        queryset = BackgroundTask.objects.select_for_update(skip_locked=True).filter(
+            status=BackgroundTask.STATUS_PENDING
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        saturated = _saturated_kinds()
+        if saturated:
+            queryset = queryset.exclude(kind__in=saturated)
+        task = queryset.order_by('-priority', 'created_at').first()
+        if task is None:
+            return None
+        task.status = BackgroundTask.STATUS_RUNNING
+        task.started_at = timezone.now()
+        task.attempts += 1
+        task.save(update_fields=['status', 'started_at', 'attempts'])
+    return task
+
+
+def _saturated_kinds():
+    """Types de tâches ayant atteint leur limite BACKGROUND_TASK_CONCURRENCY."""
+    limits = getattr(settings, 'BACKGROUND_TASK_CONCURRENCY', {})
+    if not limits:
+        return []
+    running = Counter(
+        BackgroundTask.objects.filter(
+            status=BackgroundTask.STATUS_RUNNING, kind__in=list(limits)
+        ).values_list('kind', flat=True)
+    )
+    return [kind for kind, limit in limits.items() if running[kind] >= limit]
+
+
+def run_task(task):
+    """Exécute le handler d'une tâche réservée et enregistre son issue."""
+    handler = TASK_HANDLERS.get(task.kind)
+    if handler is None:
+        load_task_modules()
+        handler = TASK_HANDLERS.get(task.kind)
+
+    if task.status != BackgroundTask.STATUS_RUNNING:
+        task.status = BackgroundTask.STATUS_RUNNING
+        task.started_at = timezone.now()
+        task.attempts += 1
+        task.save(update_fields=['status', 'started_at', 'attempts'])
+
+    try:
+        if handler is None:
+            raise ValueError(f"Aucun handler pour le type de tâche : {task.kind}")
+        result = handler(task)
+        task.status = BackgroundTask.STATUS_DONE
+        task.result = result or {}
+        task.error = ''
+    except Exception as e:
+        logger.exception("Tâche %s (%s) échouée", task.pk, task.kind)
+        task.status = BackgroundTask.STATUS_FAILED
+        task.error = str(e)
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return task
@@ -0,0 +1,313 @@
+"""
+Télémétrie des appels IA : un enregistrement structuré par appel (AICallRecord).
+
+Chaque appel Gemini passe par GeminiModel (gemini_client), qui le mesure (measure) : fonctionnalité,
+modèle, utilisateur, tokens du prompt / de la réponse / lus depuis un contexte en cache, latence
+(attente du répartiteur et réessais compris), réessais sur erreur de quota, statut et coût estimé
+(AI_TOKEN_PRICES). Les réponses servies par le cache (llm_cache) sont enregistrées avec cache_hit.
+
+La fonctionnalité vient du contexte courant (feature), posé par AIParser, AIOptimizer et AILetterGenerator ;
+l'utilisateur, du contexte du répartiteur (call_context).
+Les enregistrements sont regroupés en mémoire et écrits par lots dans un thread (AI_TELEMETRY_FLUSH_SIZE,
+AI_TELEMETRY_FLUSH_INTERVAL) : aucun accès base dans la boucle asyncio ni sur le chemin de l'appel.
+summarize agrège une fenêtre glissante : histogrammes de latence par fonctionnalité, tokens, coût,
+utilisateurs les plus consommateurs. Conservés AI_TELEMETRY_RETENTION_DAYS jours.
+"""
+import asyncio
+import atexit
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from ..models import AICallRecord
+from .gemini_dispatcher import GeminiOverloaded, count_retries, current_user_key
+from .prompt_compactor import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+# Fonctionnalités (mêmes noms que llm_cache pour le CV Optimizer et l'analyse de CV)
+FEATURE_CV_PARSER = 'cv_parser'
+FEATURE_CV_OPTIMIZER = 'cv_optimizer'
+FEATURE_COVER_LETTER = 'cover_letter'
+FEATURE_LETTER_REFINEMENT = 'letter_refinement'
+FEATURE_OTHER = 'other'
+
+# Bornes supérieures (ms) des classes de l'histogramme de latence
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Probabilité de purger les enregistrements expirés à chaque écriture
+PRUNE_PROBABILITY = 0.01
+
+_feature = contextvars.ContextVar('ai_feature', default=FEATURE_OTHER)
+_lock = threading.Lock()
+_buffer = []
+_last_flush = time.monotonic()
+_pid = os.getpid()
+
+
+def is_enabled():
+    return getattr(settings, 'AI_TELEMETRY_ENABLED', True)
+
+
+@contextmanager
+def feature(name):
+    """Fonctionnalité attribuée aux appels IA effectués dans ce bloc (thread ou tâche asyncio)."""
+    token = _feature.set(name)
+    try:
+        yield
+    finally:
+        try:
+            _feature.reset(token)
+        except ValueError:
+            # Générateur asynchrone refermé depuis un autre contexte : rien à restaurer ici
+            pass
+
+
+class CallMeasure:
+    """Appel en cours de mesure : la réponse (ou les fragments d'un flux) fournit tokens et texte."""
+
+    def __init__(self, model_name, prompt):
+        self.model_name = model_name
+        self.prompt = prompt
+        self.response = None
+        self.usage = None
+        self.response_chars = 0
+
+    def add_chunk(self, chunk):
+        # L'usage d'un flux est cumulé : celui du dernier fragment vaut pour tout l'appel
+        self.usage = getattr(chunk, 'usage_metadata', None) or self.usage
+        try:
+            self.response_chars += len(chunk.text or '')
+        except (AttributeError, ValueError):
+            pass
+
+    def tokens(self):
+        """(prompt, réponse, lus depuis un contexte en cache) ; estimés si le modèle ne les fournit pas."""
+        usage = self.usage or getattr(self.response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        response_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+        if not prompt_tokens:
+            prompt_tokens = estimate_tokens(self.prompt if isinstance(self.prompt, str) else str(self.prompt or ''))
+        if not response_tokens:
+            if self.response is not None:
+                try:
+                    response_tokens = estimate_tokens(self.response.text)
+                except (AttributeError, ValueError):
+                    pass
+            else:
+                response_tokens = -(-self.response_chars // 4)
+        return prompt_tokens, response_tokens, cached_tokens
+
+
+@contextmanager
+def measure(model_name, args):
+    """Mesure l'appel exécuté dans ce bloc ; le bloc renseigne call.response ou appelle call.add_chunk."""
+    call = CallMeasure(model_name, args[0] if args else None)
+    status = AICallRecord.STATUS_OK
+    start = time.perf_counter()
+    with count_retries() as retries:
+        try:
+            yield call
+        except GeminiOverloaded:
+            status = AICallRecord.STATUS_OVERLOADED
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            status = AICallRecord.STATUS_CANCELLED
+            raise
+        except BaseException:
+            status = AICallRecord.STATUS_ERROR
+            raise
+        finally:
+            if is_enabled():
+                prompt_tokens, response_tokens, cached_tokens = call.tokens()
+                if status in (AICallRecord.STATUS_ERROR, AICallRecord.STATUS_OVERLOADED):
+                    response_tokens = 0
+                record(
+                    model_name=model_name,
+                    prompt_tokens=prompt_tokens,
+                    response_tokens=response_tokens,
+                    cached_tokens=cached_tokens,
+                    latency_ms=round((time.perf_counter() - start) * 1000),
+                    retries=retries[0],
+                    status=status,
+                )
+
+
+def record_cache_hit(feature_name, model_name):
+    """Réponse IA servie par le cache, sans appel au modèle."""
+    if is_enabled():
+        record(model_name=model_name, feature_name=feature_name, cache_hit=True)
+
+
+def record(model_name, feature_name=None, prompt_tokens=0, response_tokens=0, cached_tokens=0,
+           latency_ms=0, retries=0, cache_hit=False, status=AICallRecord.STATUS_OK):
+    """Ajoute un enregistrement au lot en cours ; le lot est écrit en base dans un thread dès qu'il est plein ou ancien."""
+    global _last_flush, _pid
+    entry = AICallRecord(
+        created_at=timezone.now(),
+        feature=feature_name or _feature.get(),
+        model_name=model_name,
+        user_id=current_user_key(),
+        prompt_tokens=prompt_tokens,
+        response_tokens=response_tokens,
+        cached_tokens=cached_tokens,
+        latency_ms=latency_ms,
+        retries=retries,
+        cache_hit=cache_hit,
+        status=status,
+        cost_usd=estimate_cost(model_name, prompt_tokens, response_tokens, cached_tokens),
+    )
+    with _lock:
+        if os.getpid() != _pid:
+            # Processus forké : le lot hérité du parent sera écrit par le parent
+            _buffer.clear()
+            _pid = os.getpid()
+        _buffer.append(entry)
+        due = (len(_buffer) >= getattr(settings, 'AI_TELEMETRY_FLUSH_SIZE', 50)
+               or time.monotonic() - _last_flush >= getattr(settings, 'AI_TELEMETRY_FLUSH_INTERVAL', 10))
+        if not due:
+            return
+        batch = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    threading.Thread(target=_write, args=(batch,), name='ai-telemetry', daemon=True).start()
+
+
+def flush():
+    """Écrit tout de suite les enregistrements en attente (fin de processus, commandes, tests)."""
+    global _last_flush
+    with _lock:
+        batch = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if batch:
+        _write(batch, close_connection=False)
+
+
+def estimate_cost(model_name, prompt_tokens, response_tokens, cached_tokens=0):
+    """Coût en USD d'après AI_TOKEN_PRICES (prix par million de tokens : entrée, sortie, entrée en cache)."""
+    prices = getattr(settings, 'AI_TOKEN_PRICES', {}).get(model_name)
+    if not prices:
+        return 0.0
+    input_price, output_price, cached_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + response_tokens * output_price
+    ) / 1_000_000
+
+
+def summarize(hours=24):
+    """
+    Agrégats des appels des dernières heures : par fonctionnalité (appels, erreurs, cache, tokens,
+    coût, histogramme cumulé de latence et percentiles estimés) et utilisateurs les plus coûteux.
+    Les réponses servies par le cache n'entrent pas dans les latences.
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    records = AICallRecord.objects.filter(created_at__gte=since)
+    model_calls = Q(cache_hit=False)
+    buckets = {
+        f'le_{bound}': Count('id', filter=model_calls & Q(latency_ms__lte=bound))
+        for bound in LATENCY_BUCKETS_MS
+    }
+    rows = records.values('feature').annotate(
+        calls=Count('id'),
+        model_calls=Count('id', filter=model_calls),
+        cache_hits=Count('id', filter=Q(cache_hit=True)),
+        errors=Count('id', filter=Q(status=AICallRecord.STATUS_ERROR)),
+        overloaded=Count('id', filter=Q(status=AICallRecord.STATUS_OVERLOADED)),
+        retries=Sum('retries'),
+        prompt_tokens=Sum('prompt_tokens'),
+        response_tokens=Sum('response_tokens'),
+        cached_tokens=Sum('cached_tokens'),
+        cost_usd=Sum('cost_usd'),
+        avg_latency_ms=Avg('latency_ms', filter=model_calls),
+        **buckets,
+    ).order_by('feature')
+
+    features = {}
+    for row in rows:
+        histogram = [(bound, row.pop(f'le_{bound}')) for bound in LATENCY_BUCKETS_MS]
+        histogram.append((None, row['model_calls']))
+        name = row.pop('feature')
+        features[name] = {
+            **{key: value or 0 for key, value in row.items()},
+            'avg_latency_ms': round(row['avg_latency_ms'] or 0),
+            'cost_usd': round(row['cost_usd'] or 0, 4),
+            'latency_histogram': [{'le_ms': bound, 'count': count} for bound, count in histogram],
+            'p50_ms': _percentile(histogram, 0.50),
+            'p95_ms': _percentile(histogram, 0.95),
+        }
+
+    top_users = [
+        {**row, 'cost_usd': round(row['cost_usd'] or 0, 4)}
+        for row in records.filter(user__isnull=False).values('user_id', 'user__username').annotate(
+            calls=Count('id'),
+            tokens=Sum('prompt_tokens') + Sum('response_tokens'),
+            cost_usd=Sum('cost_usd'),
+        ).order_by('-cost_usd', '-calls')[:20]
+    ]
+    return {
+        'hours': hours,
+        'since': since.isoformat(),
+        'latency_buckets_ms': list(LATENCY_BUCKETS_MS),
+        'features': features,
+        'top_users': top_users,
+        'total_cost_usd': round(sum(f['cost_usd'] for f in features.values()), 4),
+    }
+
+
+def prune():
+    """Supprime les enregistrements plus anciens que AI_TELEMETRY_RETENTION_DAYS ; retourne le nombre supprimé."""
+    days = getattr(settings, 'AI_TELEMETRY_RETENTION_DAYS', 30)
+    deleted, _ = AICallRecord.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def _percentile(histogram, quantile):
+    """Borne de la première classe atteignant le quantile (None : au-delà de la dernière borne ou aucun appel)."""
+    total = histogram[-1][1]
+    if not total:
+        return None
+    for bound, count in histogram:
+        if count >= quantile * total:
+            return bound
+    return None
+
+
+def _write(batch, close_connection=True):
+    try:
+        try:
+            AICallRecord.objects.bulk_create(batch)
+        except IntegrityError:
+            # Utilisateur supprimé entre l'appel et l'écriture : l'enregistrement est gardé sans utilisateur
+            existing = set(get_user_model().objects.filter(
+                pk__in={entry.user_id for entry in batch}).values_list('pk', flat=True))
+            for entry in batch:
+                if entry.user_id not in existing:
+                    entry.user_id = None
+            AICallRecord.objects.bulk_create(batch)
+        if random.random() < PRUNE_PROBABILITY:
+            prune()
+    except Exception as e:
+        logger.warning("Télémétrie IA : %s enregistrement(s) perdus : %s", len(batch), e)
+    finally:
+        if close_connection:
+            # Connexion propre au thread d'écriture
+            connection.close()
+
+
+atexit.register(flush)
@@ -0,0 +1,81 @@
+"""
+Handlers des tâches en arrière-plan de l'application matching (voir services/tasks.py).
+"""
+import logging
+
+from resumes.models import Resume
+from resumes.services.ai_optimizer import AIOptimizer
+from .models import JobMatch
+from .services.francetravail import FranceTravail
+from .services.gemini_dispatcher import LANE_BACKGROUND, call_context
+from .services.precompute import PRECOMPUTE_TASK, schedule_cv_precompute, store_suggestions
+from .services.tasks import register_task
+
+
+@register_task('find_jobs')
+def find_jobs_task(task):
+    """
+    Rafraîchit les offres d'un CV depuis France Travail (authentification, recherche, sauvegarde)
+    en publiant l'avancement dans task.progress au fil de l'eau.
+    payload : {"resume_id": int, "page": int}
+    """
+    resume = Resume.objects.get(pk=task.payload['resume_id'])
+    page = int(task.payload.get('page', 1))
+
+    # Utilise le titre du poste détecté par l'IA comme mots-clés de recherche
+    if not resume.detected_job_title:
+        logging.info("⚠️ Aucun titre de poste détecté dans le CV. Impossible de rechercher des offres.")
+        task.update_progress(stage='done', total=0, saved=0)
+        return {'jobs_found': 0}
+
+    search_query = resume.detected_job_title
+    task.update_progress(stage='search', total=0, saved=0, match_ids=[])
+    logging.info(f"🔍 Recherche d'offres avec le titre détecté: {search_query}")
+
+    service = FranceTravail()
+    api_results = service.search_jobs(search_query, page=page)
+    logging.info(f"📊 Nombre d'offres trouvées via API: {len(api_results) if api_results else 0}")
+    if not api_results:
+        logging.info("⚠️ Aucune offre trouvée via l'API")
+        task.update_progress(stage='done')
+        return {'jobs_found': 0}
+
+    task.update_progress(stage='saving', total=len(api_results))
+    match_ids = []
+
+    def on_match(match):
+        match_ids.append(match.pk)
+        task.update_progress(saved=len(match_ids), match_ids=match_ids)
+
+    saved_matches = service.save_jobs(api_results, resume.user, resume, on_match=on_match)
+    logging.info(f"✅ {len(saved_matches)} offres sauvegardées en base de données")
+    task.update_progress(stage='done')
+    schedule_cv_precompute(resume.user, saved_matches)
+    return {'jobs_found': len(saved_matches)}
+
+
+@register_task(PRECOMPUTE_TASK)
+def precompute_cv_optimization_task(task):
+    """
+    Calcule à l'avance les suggestions du CV Optimizer d'un match (voir services/precompute.py).
+    payload : {"match_id": int}
+    """
+    match = JobMatch.objects.select_related('resume', 'job_offer', 'user').get(pk=task.payload['match_id'])
+    if match.cv_suggestions is not None:
+        return {'skipped': 'already_computed'}
+    if not match.user.is_premium:
+        return {'skipped': 'not_premium'}
+    resume = match.resume
+    if not resume or not (resume.extracted_text or '').strip():
+        return {'skipped': 'no_resume_text'}
+
+    # File la moins prioritaire du répartiteur Gemini : passe après les appels interactifs
+    with call_context(user=match.user, lane=LANE_BACKGROUND):
+        suggestions = AIOptimizer().optimize_for_offer(
+            cv_text=resume.extracted_text,
+            job_description=match.job_offer.description or '',
+            job_title=match.job_offer.title or '',
+            resume=resume
+        )
+    store_suggestions(match, suggestions, JobMatch.SUGGESTIONS_PRECOMPUTED)
+    return {'match_id': match.pk}
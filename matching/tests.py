@@ -0,0 +1,92 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from matching.models import GeminiCallLease, JobOffer, JobOfferRaw
+from matching.services.francetravail import FranceTravail
+from matching.services.gemini_dispatcher import LANE_BACKGROUND, LANE_INTERACTIVE, LANE_STANDARD
+from matching.services.gemini_leases import SharedLimiter
+from resumes.models import Resume
+
+
+class SaveJobsTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='jean', password=None)
+        self.resume = Resume.objects.create(user=user, file='cvs/cv.pdf',
+                                            extracted_text="Développeur Python Django PostgreSQL")
+        self.job = {'id': '123ABC', 'intitule': 'Développeur Python', 'description': 'Python et Django'}
+
+    def test_offer_and_raw_payload_are_written_together(self):
+        with mock.patch.object(JobOfferRaw.objects, 'create', side_effect=DatabaseError("coupure")):
+            with self.assertRaises(DatabaseError):
+                FranceTravail().save_jobs([self.job], self.resume.user, self.resume)
+        self.assertFalse(JobOffer.objects.filter(remote_id='123ABC').exists())
+
+        FranceTravail().save_jobs([self.job], self.resume.user, self.resume)
+        raw = JobOfferRaw.objects.get(job_offer__remote_id='123ABC')
+        self.assertEqual(JobOfferRaw.decompress(raw.payload)['intitule'], 'Développeur Python')
+
+
+class SharedLimiterTests(TestCase):
+
+    def setUp(self):
+        self.limiter = SharedLimiter(max_concurrency=2, max_per_user=1, lease_seconds=60)
+
+    def _hold(self, slot, user_key=None, user_slot=None, expires_in=60):
+        return GeminiCallLease.objects.create(
+            token=f"held{slot}", lane=LANE_STANDARD, slot=slot, user_key=user_key, user_slot=user_slot,
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_claims_up_to_the_cap(self):
+        tokens = [self.limiter.register(LANE_STANDARD, None, 10) for _ in range(3)]
+        self.assertEqual([self.limiter.try_claim(token, None) for token in tokens], [True, True, False])
+        self.assertEqual(set(GeminiCallLease.objects.exclude(slot=None).values_list('slot', flat=True)), {0, 1})
+
+    def test_free_slot_goes_to_the_highest_lane(self):
+        self._hold(0)
+        background = self.limiter.register(LANE_BACKGROUND, None, 10)
+        interactive = self.limiter.register(LANE_INTERACTIVE, None, 10)
+        standard = self.limiter.register(LANE_STANDARD, None, 10)
+        self.assertFalse(self.limiter.try_claim(background, None))
+        self.assertFalse(self.limiter.try_claim(standard, None))
+        self.assertTrue(self.limiter.try_claim(interactive, None))
+        self.limiter.release(interactive)
+        self.assertFalse(self.limiter.try_claim(background, None))
+        self.assertTrue(self.limiter.try_claim(standard, None))
+
+    def test_user_at_their_cap_does_not_block_others(self):
+        self._hold(0, user_key=1, user_slot=0)
+        same_user = self.limiter.register(LANE_INTERACTIVE, 1, 10)
+        other_user = self.limiter.register(LANE_BACKGROUND, 2, 10)
+        self.assertFalse(self.limiter.try_claim(same_user, 1))
+        self.assertTrue(self.limiter.try_claim(other_user, 2))
+
+    def test_oldest_registration_first(self):
+        self._hold(0)
+        first = self.limiter.register(LANE_STANDARD, None, 10)
+        second = self.limiter.register(LANE_STANDARD, None, 10)
+        self.assertFalse(self.limiter.try_claim(second, None))
+        self.assertTrue(self.limiter.try_claim(first, None))
+
+    def test_expired_slot_is_taken_back(self):
+        self._hold(0, expires_in=-1)
+        self._hold(1)
+        token = self.limiter.register(LANE_STANDARD, None, 10)
+        self.assertFalse(self.limiter.try_claim(token, None))
+        self.assertTrue(self.limiter.try_claim(token, None))
+        self.assertEqual(GeminiCallLease.objects.get(token=token).slot, 0)
+
+    def test_snapshot(self):
+        self._hold(0)
+        self._hold(1, expires_in=-1)
+        self.limiter.register(LANE_INTERACTIVE, None, 10)
+        snapshot = self.limiter.snapshot()
+        self.assertEqual((snapshot['in_flight'], snapshot['waiting']), (1, 1))
+        self.assertEqual(snapshot['waiting_by_lane'][LANE_INTERACTIVE], 1)
+        self.assertFalse(GeminiCallLease.objects.filter(token='held1').exists())
@@ -1,9 +1,22 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Vues asynchrones (ASGI) pour les appels Gemini / France Travail, sinon versions synchrones
+if getattr(settings, 'ASYNC_AI_VIEWS', True):
+    find_jobs_view = async_views.find_jobs_for_resume_async
+    quick_refine_view = async_views.quick_refine_cover_letter_async
+    optimize_cv_view = async_views.optimize_cv_view_async
+else:
+    find_jobs_view = views.find_jobs_for_resume
+    quick_refine_view = views.quick_refine_cover_letter
+    optimize_cv_view = views.optimize_cv_view
 
 urlpatterns = [
     path('search-loading/<int:resume_id>/', views.FindJobsLoadingView.as_view(), name='find_jobs_loading'),
-    path('search/<int:resume_id>/', views.find_jobs_for_resume, name='find_jobs'),
+    path('search/<int:resume_id>/', find_jobs_view, name='find_jobs'),
+    path('search/status/<int:task_id>/', views.find_jobs_status, name='find_jobs_status'),
+    path('search/stream/<int:task_id>/', views.stream_find_jobs, name='find_jobs_stream'),
 # Nouvelle route pour changer le statut
     path('update-status/<int:match_id>/', views.update_match_status, name='update_match_status'),
     # Routes pour la génération de lettres de motivation par IA
@@ -11,8 +24,15 @@ urlpatterns = [
     path('save-letter/<int:match_id>/', views.save_generated_letter, name='save_generated_letter'),
     path('edit-letter/<int:match_id>/', views.edit_cover_letter, name='edit_cover_letter'),
     path('refine-letter/<int:match_id>/', views.refine_cover_letter, name='refine_cover_letter'),
-    path('quick-refine-letter/<int:match_id>/', views.quick_refine_cover_letter, name='quick_refine_cover_letter'),
-    path('optimize-cv/<int:match_id>/', views.optimize_cv_view, name='optimize_cv'),
+    path('quick-refine-letter/<int:match_id>/', quick_refine_view, name='quick_refine_cover_letter'),
+    path('export-letter/<int:match_id>/', views.export_cover_letter, name='export_cover_letter_pdf'),
+    path('export-letter/<int:match_id>/docx/', views.export_cover_letter, {'file_format': 'docx'},
+         name='export_cover_letter_docx'),
+    path('export-letters/', views.export_cover_letters_zip, name='export_cover_letters_zip'),
+    path('quick-refine-letter/<int:match_id>/stream/', async_views.stream_cover_letter, name='quick_refine_cover_letter_stream'),
+    path('optimize-cv/<int:match_id>/', optimize_cv_view, name='optimize_cv'),
     path('alert/<int:resume_id>/', views.toggle_job_alert, name='toggle_job_alert'),
     path('alert/<int:resume_id>/status/', views.job_alert_status, name='job_alert_status'),
+    path('ai/dispatcher/', views.ai_dispatcher_stats, name='ai_dispatcher_stats'),
+    path('ai/metrics/', views.ai_metrics, name='ai_metrics'),
 ]
\ No newline at end of file
@@ -1,33 +1,129 @@
 from django.shortcuts import render, get_object_or_404, redirect  # <--- Ajoute redirect ici
+from django.urls import reverse
 from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.template.loader import render_to_string
 from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.admin.views.decorators import staff_member_required
+import asyncio
+import json
 import logging
 from resumes.models import Resume
-from .models import JobMatch, JobAlert
-from .services import consume_credit
-from .services.francetravail import FranceTravail
+from .models import JobMatch, JobAlert, BackgroundTask
+from .services import consume_credit, refund_credit, telemetry
+from .services.tasks import enqueue
+from .services.llm_cache import FEATURE_CV_OPTIMIZER, cache_hit_consumes_credit
+from .services.precompute import mark_suggestions_used, store_suggestions
 from .services.ai_letter_generator import AILetterGenerator
+from .services import letter_render
+from .services.letter_export import letter_filename, letters_zip_stream
+from .services.gemini_dispatcher import GeminiOverloaded, call_context, get_dispatcher_stats
+from .services.letter_refinement import MODE_PARAGRAPHS, MODE_UNCHANGED, parse_targets, updated_baselines
 from .forms import CoverLetterGenerationForm, CoverLetterEditForm, CoverLetterRefineForm
 from resumes.services.ai_optimizer import AIOptimizer
 
 
+# Flux SSE des résultats : fréquence de lecture de l'avancement et durée max avant reconnexion
+SSE_POLL_INTERVAL = 0.5
+SSE_STREAM_MAX_SECONDS = 120
+
+# Actions rapides du workspace : mapping vers les types d'amélioration
+QUICK_REFINE_ACTIONS = {
+    'improve': {
+        'type': 'custom',
+        'instructions': 'Améliore cette lettre de motivation : corrige les fautes, améliore la fluidité, optimise la structure et le style, tout en gardant le contenu factuel intact.'
+    },
+    'formalize': {
+        'type': 'tone',
+        'instructions': 'Rends cette lettre plus formelle et professionnelle, utilise un langage plus soutenu.'
+    },
+    'grammar': {
+        'type': 'grammar',
+        'instructions': 'Corrige toutes les fautes d\'orthographe, de grammaire et de syntaxe.'
+    },
+    'length': {
+        'type': 'length',
+        'instructions': 'Optimise la longueur de cette lettre pour qu\'elle soit concise mais complète.'
+    }
+}
+
+
+def _overloaded_response(exc):
+    """Service IA saturé (voir gemini_dispatcher) : 429 avec le délai conseillé avant de réessayer."""
+    response = JsonResponse({
+        'success': False,
+        'error': str(exc),
+        'retry_after': exc.retry_after,
+    }, status=429)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+# Amélioration demandée alors qu'aucun paragraphe n'a changé depuis la dernière identique (type et instructions)
+REFINEMENT_UNCHANGED_MESSAGE = "Aucun paragraphe modifié depuis la même amélioration : rien à reprendre."
+
+
+def _refinement_message(refinement):
+    if refinement['mode'] == MODE_PARAGRAPHS:
+        return (
+            f"✨ {len(refinement['paragraphs'])} paragraphe(s) amélioré(s) sur {refinement['total_paragraphs']} "
+            f"(~{refinement['tokens_saved']} tokens économisés) !"
+        )
+    return '✨ Votre lettre a été améliorée avec succès !'
+
+
+def _parse_page(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _start_job_search(resume, page):
+    """
+    Lance (ou réutilise si elle est déjà en cours) la tâche de rafraîchissement des offres d'un CV.
+    Retourne la BackgroundTask correspondante.
+    """
+    task = BackgroundTask.objects.filter(
+        kind='find_jobs',
+        user=resume.user,
+        status__in=[BackgroundTask.STATUS_PENDING, BackgroundTask.STATUS_RUNNING],
+        payload__resume_id=resume.id,
+        payload__page=page,
+    ).first()
+    if task:
+        return task
+    return enqueue('find_jobs', user=resume.user, payload={'resume_id': resume.id, 'page': page})
+
+
 class FindJobsLoadingView(LoginRequiredMixin, TemplateView):
     """
     Page de chargement intermédiaire affichée après avoir cliqué sur "Trouver des offres".
-    Redirige automatiquement vers la recherche d'offres après un court délai.
+    Lance la recherche en arrière-plan puis interroge l'endpoint de suivi ;
+    redirige vers les résultats dès que les premières offres sont enregistrées.
     """
     template_name = 'matching/loading.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        resume_id = self.kwargs.get('resume_id')
-        context['resume_id'] = resume_id
-        context['find_jobs_url'] = f'/matching/search/{resume_id}/'
+        resume = get_object_or_404(Resume, id=self.kwargs.get('resume_id'), user=self.request.user)
+        page = _parse_page(self.request.GET.get('page', 1))
+        context['resume_id'] = resume.id
+        find_jobs_url = reverse('find_jobs', args=[resume.id])
+        if resume.detected_job_title:
+            task = _start_job_search(resume, page)
+            context['task_id'] = task.id
+            context['progress_url'] = reverse('find_jobs_status', args=[task.id])
+            context['find_jobs_url'] = f'{find_jobs_url}?task={task.id}&page={page}'
+        else:
+            # Pas de titre détecté : rien à rechercher, on affiche directement les résultats
+            context['find_jobs_url'] = find_jobs_url
         return context
 
 
@@ -37,26 +133,23 @@ def find_jobs_for_resume(request, resume_id):
     resume = get_object_or_404(Resume, id=resume_id)
     user = resume.user
 
-    # 1. Partie "Mise à jour via API" - Utilise detected_job_title comme source de vérité
+    # 1. Partie "Mise à jour via API" - exécutée en arrière-plan (matching/tasks.py)
+    # Si on arrive depuis la page de chargement, la tâche est déjà lancée : on affiche son avancement.
+    # Sinon (pagination, accès direct), on lance le rafraîchissement de la page demandée sans l'attendre.
     jobs_found = 0
-    if resume.detected_job_title:
-        service = FranceTravail()
-        try:
-            # Utilise le titre du poste détecté par l'IA comme mots-clés de recherche
-            search_query = resume.detected_job_title
-            logging.info(f"🔍 Recherche d'offres avec le titre détecté: {search_query}")
-            api_results = service.search_jobs(search_query, page=int(page_number))
-            logging.info(f"📊 Nombre d'offres trouvées via API: {len(api_results) if api_results else 0}")
-            
-            if api_results:
-                saved_matches = service.save_jobs(api_results, user, resume)
-                jobs_found = len(saved_matches)
-                logging.info(f"✅ {jobs_found} offres sauvegardées en base de données")
-            else:
-                logging.info("⚠️ Aucune offre trouvée via l'API")
-        except Exception as e:
-            logging.info(f"❌ Erreur API : {e}")
-            import traceback
+    stream_url = None
+    stream_last_event_id = 0
+    task_id = request.GET.get('task')
+    if task_id:
+        task = BackgroundTask.objects.filter(pk=_parse_page(task_id), user=user, kind='find_jobs').first()
+        if task:
+            jobs_found = task.progress.get('saved', 0)
+            if not task.is_finished:
+                # La recherche continue : la page reçoit les offres suivantes en direct (SSE)
+                stream_url = reverse('find_jobs_stream', args=[task.id])
+                stream_last_event_id = len(task.progress.get('match_ids', []))
+    elif resume.detected_job_title:
+        _start_job_search(resume, _parse_page(page_number))
     else:
         logging.info("⚠️ Aucun titre de poste détecté dans le CV. Impossible de rechercher des offres.")
 
@@ -67,7 +160,7 @@ def find_jobs_for_resume(request, resume_id):
         user=user  # Sécurité : on vérifie aussi que c'est bien l'utilisateur du CV
     ).exclude(
         status='rejected'
-    ).select_related('job_offer').order_by('-score', '-matched_at')
+    ).for_list().order_by('-score', '-matched_at')
     paginator = Paginator(matches, 9)
 
     # Obtenir les objets de la page demandée
@@ -81,10 +174,122 @@ def find_jobs_for_resume(request, resume_id):
         'matches': matches,
         'jobs_found': jobs_found,
         'job_title_used': resume.detected_job_title or 'Non détecté',
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'stream_url': stream_url,
+        'stream_last_event_id': stream_last_event_id,
     })
 
 
+@login_required
+def find_jobs_status(request, task_id):
+    """
+    Endpoint JSON de suivi d'une recherche d'offres en arrière-plan (interrogé par la page de chargement).
+    'ready' passe à True dès que la première offre est enregistrée, ou quand la tâche est terminée.
+    """
+    task = get_object_or_404(BackgroundTask, id=task_id, user=request.user, kind='find_jobs')
+    progress = task.progress or {}
+    saved = progress.get('saved', 0)
+    resume_id = task.payload.get('resume_id')
+    page = task.payload.get('page', 1)
+    return JsonResponse({
+        'success': task.status != BackgroundTask.STATUS_FAILED,
+        'task_id': task.id,
+        'status': task.status,
+        'stage': progress.get('stage', 'pending'),
+        'saved': saved,
+        'total': progress.get('total', 0),
+        'ready': task.is_finished or saved > 0,
+        'results_url': f"{reverse('find_jobs', args=[resume_id])}?task={task.id}&page={page}",
+        'error': task.error or None,
+    })
+
+
+def _sse_event(event, data, event_id=None):
+    """Formate un évènement Server-Sent Events."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    for line in json.dumps(data, ensure_ascii=False).splitlines():
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _match_stream(request, task_id, user_id, last_event_id):
+    """
+    Générateur asynchrone : émet chaque JobMatch dès que la tâche find_jobs l'a enregistré.
+    L'ID d'évènement est la position du match dans task.progress['match_ids'], ce qui permet
+    de reprendre un flux interrompu (Last-Event-ID) sans renvoyer les cartes déjà reçues.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SSE_STREAM_MAX_SECONDS
+    sent = last_event_id
+    yield "retry: 2000\n\n"
+    while True:
+        task = await BackgroundTask.objects.only('status', 'progress').aget(pk=task_id)
+        match_ids = task.progress.get('match_ids', [])
+        new_ids = match_ids[sent:]
+        if new_ids:
+            matches = {
+                match.pk: match
+                async for match in JobMatch.objects.filter(pk__in=new_ids, user_id=user_id).for_list()
+            }
+            for event_id, match_id in enumerate(new_ids, start=sent + 1):
+                match = matches.get(match_id)
+                if match is None:
+                    continue
+                yield _sse_event('match', {
+                    'id': match.id,
+                    'score': match.score,
+                    'title': match.job_offer.title,
+                    'company_name': match.job_offer.company_name,
+                    'html': render_to_string('matching/_match_card.html', {'match': match}, request=request),
+                }, event_id=event_id)
+            sent = len(match_ids)
+        if task.is_finished:
+            yield _sse_event('done', {
+                'status': task.status,
+                'saved': task.progress.get('saved', 0),
+            }, event_id=sent)
+            return
+        if loop.time() > deadline:
+            # Le navigateur se reconnectera avec Last-Event-ID
+            return
+        yield ": keep-alive\n\n"
+        await asyncio.sleep(SSE_POLL_INTERVAL)
+
+
+@login_required
+async def stream_find_jobs(request, task_id):
+    """
+    Flux Server-Sent Events des offres d'une recherche en arrière-plan, carte par carte.
+    Vue asynchrone : sous ASGI (JobPilot/asgi.py), un worker peut tenir de nombreux flux ouverts.
+    Reprise : en-tête Last-Event-ID (reconnexion automatique) ou paramètre ?last_event_id=N.
+    """
+    user = await request.auser()
+    task = await BackgroundTask.objects.filter(id=task_id, user=user, kind='find_jobs').only('id').afirst()
+    if task is None:
+        raise Http404("Recherche introuvable")
+    last_event_id = max(
+        _parse_event_id(request.headers.get('Last-Event-ID')),
+        _parse_event_id(request.GET.get('last_event_id')),
+    )
+    response = StreamingHttpResponse(
+        _match_stream(request, task.id, user.pk, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Pas de bufferisation côté Nginx
+    return response
+
+
+def _parse_event_id(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
 @require_POST
 def update_match_status(request, match_id):
     # Récupérer le match sans filtrer par user (pour permettre les utilisateurs anonymes en développement)
@@ -203,11 +408,12 @@ def quick_refine_cover_letter(request, match_id):
                 }, status=400)
             
             # Générer la lettre de motivation
-            generated_letter = generator.generate_cover_letter(
-                resume=resume,
-                job_match=match,
-                tone="professional"
-            )
+            with call_context(user=request.user):
+                generated_letter = generator.generate_cover_letter(
+                    resume=resume,
+                    job_match=match,
+                    tone="professional"
+                )
             
             # Ne pas sauvegarder automatiquement - l'utilisateur devra cliquer sur "Sauvegarder"
             # La lettre est seulement retournée pour être affichée dans l'éditeur
@@ -218,6 +424,9 @@ def quick_refine_cover_letter(request, match_id):
                 'message': '✨ Lettre de motivation générée avec succès ! Vous pouvez maintenant la modifier et la sauvegarder.'
             })
             
+        except GeminiOverloaded as e:
+            refund_credit(request.user)
+            return _overloaded_response(e)
         except ValueError as e:
             return JsonResponse({
                 'success': False,
@@ -245,8 +454,6 @@ def quick_refine_cover_letter(request, match_id):
         # Pour l'export PDF, on doit rediriger vers une nouvelle page ou retourner une réponse différente
         # Mais comme c'est appelé via AJAX, on va retourner une réponse JSON avec l'URL de téléchargement
         try:
-            generator = AILetterGenerator()
-            
             # Récupérer les informations
             user = request.user
             user_name = f"{user.first_name} {user.last_name}".strip() if (user.first_name or user.last_name) else user.username
@@ -255,8 +462,8 @@ def quick_refine_cover_letter(request, match_id):
             job_title = job_offer.title if job_offer else None
             company_name = job_offer.company_name if job_offer else None
             
-            # Générer le PDF
-            pdf_buffer = generator.export_to_pdf(
+            # Générer le PDF (ou le reprendre du cache si la lettre n'a pas changé)
+            pdf, _ = AILetterGenerator.render_pdf(
                 cover_letter_content=current_text,
                 user_name=user_name,
                 user_email=user_email,
@@ -268,7 +475,7 @@ def quick_refine_cover_letter(request, match_id):
             
             # Retourner le PDF en base64 pour le téléchargement côté client
             import base64
-            pdf_base64 = base64.b64encode(pdf_buffer.read()).decode('utf-8')
+            pdf_base64 = base64.b64encode(pdf).decode('utf-8')
             
             return JsonResponse({
                 'success': True,
@@ -282,27 +489,7 @@ def quick_refine_cover_letter(request, match_id):
                 'error': f"Erreur lors de l'export PDF : {str(e)}"
             }, status=500)
     
-    # Mapping des actions vers les types d'amélioration
-    action_mapping = {
-        'improve': {
-            'type': 'custom',
-            'instructions': 'Améliore cette lettre de motivation : corrige les fautes, améliore la fluidité, optimise la structure et le style, tout en gardant le contenu factuel intact.'
-        },
-        'formalize': {
-            'type': 'tone',
-            'instructions': 'Rends cette lettre plus formelle et professionnelle, utilise un langage plus soutenu.'
-        },
-        'grammar': {
-            'type': 'grammar',
-            'instructions': 'Corrige toutes les fautes d\'orthographe, de grammaire et de syntaxe.'
-        },
-        'length': {
-            'type': 'length',
-            'instructions': 'Optimise la longueur de cette lettre pour qu\'elle soit concise mais complète.'
-        }
-    }
-    
-    action_config = action_mapping.get(action, action_mapping['improve'])
+    action_config = QUICK_REFINE_ACTIONS.get(action, QUICK_REFINE_ACTIONS['improve'])
     
     try:
         generator = AILetterGenerator()
@@ -313,22 +500,42 @@ def quick_refine_cover_letter(request, match_id):
             action_config['type']
         )
         
-        # Appeler le service de raffinement
-        refined_letter = generator.refine_cover_letter(
-            current_text,
-            final_instructions
-        )
+        # Appeler le service de raffinement (retouche interactive : file prioritaire) ;
+        # seuls les paragraphes désignés ou modifiés depuis la dernière amélioration identique sont envoyés
+        with call_context(user=request.user, interactive=True):
+            refined_letter, refinement = generator.refine_letter(
+                current_text,
+                final_instructions,
+                improvement_type=action_config['type'],
+                baselines=match.letter_refinement_hashes,
+                targets=parse_targets(request.POST.get('paragraphs'))
+            )
+        if refinement['mode'] == MODE_UNCHANGED:
+            refund_credit(request.user)
+            return JsonResponse({
+                'success': True,
+                'refined_letter': refined_letter,
+                'refinement': refinement,
+                'message': REFINEMENT_UNCHANGED_MESSAGE
+            })
         
         # Sauvegarder la lettre améliorée
         match.cover_letter_content = refined_letter
+        match.letter_refinement_hashes = updated_baselines(
+            match.letter_refinement_hashes, action_config['type'], final_instructions, refined_letter
+        )
         match.save()
         
         return JsonResponse({
             'success': True,
             'refined_letter': refined_letter,
-            'message': '✨ Votre lettre a été améliorée avec succès !'
+            'refinement': refinement,
+            'message': _refinement_message(refinement)
         })
         
+    except GeminiOverloaded as e:
+        refund_credit(request.user)
+        return _overloaded_response(e)
     except ValueError as e:
         return JsonResponse({
             'success': False,
@@ -398,12 +605,6 @@ def optimize_cv_view(request, match_id):
     Appelée via AJAX depuis le workspace (bouton "Adapter mon CV à cette offre").
     """
     match = get_object_or_404(JobMatch, id=match_id, user=request.user)
-    if not consume_credit(request.user):
-        return JsonResponse({
-            'success': False,
-            'error': 'Crédits insuffisants. Passez Premium ou rechargez vos crédits.',
-            'redirect': '/subscriptions/pricing/',
-        }, status=402)
     resume = match.resume
     if not resume:
         resume = Resume.objects.filter(user=request.user, is_primary=True).first()
@@ -425,18 +626,47 @@ def optimize_cv_view(request, match_id):
             'success': False,
             'error': "Offre d'emploi introuvable."
         }, status=400)
+
+    # Suggestions déjà stockées sur le match (pré-calculées) ou en cache pour ce CV et cette offre : réponse immédiate
+    if match.cv_suggestions is not None:
+        mark_suggestions_used(match)
+        cached = match.cv_suggestions
+    else:
+        cached = AIOptimizer.cached_result(resume.extracted_text, job_offer.description or '', job_offer.title or '')
+    if cached is None or cache_hit_consumes_credit(request.user, FEATURE_CV_OPTIMIZER):
+        if not consume_credit(request.user):
+            return JsonResponse({
+                'success': False,
+                'error': 'Crédits insuffisants. Passez Premium ou rechargez vos crédits.',
+                'redirect': '/subscriptions/pricing/',
+            }, status=402)
+    if cached is not None:
+        return JsonResponse({
+            'success': True,
+            'data': cached,
+            'cached': True,
+            'message': "Suggestions d'adaptation du CV générées avec succès."
+        })
     try:
         optimizer = AIOptimizer()
-        result = optimizer.optimize_for_offer(
-            cv_text=resume.extracted_text,
-            job_description=job_offer.description or '',
-            job_title=job_offer.title or ''
-        )
+        with call_context(user=request.user):
+            result = optimizer.optimize_for_offer(
+                cv_text=resume.extracted_text,
+                job_description=job_offer.description or '',
+                job_title=job_offer.title or '',
+                use_cache=False,
+                resume=resume
+            )
+        store_suggestions(match, result, JobMatch.SUGGESTIONS_ON_DEMAND)
         return JsonResponse({
             'success': True,
             'data': result,
+            'cached': False,
             'message': "Suggestions d'adaptation du CV générées avec succès."
         })
+    except GeminiOverloaded as e:
+        refund_credit(request.user)
+        return _overloaded_response(e)
     except ValueError as e:
         return JsonResponse({
             'success': False,
@@ -487,24 +717,34 @@ def refine_cover_letter(request, match_id):
                     improvement_type
                 )
                 
-                # Appeler le service de raffinement
-                refined_letter = generator.refine_cover_letter(
-                    match.cover_letter_content,
-                    final_instructions
-                )
+                # Appeler le service de raffinement (retouche interactive : file prioritaire)
+                with call_context(user=request.user, interactive=True):
+                    refined_letter, refinement = generator.refine_letter(
+                        match.cover_letter_content,
+                        final_instructions,
+                        improvement_type=improvement_type,
+                        baselines=match.letter_refinement_hashes
+                    )
+                if refinement['mode'] == MODE_UNCHANGED:
+                    refund_credit(request.user)
+                    messages.info(request, REFINEMENT_UNCHANGED_MESSAGE)
+                    return redirect('application_workspace', match_id=match_id)
                 
                 # Sauvegarder la lettre améliorée
                 match.cover_letter_content = refined_letter
+                match.letter_refinement_hashes = updated_baselines(
+                    match.letter_refinement_hashes, improvement_type, final_instructions, refined_letter
+                )
                 match.save()
                 
-                messages.success(
-                    request, 
-                    '✨ Votre lettre de motivation a été améliorée avec succès !'
-                )
+                messages.success(request, _refinement_message(refinement))
                 
                 # Rediriger vers le workspace pour voir le résultat
                 return redirect('application_workspace', match_id=match_id)
                 
+            except GeminiOverloaded as e:
+                refund_credit(request.user)
+                messages.warning(request, f"⏳ {e}")
             except ValueError as e:
                 messages.error(request, f"Erreur de validation : {str(e)}")
             except Exception as e:
@@ -524,10 +764,12 @@ def refine_cover_letter(request, match_id):
 
 @login_required
 @require_http_methods(["GET", "POST"])
-def export_cover_letter_pdf(request, match_id):
+def export_cover_letter(request, match_id, file_format=letter_render.FORMAT_PDF):
     """
-    Vue pour exporter une lettre de motivation en PDF.
+    Vue pour exporter une lettre de motivation en PDF ou en DOCX (file_format, selon l'URL).
     Peut être appelée en GET (utilise le contenu sauvegardé) ou POST (utilise le contenu fourni).
+    Le fichier est servi avec un ETag (empreinte de la lettre) : un GET avec If-None-Match reçoit un 304 sans
+    nouveau rendu, et une lettre inchangée est reprise du cache des fichiers rendus.
     """
     match = get_object_or_404(JobMatch, id=match_id, user=request.user)
     
@@ -544,8 +786,6 @@ def export_cover_letter_pdf(request, match_id):
         return redirect('application_workspace', match_id=match_id)
     
     try:
-        generator = AILetterGenerator()
-        
         # Récupérer les informations de l'utilisateur
         user = request.user
         user_name = f"{user.first_name} {user.last_name}".strip() if (user.first_name or user.last_name) else user.username
@@ -556,8 +796,7 @@ def export_cover_letter_pdf(request, match_id):
         job_title = job_offer.title if job_offer else None
         company_name = job_offer.company_name if job_offer else None
         
-        # Générer le PDF
-        pdf_buffer = generator.export_to_pdf(
+        letter = dict(
             cover_letter_content=cover_letter_content,
             user_name=user_name,
             user_email=user_email,
@@ -566,17 +805,31 @@ def export_cover_letter_pdf(request, match_id):
             company_name=company_name,
             recipient_name=None  # Par défaut "Madame, Monsieur"
         )
+        etag = quote_etag(AILetterGenerator.file_key(**letter, file_format=file_format))
+        if file_format == letter_render.FORMAT_DOCX:
+            # Octets du DOCX différents d'un rendu à l'autre (dates de l'archive), contenu identique : ETag faible
+            etag = f'W/{etag}'
+        if request.method == 'GET':
+            # Lettre déjà téléchargée et inchangée : 304 sans rendu
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                patch_cache_control(not_modified, private=True, no_cache=True)
+                return not_modified
+
+        # Générer le fichier (ou le reprendre du cache)
+        data, _ = AILetterGenerator.render_file(**letter, file_format=file_format)
         
-        # Préparer le nom du fichier
-        filename = f"lettre_motivation_{job_title or 'candidature'}_{company_name or 'entreprise'}"
-        # Nettoyer le nom de fichier (enlever les caractères spéciaux)
-        filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_')).strip()
-        filename = filename.replace(' ', '_')
-        filename = f"{filename}.pdf"
+        # Préparer le nom du fichier (sans caractères spéciaux)
+        filename = letter_filename(job_title, company_name, extension=file_format)
         
-        # Créer la réponse HTTP avec le PDF
-        response = HttpResponse(pdf_buffer.read(), content_type='application/pdf')
+        # Créer la réponse HTTP avec le fichier
+        response = HttpResponse(data, content_type=letter_render.CONTENT_TYPES[file_format])
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Content-Length'] = len(data)
+        response['ETag'] = etag
+        # Propre à l'utilisateur : revalidé à chaque téléchargement, jamais partagé par un cache intermédiaire
+        patch_cache_control(response, private=True, no_cache=True)
         
         return response
         
@@ -584,5 +837,50 @@ def export_cover_letter_pdf(request, match_id):
         messages.error(request, f"Erreur de validation : {str(e)}")
         return redirect('application_workspace', match_id=match_id)
     except Exception as e:
-        messages.error(request, f"Erreur lors de l'export PDF : {str(e)}")
-        return redirect('application_workspace', match_id=match_id)
\ No newline at end of file
+        messages.error(request, f"Erreur lors de l'export {file_format.upper()} : {str(e)}")
+        return redirect('application_workspace', match_id=match_id)
+
+@login_required
+async def export_cover_letters_zip(request):
+    """
+    Archive ZIP de toutes les lettres de motivation de l'utilisateur (?status=applied pour n'exporter que
+    les candidatures d'un statut, ?format=docx pour des documents Word), envoyée au fil du rendu des fichiers
+    (voir services/letter_export.py).
+    """
+    user = await request.auser()
+    status = request.GET.get('status') or None
+    if status is not None and status not in dict(JobMatch.STATUS_CHOICES):
+        return HttpResponse("Statut inconnu", status=400, content_type='text/plain; charset=utf-8')
+    file_format = request.GET.get('format') or letter_render.FORMAT_PDF
+    if file_format not in letter_render.CONTENT_TYPES:
+        return HttpResponse("Format inconnu", status=400, content_type='text/plain; charset=utf-8')
+    response = StreamingHttpResponse(letters_zip_stream(user, status, file_format), content_type='application/zip')
+    filename = f"lettres_motivation_{status}" if status else "lettres_motivation"
+    if file_format != letter_render.FORMAT_PDF:
+        filename += f"_{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Pas de bufferisation côté Nginx
+    return response
+
+
+@staff_member_required
+def ai_dispatcher_stats(request):
+    """
+    État du répartiteur des appels Gemini de ce processus (JSON, réservé au staff) :
+    appels en vol, profondeur de file par priorité, refus, réessais, attente moyenne.
+    """
+    return JsonResponse(get_dispatcher_stats())
+
+
+@staff_member_required
+def ai_metrics(request):
+    """
+    Télémétrie des appels IA sur une fenêtre glissante (JSON, réservé au staff, ?hours=24 par défaut) :
+    par fonctionnalité, appels, erreurs, tokens, coût et histogramme de latence ; utilisateurs les plus coûteux.
+    """
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 24 * 90)
+    except ValueError:
+        hours = 24
+    return JsonResponse(telemetry.summarize(hours))
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import UploadRejectionStat
+
+
+@admin.register(UploadRejectionStat)
+class UploadRejectionStatAdmin(admin.ModelAdmin):
+    """Uploads de CV refusés pendant la réception, par motif (lecture seule)."""
+    list_display = ('reason', 'count', 'bytes_received', 'bytes_declared')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
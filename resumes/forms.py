@@ -14,4 +14,10 @@ class ResumeUploadForm(forms.ModelForm):
                 'class': 'hidden',
                 'accept': '.pdf,application/pdf'
             }),
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if upload_error:
+            # Fichier refusé pendant la réception (ResumeUploadHandler) : il est absent de request.FILES
+            self.fields['file'].error_messages['required'] = upload_error
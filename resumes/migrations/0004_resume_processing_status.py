@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0003_alter_resume_parsed_skills'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='processing_error',
+            field=models.TextField(blank=True, verbose_name="Erreur d'analyse"),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='processing_status',
+            field=models.CharField(choices=[('processing', 'Analyse en cours'), ('ready', 'Prêt'), ('failed', 'Échec')], default='ready', max_length=20, verbose_name="Statut de l'analyse"),
+        ),
+    ]
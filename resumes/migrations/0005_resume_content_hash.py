@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-19 19:31
+
+import resumes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0004_resume_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Empreinte SHA-256'),
+        ),
+        migrations.AlterField(
+            model_name='resume',
+            name='file',
+            field=models.FileField(upload_to=resumes.models.resume_upload_path, verbose_name='Fichier PDF'),
+        ),
+    ]
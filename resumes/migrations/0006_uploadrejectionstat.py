@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0005_resume_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadRejectionStat',
+            fields=[
+                ('reason', models.CharField(choices=[('not_pdf', 'Pas un PDF'), ('too_large', 'Fichier trop volumineux'), ('too_many_pages', 'Trop de pages'), ('encrypted', 'PDF protégé')], max_length=20, primary_key=True, serialize=False)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('bytes_received', models.PositiveBigIntegerField(default=0)),
+                ('bytes_declared', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'upload refusé',
+                'verbose_name_plural': 'uploads refusés',
+            },
+        ),
+    ]
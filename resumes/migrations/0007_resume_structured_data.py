@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-19 20:40
+
+from django.db import migrations, models
+
+
+def fill_structured_data(apps, schema_editor):
+    """Structure les CVs déjà en base (par lots pour limiter la mémoire)."""
+    from resumes.services.sectionizer import structure_cv
+
+    Resume = apps.get_model('resumes', 'Resume')
+    batch = []
+    for resume in Resume.objects.exclude(extracted_text='').only('id', 'extracted_text').iterator(chunk_size=200):
+        resume.structured_data = structure_cv(resume.extracted_text)
+        batch.append(resume)
+        if len(batch) >= 200:
+            Resume.objects.bulk_update(batch, ['structured_data'])
+            batch = []
+    if batch:
+        Resume.objects.bulk_update(batch, ['structured_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0006_uploadrejectionstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='structured_data',
+            field=models.JSONField(blank=True, default=dict, verbose_name='CV structuré'),
+        ),
+        migrations.RunPython(fill_structured_data, migrations.RunPython.noop),
+    ]
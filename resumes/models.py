@@ -2,10 +2,42 @@ from django.db import models
 from django.conf import settings
 
 
+def resume_upload_path(instance, filename):
+    """
+    Stockage adressé par contenu : cvs/<2 premiers caractères>/<sha256>.pdf, un seul fichier pour des uploads
+    identiques (voir services/uploads.py). Sans empreinte (fichier attaché hors upload), nom d'origine.
+    """
+    if not instance.content_hash:
+        return f"cvs/{filename}"
+    return f"cvs/{instance.content_hash[:2]}/{instance.content_hash}.pdf"
+
+
+class ResumeQuerySet(models.QuerySet):
+
+    def for_list(self):
+        """
+        Projection légère pour la liste des CVs : le texte extrait complet, sa structure
+        (et l'ancien champ de compétences) ne sont pas affichés, on ne les charge pas.
+        """
+        return self.defer('extracted_text', 'parsed_skills', 'structured_data')
+
+
 class Resume(models.Model):
+    # Extraction du texte et analyse IA, faites hors requête par la tâche 'process_resume'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, 'Analyse en cours'),
+        (STATUS_READY, 'Prêt'),
+        (STATUS_FAILED, 'Échec'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='resumes')
     title = models.CharField("Titre du CV", max_length=100, default="Mon CV")
-    file = models.FileField("Fichier PDF", upload_to='cvs/')
+    file = models.FileField("Fichier PDF", upload_to=resume_upload_path)
+    # SHA-256 du PDF : un CV déjà envoyé réutilise texte extrait et analyse IA (services/processing.py)
+    content_hash = models.CharField("Empreinte SHA-256", max_length=64, blank=True, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     # Est-ce le CV principal utilisé pour les recherches automatiques ?
@@ -29,5 +61,43 @@ class Resume(models.Model):
     # Infos extraites (ex: {"years_exp": 3, "level": "Junior"})
     parsed_data = models.JSONField("Métadonnées IA", default=dict, blank=True)
 
+    # Sections du CV découpées une fois après l'extraction (services/sectionizer.py), avec l'empreinte du texte
+    structured_data = models.JSONField("CV structuré", default=dict, blank=True)
+
+    processing_status = models.CharField(
+        "Statut de l'analyse", max_length=20, choices=STATUS_CHOICES, default=STATUS_READY
+    )
+    # Message affiché à l'utilisateur si l'extraction ou l'analyse IA n'a pas abouti
+    processing_error = models.TextField("Erreur d'analyse", blank=True)
+
+    objects = ResumeQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.title} ({self.user.username})"
+
+
+class UploadRejectionStat(models.Model):
+    """Uploads de CV refusés pendant la réception (voir services/uploads.py), par motif."""
+    REASON_NOT_PDF = 'not_pdf'
+    REASON_TOO_LARGE = 'too_large'
+    REASON_TOO_MANY_PAGES = 'too_many_pages'
+    REASON_ENCRYPTED = 'encrypted'
+    REASON_CHOICES = [
+        (REASON_NOT_PDF, 'Pas un PDF'),
+        (REASON_TOO_LARGE, 'Fichier trop volumineux'),
+        (REASON_TOO_MANY_PAGES, 'Trop de pages'),
+        (REASON_ENCRYPTED, 'PDF protégé'),
+    ]
+
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, primary_key=True)
+    count = models.PositiveBigIntegerField(default=0)
+    # Octets lus avant l'arrêt (jamais écrits sur disque) et taille annoncée des requêtes refusées
+    bytes_received = models.PositiveBigIntegerField(default=0)
+    bytes_declared = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "upload refusé"
+        verbose_name_plural = "uploads refusés"
+
     def __str__(self):
-        return f"{self.title} ({self.user.username})"
\ No newline at end of file
+        return f"{self.get_reason_display()} : {self.count}"
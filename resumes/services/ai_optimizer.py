@@ -3,11 +3,14 @@ Service IA pour adapter le CV à une offre d'emploi spécifique (CV Optimizer).
 Utilise Google Gemini pour analyser CV + offre et retourner des suggestions.
 """
 import json
-import os
 import logging
 import re
-import google.generativeai as genai
-from django.conf import settings
+from asgiref.sync import sync_to_async
+from matching.services import context_cache, llm_cache, telemetry
+from matching.services.gemini_client import DEFAULT_MODEL, get_model
+from matching.services.gemini_dispatcher import GeminiOverloaded
+from matching.services.prompt_compactor import compact_cv, compact_offer
+from .sectionizer import cv_sections
 
 
 class AIOptimizer:
@@ -18,24 +21,40 @@ class AIOptimizer:
     - Suggestions de modifications pour les expériences (mettre en avant des compétences)
     """
 
+    MODEL_NAME = DEFAULT_MODEL
+    # À incrémenter à chaque modification du prompt : invalide les réponses en cache
+    PROMPT_VERSION = 2
+
     def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY') or getattr(settings, 'GEMINI_API_KEY', None)
-        if not api_key:
-            raise ValueError(
-                "GEMINI_API_KEY manquant. "
-                "Définissez la variable d'environnement GEMINI_API_KEY ou dans settings.py"
-            )
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-
-    def optimize_for_offer(self, cv_text: str, job_description: str, job_title: str = "") -> dict:
+        self.model = get_model(self.MODEL_NAME)
+
+    @classmethod
+    def cache_key(cls, cv_text: str, job_description: str, job_title: str = "") -> str:
+        return llm_cache.make_key(
+            llm_cache.FEATURE_CV_OPTIMIZER, cls.MODEL_NAME, cls.PROMPT_VERSION,
+            cv_text, job_description, job_title,
+        )
+
+    @classmethod
+    def cached_result(cls, cv_text: str, job_description: str, job_title: str = ""):
+        """Suggestions déjà calculées pour ce CV et cette offre (None si absentes), sans appel à Gemini."""
+        return llm_cache.lookup(llm_cache.FEATURE_CV_OPTIMIZER, cls.cache_key(cv_text, job_description, job_title))
+
+    def optimize_for_offer(self, cv_text: str, job_description: str, job_title: str = "", use_cache: bool = True,
+                           resume=None) -> dict:
         """
         Analyse le CV par rapport à l'offre et retourne des suggestions d'adaptation.
+        Le résultat est mis en cache (llm_cache) ; use_cache=False force un nouvel appel
+        (l'appelant a déjà consulté le cache via cached_result).
+        Avec resume, le texte du CV est envoyé une fois dans un contexte en cache (context_cache)
+        et le prompt ne contient plus que l'offre.
 
         Args:
             cv_text: Texte brut du CV
             job_description: Description de l'offre d'emploi
             job_title: Titre du poste (optionnel, pour contexte)
+            use_cache: Consulter le cache avant d'appeler Gemini
+            resume: Instance Resume dont cv_text est le texte extrait (optionnel)
 
         Returns:
             dict: {
@@ -44,33 +63,88 @@ class AIOptimizer:
                 'experience_suggestions': list[dict]  # [{'experience': str, 'suggestion': str}, ...]
             }
         """
-        if not cv_text or not cv_text.strip():
-            return {
-                'missing_keywords': [],
-                'suggested_summary': '',
-                'experience_suggestions': []
-            }
-        if not job_description or not job_description.strip():
-            return {
-                'missing_keywords': [],
-                'suggested_summary': '',
-                'experience_suggestions': []
-            }
+        if not cv_text or not cv_text.strip() or not job_description or not job_description.strip():
+            return self._empty_result()
 
-        title_context = f" pour le poste : {job_title}" if job_title else ""
+        key = self.cache_key(cv_text, job_description, job_title)
+        if use_cache:
+            cached = llm_cache.lookup(llm_cache.FEATURE_CV_OPTIMIZER, key)
+            if cached is not None:
+                return cached
 
-        prompt = f"""Tu es un expert en recrutement et en optimisation de CV. Ta mission est d'aider un candidat à adapter son CV à une offre d'emploi précise.
+        try:
+            with telemetry.feature(telemetry.FEATURE_CV_OPTIMIZER):
+                response = context_cache.generate(
+                    resume, self.MODEL_NAME,
+                    lambda cv_in_context: self._build_prompt(cv_text, job_description, job_title, cv_in_context,
+                                                             resume=resume),
+                    self.model,
+                )
+            result = self._parse_response(response.text)
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            logging.error(f"Erreur CV Optimizer Gemini : {e}")
+            raise Exception(f"Erreur lors de l'analyse d'adaptation du CV : {str(e)}")
+        llm_cache.store(llm_cache.FEATURE_CV_OPTIMIZER, key, self.MODEL_NAME, result)
+        return result
+
+    async def aoptimize_for_offer(self, cv_text: str, job_description: str, job_title: str = "", use_cache: bool = True,
+                                  resume=None) -> dict:
+        """Version asynchrone de optimize_for_offer (n'immobilise pas de thread pendant l'appel Gemini)."""
+        if not cv_text or not cv_text.strip() or not job_description or not job_description.strip():
+            return self._empty_result()
+
+        key = self.cache_key(cv_text, job_description, job_title)
+        if use_cache:
+            cached = await sync_to_async(llm_cache.lookup)(llm_cache.FEATURE_CV_OPTIMIZER, key)
+            if cached is not None:
+                return cached
+
+        try:
+            with telemetry.feature(telemetry.FEATURE_CV_OPTIMIZER):
+                response = await context_cache.agenerate(
+                    resume, self.MODEL_NAME,
+                    lambda cv_in_context: self._build_prompt(cv_text, job_description, job_title, cv_in_context,
+                                                             resume=resume),
+                    self.model,
+                )
+            result = self._parse_response(response.text)
+        except GeminiOverloaded:
+            raise
+        except Exception as e:
+            logging.error(f"Erreur CV Optimizer Gemini : {e}")
+            raise Exception(f"Erreur lors de l'analyse d'adaptation du CV : {str(e)}")
+        await sync_to_async(llm_cache.store)(llm_cache.FEATURE_CV_OPTIMIZER, key, self.MODEL_NAME, result)
+        return result
+
+    @staticmethod
+    def _empty_result():
+        return {
+            'missing_keywords': [],
+            'suggested_summary': '',
+            'experience_suggestions': []
+        }
+
+    def _build_prompt(self, cv_text: str, job_description: str, job_title: str = "", cv_in_context: bool = False,
+                      resume=None) -> str:
+        if cv_in_context:
+            cv_block = context_cache.CV_IN_CONTEXT
+        else:
+            cv_block = compact_cv(cv_text, 'cv_optimizer', offer_text=job_description,
+                                  sections=cv_sections(resume, cv_text))
+        return f"""Tu es un expert en recrutement et en optimisation de CV. Ta mission est d'aider un candidat à adapter son CV à une offre d'emploi précise.
 
 DOCUMENT 1 : CV ACTUEL DU CANDIDAT
 ---
-{cv_text[:6000]}
+{cv_block}
 ---
 
 DOCUMENT 2 : OFFRE D'EMPLOI
 ---
 Titre du poste : {job_title or "Non spécifié"}
 ---
-{job_description[:6000]}
+{compact_offer(job_description, 'cv_optimizer', cv_text=cv_text)}
 ---
 
 Analyse les deux documents et retourne UNIQUEMENT un JSON valide (sans texte avant ou après) avec la structure exacte suivante :
@@ -91,59 +165,51 @@ RÈGLES :
 4. Réponds UNIQUEMENT avec le JSON, sans markdown (pas de ```json).
 """
 
-        try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-
-            # Nettoyage des blocs markdown
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                logging.warning(f"Erreur parsing JSON CV Optimizer : {e}. Réponse : {response_text[:500]}")
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if json_match:
-                    result = json.loads(json_match.group(0))
-                else:
-                    return {
-                        'missing_keywords': [],
-                        'suggested_summary': '',
-                        'experience_suggestions': []
-                    }
-
-            missing_keywords = result.get('missing_keywords', [])
-            if not isinstance(missing_keywords, list):
-                missing_keywords = []
-            missing_keywords = [str(k).strip() for k in missing_keywords if k and str(k).strip()][:15]
-
-            suggested_summary = result.get('suggested_summary') or ''
-            if not isinstance(suggested_summary, str):
-                suggested_summary = str(suggested_summary).strip()
-
-            experience_suggestions = result.get('experience_suggestions', [])
-            if not isinstance(experience_suggestions, list):
-                experience_suggestions = []
-            cleaned_suggestions = []
-            for item in experience_suggestions[:5]:
-                if isinstance(item, dict) and item.get('experience') and item.get('suggestion'):
-                    cleaned_suggestions.append({
-                        'experience': str(item['experience']).strip(),
-                        'suggestion': str(item['suggestion']).strip()
-                    })
-
-            return {
-                'missing_keywords': missing_keywords,
-                'suggested_summary': suggested_summary,
-                'experience_suggestions': cleaned_suggestions
-            }
+    def _parse_response(self, response_text: str) -> dict:
+        """Nettoie et valide la réponse JSON de Gemini."""
+        response_text = response_text.strip()
 
-        except Exception as e:
-            logging.error(f"Erreur CV Optimizer Gemini : {e}")
-            raise Exception(f"Erreur lors de l'analyse d'adaptation du CV : {str(e)}")
+        # Nettoyage des blocs markdown
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]
+        elif response_text.startswith('```'):
+            response_text = response_text[3:]
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]
+        response_text = response_text.strip()
+
+        try:
+            result = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            logging.warning(f"Erreur parsing JSON CV Optimizer : {e}. Réponse : {response_text[:500]}")
+            json_match = re.search(r'\{[\s\S]*\}', response_text)
+            if json_match:
+                result = json.loads(json_match.group(0))
+            else:
+                return self._empty_result()
+
+        missing_keywords = result.get('missing_keywords', [])
+        if not isinstance(missing_keywords, list):
+            missing_keywords = []
+        missing_keywords = [str(k).strip() for k in missing_keywords if k and str(k).strip()][:15]
+
+        suggested_summary = result.get('suggested_summary') or ''
+        if not isinstance(suggested_summary, str):
+            suggested_summary = str(suggested_summary).strip()
+
+        experience_suggestions = result.get('experience_suggestions', [])
+        if not isinstance(experience_suggestions, list):
+            experience_suggestions = []
+        cleaned_suggestions = []
+        for item in experience_suggestions[:5]:
+            if isinstance(item, dict) and item.get('experience') and item.get('suggestion'):
+                cleaned_suggestions.append({
+                    'experience': str(item['experience']).strip(),
+                    'suggestion': str(item['suggestion']).strip()
+                })
+
+        return {
+            'missing_keywords': missing_keywords,
+            'suggested_summary': suggested_summary,
+            'experience_suggestions': cleaned_suggestions
+        }
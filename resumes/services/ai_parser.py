@@ -3,10 +3,11 @@ Service d'analyse IA pour extraire le titre du poste et les compétences d'un CV
 Utilise Google Gemini pour analyser le texte extrait du PDF.
 """
 import json
-import os
 import logging
-import google.generativeai as genai
-from django.conf import settings
+from matching.services import llm_cache, telemetry
+from matching.services.gemini_client import DEFAULT_MODEL, get_model
+from matching.services.gemini_dispatcher import GeminiOverloaded
+from matching.services.prompt_compactor import compact_cv
 
 
 class AIParser:
@@ -16,23 +17,34 @@ class AIParser:
     - Les compétences techniques (skills)
     """
     
+    MODEL_NAME = DEFAULT_MODEL
+    # À incrémenter à chaque modification du prompt : invalide les réponses en cache
+    PROMPT_VERSION = 2
+
     def __init__(self):
-        """Initialise l'API Gemini avec la clé API depuis les settings."""
-        api_key = os.getenv('GEMINI_API_KEY') or getattr(settings, 'GEMINI_API_KEY', None)
-        if not api_key:
-            raise ValueError(
-                "GEMINI_API_KEY manquant. "
-                "Définissez la variable d'environnement GEMINI_API_KEY ou dans settings.py"
-            )
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        """Récupère le modèle Gemini partagé du processus (clé API depuis l'environnement ou les settings)."""
+        self.model = get_model(self.MODEL_NAME)
+
+    @classmethod
+    def cache_key(cls, cv_text):
+        return llm_cache.make_key(llm_cache.FEATURE_CV_PARSER, cls.MODEL_NAME, cls.PROMPT_VERSION, cv_text)
+
+    @classmethod
+    def cached_result(cls, cv_text):
+        """Analyse déjà calculée pour ce texte de CV (None si absente), sans appel à Gemini."""
+        if not cv_text or not cv_text.strip():
+            return None
+        return llm_cache.lookup(llm_cache.FEATURE_CV_PARSER, cls.cache_key(cv_text))
     
-    def extract_job_info(self, cv_text):
+    def extract_job_info(self, cv_text, use_cache=True, sections=None):
         """
         Analyse le texte du CV et extrait le titre du poste visé et les compétences.
+        Le résultat est mis en cache (llm_cache) ; use_cache=False force un nouvel appel.
         
         Args:
             cv_text (str): Texte brut extrait du CV
+            use_cache (bool): Consulter le cache avant d'appeler Gemini
+            sections (list): Sections déjà découpées de ce texte (Resume.structured_data), optionnel
             
         Returns:
             dict: {
@@ -49,6 +61,12 @@ class AIParser:
                 'job_title': None,
                 'skills': []
             }
+
+        key = self.cache_key(cv_text)
+        if use_cache:
+            cached = llm_cache.lookup(llm_cache.FEATURE_CV_PARSER, key)
+            if cached is not None:
+                return cached
         
         # Prompt pour Gemini - demande un JSON strict
         prompt = f"""Analyse ce CV et extrais les informations suivantes au format JSON strict :
@@ -68,12 +86,13 @@ IMPORTANT :
 - Le job_title est la priorité absolue pour la recherche d'emploi.
 
 Texte du CV :
-{cv_text[:4000]}  # Limite à 4000 caractères pour éviter les tokens excessifs
+{compact_cv(cv_text, 'cv_parser', sections=sections)}
 """
         
         try:
             # Appel à Gemini
-            response = self.model.generate_content(prompt)
+            with telemetry.feature(telemetry.FEATURE_CV_PARSER):
+                response = self.model.generate_content(prompt)
             response_text = response.text.strip()
             
             # Nettoyage : enlever les markdown code blocks si présents
@@ -117,11 +136,16 @@ Texte du CV :
             skills = [s.strip() for s in skills if s and isinstance(s, str) and s.strip()]
             skills = list(set(skills))  # Supprimer les doublons
             
-            return {
+            result = {
                 'job_title': job_title,
                 'skills': skills
             }
             
+        except GeminiOverloaded:
+            raise
         except Exception as e:
             logging.info(f"❌ Erreur lors de l'appel à Gemini : {e}")
             raise Exception(f"Erreur lors de l'analyse IA du CV : {str(e)}")
+
+        llm_cache.store(llm_cache.FEATURE_CV_PARSER, key, self.MODEL_NAME, result)
+        return result
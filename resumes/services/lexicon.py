@@ -0,0 +1,167 @@
+"""
+Lexiques de l'extracteur local (local_parser.py) : compétences (nom affiché -> variantes rencontrées dans les
+CV) et intitulés de poste. Les variantes sont comparées sans accents ni casse, mot à mot. Les noms ambigus en
+texte libre (« Go », « R », « vue », « rails ») ne sont reconnus que sous une forme explicite.
+"""
+
+SKILLS = {
+    # Langages
+    'Python': ('python', 'python3'),
+    'Java': ('java', 'java ee', 'jee'),
+    'JavaScript': ('javascript', 'js', 'es6'),
+    'TypeScript': ('typescript',),
+    'PHP': ('php',),
+    'C++': ('c++', 'cpp'),
+    'C#': ('c#', 'csharp'),
+    'Go': ('golang',),
+    'R': ('langage r', 'rstudio'),
+    'Rust': ('rust',),
+    'Kotlin': ('kotlin',),
+    'Swift': ('swift',),
+    'Scala': ('scala',),
+    'Ruby': ('ruby',),
+    'Dart': ('dart',),
+    'SQL': ('sql',),
+    'PL/SQL': ('pl/sql', 'plsql'),
+    'Bash': ('bash', 'shell', 'scripting shell'),
+    'HTML': ('html', 'html5'),
+    'CSS': ('css', 'css3'),
+    'Sass': ('sass', 'scss'),
+    'VBA': ('vba',),
+    'MATLAB': ('matlab',),
+    # Frameworks et bibliothèques
+    'Django': ('django', 'django rest framework', 'drf'),
+    'Flask': ('flask',),
+    'FastAPI': ('fastapi',),
+    'Spring': ('spring', 'spring boot', 'springboot'),
+    'Hibernate': ('hibernate',),
+    'Symfony': ('symfony',),
+    'Laravel': ('laravel',),
+    'Ruby on Rails': ('ruby on rails',),
+    '.NET': ('.net', 'dotnet', 'asp.net'),
+    'Node.js': ('node.js', 'nodejs', 'node'),
+    'Express': ('express.js', 'expressjs'),
+    'React': ('react', 'react.js', 'reactjs'),
+    'React Native': ('react native',),
+    'Angular': ('angular', 'angularjs'),
+    'Vue.js': ('vue.js', 'vuejs'),
+    'Next.js': ('next.js', 'nextjs'),
+    'jQuery': ('jquery',),
+    'Bootstrap': ('bootstrap',),
+    'Tailwind CSS': ('tailwind', 'tailwindcss', 'tailwind css'),
+    'Flutter': ('flutter',),
+    'Pandas': ('pandas',),
+    'NumPy': ('numpy',),
+    'scikit-learn': ('scikit-learn', 'sklearn', 'scikit learn'),
+    'TensorFlow': ('tensorflow',),
+    'PyTorch': ('pytorch',),
+    'Keras': ('keras',),
+    'Spark': ('spark', 'apache spark', 'pyspark'),
+    'Hadoop': ('hadoop',),
+    'Airflow': ('airflow', 'apache airflow'),
+    'Kafka': ('kafka', 'apache kafka'),
+    'dbt': ('dbt',),
+    'GraphQL': ('graphql',),
+    'REST': ('api rest', 'rest api', 'restful', 'api restful'),
+    # Bases de données
+    'PostgreSQL': ('postgresql', 'postgres'),
+    'MySQL': ('mysql',),
+    'MariaDB': ('mariadb',),
+    'Oracle': ('oracle', 'oracle database'),
+    'SQL Server': ('sql server', 'mssql'),
+    'SQLite': ('sqlite',),
+    'MongoDB': ('mongodb', 'mongo'),
+    'Redis': ('redis',),
+    'Elasticsearch': ('elasticsearch', 'elastic search'),
+    'Cassandra': ('cassandra',),
+    'Snowflake': ('snowflake',),
+    'BigQuery': ('bigquery',),
+    # Cloud, DevOps, outils
+    'AWS': ('aws', 'amazon web services'),
+    'Azure': ('azure', 'microsoft azure'),
+    'GCP': ('gcp', 'google cloud', 'google cloud platform'),
+    'Docker': ('docker',),
+    'Kubernetes': ('kubernetes', 'k8s'),
+    'Terraform': ('terraform',),
+    'Ansible': ('ansible',),
+    'Jenkins': ('jenkins',),
+    'GitLab CI': ('gitlab ci', 'gitlab-ci', 'gitlab ci/cd'),
+    'GitHub Actions': ('github actions',),
+    'CI/CD': ('ci/cd', 'ci cd', 'integration continue'),
+    'Git': ('git', 'github', 'gitlab'),
+    'Linux': ('linux', 'unix', 'ubuntu', 'debian'),
+    'Nginx': ('nginx',),
+    'Apache': ('apache',),
+    'Jira': ('jira',),
+    'Confluence': ('confluence',),
+    'Agile': ('agile', 'methodes agiles', 'methodologie agile'),
+    'Scrum': ('scrum',),
+    'Kanban': ('kanban',),
+    'UML': ('uml',),
+    'Microservices': ('microservices', 'micro-services'),
+    'Power BI': ('power bi', 'powerbi'),
+    'Tableau': ('tableau software',),
+    'Excel': ('excel', 'microsoft excel'),
+    'Looker': ('looker',),
+    'SAP': ('sap',),
+    'Salesforce': ('salesforce',),
+    'Figma': ('figma',),
+    'Photoshop': ('photoshop',),
+    'Illustrator': ('illustrator',),
+    'InDesign': ('indesign',),
+    'AutoCAD': ('autocad',),
+    'SolidWorks': ('solidworks',),
+    'WordPress': ('wordpress',),
+    'SEO': ('seo', 'referencement naturel'),
+    'Google Analytics': ('google analytics',),
+    'Machine Learning': ('machine learning', 'apprentissage automatique'),
+    'Deep Learning': ('deep learning',),
+    'NLP': ('nlp', 'traitement du langage naturel'),
+    'Computer Vision': ('computer vision', 'vision par ordinateur'),
+    'Data Visualisation': ('data visualisation', 'data visualization', 'dataviz'),
+    'ETL': ('etl',),
+    'Cybersécurité': ('cybersecurite', 'securite informatique'),
+    'Réseaux': ('reseaux informatiques', 'tcp/ip'),
+    'Selenium': ('selenium',),
+    'Cypress': ('cypress',),
+    'JUnit': ('junit',),
+    'pytest': ('pytest',),
+    'Postman': ('postman',),
+    'RabbitMQ': ('rabbitmq',),
+    'Celery': ('celery',),
+    'Android': ('android',),
+    'iOS': ('ios',),
+    'Unity': ('unity',),
+}
+
+# Noms de métier (début d'un intitulé de poste)
+JOB_TITLES = (
+    'developpeur', 'developpeuse', 'developer', 'developpeur full stack', 'developpeur fullstack',
+    'ingenieur', 'ingenieure', 'engineer', 'software engineer', 'data engineer', 'data scientist',
+    'data analyst', 'business analyst', 'analyste', 'architecte', 'administrateur', 'administratrice',
+    'technicien', 'technicienne', 'devops', 'sre', 'tech lead', 'lead developer', 'cto',
+    'chef de projet', 'cheffe de projet', 'project manager', 'product owner', 'product manager', 'scrum master',
+    'consultant', 'consultante', 'designer', 'ux designer', 'ui designer', 'graphiste', 'webdesigner',
+    'integrateur', 'integratrice', 'testeur', 'testeuse', 'qa engineer',
+    'charge de', 'chargee de', 'responsable', 'directeur', 'directrice', 'manager', 'assistant', 'assistante',
+    'comptable', 'controleur de gestion', 'controleuse de gestion', 'juriste', 'avocat', 'avocate',
+    'commercial', 'commerciale', 'business developer', 'account manager', 'acheteur', 'acheteuse',
+    'community manager', 'marketing', 'communication', 'recruteur', 'recruteuse', 'rh',
+    'infirmier', 'infirmiere', 'aide-soignant', 'aide-soignante', 'pharmacien', 'pharmacienne',
+    'boulanger', 'boulangere', 'patissier', 'patissiere', 'cuisinier', 'cuisiniere', 'serveur', 'serveuse',
+    'vendeur', 'vendeuse', 'conseiller', 'conseillere', 'caissier', 'caissiere', 'magasinier', 'magasiniere',
+    'electricien', 'electricienne', 'mecanicien', 'mecanicienne', 'plombier', 'macon', 'chauffeur',
+    'livreur', 'agent', 'operateur', 'operatrice', 'logisticien', 'logisticienne', 'professeur', 'enseignant',
+    'enseignante', 'educateur', 'educatrice', 'animateur', 'animatrice', 'secretaire', 'redacteur', 'redactrice',
+    'journaliste', 'traducteur', 'traductrice', 'photographe', 'architecte logiciel', 'stagiaire', 'alternant',
+    'alternante', 'apprenti', 'apprentie',
+)
+
+# Type de contrat recherché, souvent en tête de l'intitulé (« Stage Data Engineer »)
+CONTRACT_PREFIXES = ('stage', 'alternance', 'apprentissage', 'cdi', 'cdd', 'freelance', 'interim', 'vie')
+
+# Formules d'introduction retirées de l'intitulé
+TITLE_INTRODUCTIONS = (
+    'a la recherche d\'un', 'a la recherche d\'une', 'a la recherche d\'un poste de', 'recherche un', 'recherche une',
+    'en recherche de', 'recherche', 'poste de', 'poste recherche', 'objectif',
+)
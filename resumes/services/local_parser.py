@@ -0,0 +1,187 @@
+"""
+Extracteur local du poste visé et des compétences d'un CV, essayé avant Gemini (services/processing.py,
+import_resumes). Les lexiques (lexicon.py) sont compilés une fois en arbres de préfixes sur les mots normalisés
+(sans accents ni casse) : une lecture du texte suffit pour trouver les compétences, même en plusieurs mots
+(« Spring Boot », « Power BI »). L'intitulé est cherché sur les premières lignes du CV (en-tête puis profil).
+L'indice de confiance combine la position et la forme de l'intitulé trouvé et le nombre de compétences :
+à partir de LOCAL_PARSER_MIN_CONFIDENCE le résultat est utilisé tel quel, sans appel à Gemini ni crédit.
+Taux d'appels évités et accord avec Gemini : python manage.py eval_local_parser.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+
+from .lexicon import CONTRACT_PREFIXES, JOB_TITLES, SKILLS, TITLE_INTRODUCTIONS
+from .sectionizer import EMAIL_RE, ENTRY_START_RE, LINK_RE, PHONE_RE, section_lines, structure_cv
+
+
+# Lignes de l'en-tête (puis du profil) examinées pour l'intitulé
+TITLE_LINES = 8
+TITLE_MAX_WORDS = 10
+# Nombre de compétences au-delà duquel la part « compétences » de la confiance est pleine
+CONFIDENT_SKILLS = 4
+TITLE_WEIGHT = 0.75
+
+# Source de l'analyse d'un CV, notée dans Resume.parsed_data['analysis']
+ANALYSIS_LOCAL = 'local'
+ANALYSIS_GEMINI = 'gemini'
+ANALYSIS_CACHE = 'cache'
+
+# Mots : lettres, chiffres, + et # (C++, C#), reliés par . / - (node.js, pl/sql, scikit-learn)
+_word_re = re.compile(r"\.?[a-z0-9+#]+(?:[./-][a-z0-9+#]+)*")
+_joiner_re = re.compile(r"[./-]")
+# Séparateurs entre l'intitulé et le reste de la ligne (« Développeur Python | 5 ans d'expérience »)
+_segment_re = re.compile(r"\s+[-–—|•·]\s+|\s*[|•·]\s*|\s*:\s+")
+
+
+def _fold(text):
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _alias_tokens(alias):
+    return _word_re.findall(_fold(alias))
+
+
+def _compile(entries):
+    """Arbre de préfixes {mot: {...}, None: valeur} construit à partir de paires (variante, valeur)."""
+    root = {}
+    for alias, value in entries:
+        node = root
+        for token in _alias_tokens(alias):
+            node = node.setdefault(token, {})
+        node.setdefault(None, value)
+    return root
+
+
+_SKILL_TRIE = _compile((alias, name) for name, aliases in SKILLS.items() for alias in aliases)
+_TITLE_TRIE = _compile((title, title) for title in JOB_TITLES)
+_CONTRACTS = frozenset(CONTRACT_PREFIXES)
+_INTRODUCTIONS = sorted((_fold(intro) for intro in TITLE_INTRODUCTIONS), key=len, reverse=True)
+# Variantes d'un seul mot contenant . / - : gardées entières, les autres mots composés sont découpés
+_COMPOUNDS = frozenset(
+    token for aliases in (*SKILLS.values(), JOB_TITLES) for alias in aliases
+    for token in _alias_tokens(alias) if _joiner_re.search(token)
+)
+
+
+def tokens(text):
+    """Mots normalisés du texte ; « Python/Django » donne deux mots, « node.js » un seul."""
+    words = []
+    for word in _word_re.findall(_fold(text)):
+        if word.startswith('.') and word not in _COMPOUNDS:
+            word = word[1:]
+        if word in _COMPOUNDS or not _joiner_re.search(word):
+            words.append(word)
+        else:
+            words.extend(part for part in _joiner_re.split(word) if part)
+    return words
+
+
+def _matches(trie, words):
+    """Correspondances les plus longues, sans chevauchement : [(début, fin, valeur)]."""
+    found = []
+    i = 0
+    while i < len(words):
+        node, end, value = trie, None, None
+        for j in range(i, len(words)):
+            node = node.get(words[j])
+            if node is None:
+                break
+            if None in node:
+                end, value = j + 1, node[None]
+        if end is None:
+            i += 1
+        else:
+            found.append((i, end, value))
+            i = end
+    return found
+
+
+def find_skills(text):
+    """Compétences du lexique citées dans le texte (noms affichés), dans l'ordre d'apparition."""
+    return list(dict.fromkeys(value for _, _, value in _matches(_SKILL_TRIE, tokens(text))))
+
+
+def canonical_skill(name):
+    """Nom affiché d'une compétence du lexique (« reactjs » -> « React »), sinon le nom normalisé."""
+    words = tokens(name)
+    found = _matches(_SKILL_TRIE, words)
+    if len(found) == 1 and found[0][:2] == (0, len(words)):
+        return found[0][2]
+    return ' '.join(words)
+
+
+def extract(text, structure=None):
+    """
+    Poste visé et compétences trouvés localement : {'job_title', 'skills', 'confidence'}, confiance entre 0 et 1.
+    structure : Resume.structured_data de ce texte (recalculée si absente).
+    """
+    structure = structure or structure_cv(text)
+    skills = find_skills(text)
+    job_title, title_score = _find_title(_title_lines(structure))
+    skills_score = min(len(skills), CONFIDENT_SKILLS) / CONFIDENT_SKILLS
+    confidence = TITLE_WEIGHT * title_score + (1 - TITLE_WEIGHT) * skills_score
+    return {'job_title': job_title, 'skills': skills, 'confidence': round(confidence, 3)}
+
+
+def min_confidence():
+    """Seuil de confiance au-delà duquel Gemini n'est pas appelé (None : extracteur désactivé)."""
+    if not getattr(settings, 'LOCAL_PARSER_ENABLED', True):
+        return None
+    return getattr(settings, 'LOCAL_PARSER_MIN_CONFIDENCE', 0.75)
+
+
+def is_confident(result, threshold=None):
+    threshold = min_confidence() if threshold is None else threshold
+    return threshold is not None and bool(result['job_title']) and result['confidence'] >= threshold
+
+
+def analysis_info(source, confidence):
+    """Entrée parsed_data['analysis'] : source de l'analyse et confiance de l'extracteur local."""
+    return {'source': source, 'local_confidence': confidence}
+
+
+def _title_lines(structure):
+    """Premières lignes du CV : en-tête puis début du profil (sans son titre de section)."""
+    lines = [line for line in section_lines(structure, 'header') if line.strip()][:TITLE_LINES]
+    lines += [line for line in section_lines(structure, 'profile')[1:] if line.strip()][:2]
+    return lines
+
+
+def _find_title(lines):
+    """(intitulé, score entre 0 et 1) de la meilleure ligne candidate ; (None, 0) si aucune."""
+    best, best_score = None, 0.0
+    for index, line in enumerate(lines):
+        if EMAIL_RE.search(line) or PHONE_RE.search(line) or LINK_RE.search(line) or ENTRY_START_RE.search(line):
+            continue
+        for segment in _segment_re.split(line):
+            words = tokens(segment)
+            found = _matches(_TITLE_TRIE, words)
+            if not found or len(words) > TITLE_MAX_WORDS * 2:
+                continue
+            title = _clean_title(segment)
+            title_words = len(tokens(title))
+            score = 0.6 + 0.25 * max(0.0, 1 - index / TITLE_LINES)
+            # Intitulé court commençant par le métier ou le type de contrat : « Stage Data Engineer »
+            if title_words <= TITLE_MAX_WORDS // 2 + 1:
+                score += 0.1
+            elif title_words > TITLE_MAX_WORDS:
+                score -= 0.3
+            if words and (words[0] in _CONTRACTS or found[0][0] == 0):
+                score += 0.05
+            if score > best_score:
+                best, best_score = title, min(score, 1.0)
+    return best, best_score
+
+
+def _clean_title(segment):
+    """Intitulé sans formule d'introduction (« À la recherche d'un stage... ») ni ponctuation finale."""
+    title = segment.strip(' \t.,;:!-*•')
+    folded = _fold(title)
+    for intro in _INTRODUCTIONS:
+        if folded.startswith(intro + ' '):
+            title = title[len(intro) + 1:].lstrip(' :')
+            break
+    return title[:1].upper() + title[1:255]
@@ -1,7 +1,86 @@
 # resumes/pdf_parser.py
-import pdfplumber
-import re
+"""
+Extraction du texte des CV PDF.
+
+PDFParser.extract_text lit le PDF dans le processus courant ; extract_text_parallel, utilisée par la tâche
+de traitement des CV (resumes/tasks.py), répartit les pages entre les processus d'un pool
+(PDF_EXTRACTION_WORKERS) : pdfplumber est coûteux en CPU et tient le GIL.
+Chaque document a un budget de temps (PDF_EXTRACTION_TIMEOUT, en secondes) et chaque processus du pool un
+plafond de mémoire (PDF_EXTRACTION_MEMORY_MB) ; au-delà, ExtractionBudgetExceeded. La durée de chaque page
+est mesurée (page_timings_ms).
+
+Moteurs d'extraction (PDF_EXTRACTION_ENGINE) : seul le texte brut est utile, le calcul de mise en page complet
+de pdfplumber est superflu. Par défaut ('auto'), pypdfium2 s'il est installé, sinon pdfminer sans analyse de
+mise en page. Une tranche dont le texte semble cassé (trop court, caractères illisibles, mots collés, lignes
+fragmentées) est relue avec pdfplumber, dont le texte n'est gardé que s'il est correct ; une tranche sans aucun
+texte (PDF scanné) n'est pas relue : pdfplumber lit la même couche de texte.
+Comparaison : python manage.py bench_pdf_extraction.
+"""
+import io
 import logging
+import math
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+from django.conf import settings
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTContainer
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser as PDFMinerParser
+from pdfminer.pdftypes import resolve1
+
+from .sectionizer import EMAIL_RE, PHONE_RE
+
+try:
+    import resource
+except ImportError:  # Windows : pas de plafond de mémoire
+    resource = None
+
+try:
+    import pypdfium2
+except ImportError:  # Moteur rapide optionnel : pdfminer sinon
+    pypdfium2 = None
+
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# PDFium n'est pas thread-safe (extract_text peut être appelée depuis plusieurs threads)
+_pdfium_lock = threading.Lock()
+
+ENGINE_PDFIUM = 'pdfium'
+ENGINE_PDFMINER = 'pdfminer'
+ENGINE_PDFPLUMBER = 'pdfplumber'
+
+# Seuils de détection d'un texte cassé (moteurs rapides). Sur le corpus de bench_pdf_extraction, les CV corrects
+# (puces comprises) sont à 0 caractère illisible, 5,6 lettres par mot et 0 % de lignes fragmentées au plus
+MIN_CHARS_PER_PAGE = 100
+MAX_GARBLED_RATIO = 0.02
+MAX_MEAN_WORD_LENGTH = 20
+MAX_SHORT_LINES_RATIO = 0.4
+
+REASON_NO_TEXT = "aucun texte"
+
+# Glyphe sans équivalent Unicode isolé entre deux blancs (puce, pictogramme d'une police de symboles) :
+# aucun moteur ne le décode, ce n'est pas un mot illisible
+_isolated_symbol_re = re.compile(r'(?<!\S)(?:\(cid:\d+\)|[\ue000-\uf8ff])(?!\S)')
+_cid_re = re.compile(r'\(cid:\d+\)')
+
+
+class ExtractionBudgetExceeded(Exception):
+    """Extraction interrompue : budget de temps ou de mémoire du document dépassé."""
 
 
 class PDFParser:
@@ -9,23 +88,80 @@ class PDFParser:
     Service pour extraire le texte brut d'un PDF et des informations basiques (email, téléphone).
     L'extraction des compétences et du titre de poste est maintenant gérée par AIParser (Gemini).
     """
-    
+
     def __init__(self, pdf_path):
         self.pdf_path = pdf_path
         self.full_text = ""
+        self.page_timings_ms = []
+        self.engines = {}
 
     def extract_text(self):
         """Étape 1 : Récupérer le texte brut du PDF"""
         try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        self.full_text += text + "\n"
-            return self.full_text
+            pages = _extract_pages(self.pdf_path, 0, None)
         except Exception as e:
             logging.info(f"Erreur lecture PDF : {e}")
             return None
+        return self._assemble(pages)
+
+    def extract_text_parallel(self, timeout=None):
+        """
+        Comme extract_text, dans le pool de processus : les pages sont réparties en tranches
+        (PDF_EXTRACTION_PAGES_PER_CHUNK pages au moins par processus) puis réassemblées dans l'ordre.
+
+        Raises:
+            ExtractionBudgetExceeded: Document trop long à extraire ou trop gourmand en mémoire
+        """
+        timeout = timeout if timeout is not None else getattr(settings, 'PDF_EXTRACTION_TIMEOUT', 30)
+        deadline = time.monotonic() + timeout
+        try:
+            page_count = page_count_of(self.pdf_path)
+        except Exception as e:
+            logging.info(f"Erreur lecture PDF : {e}")
+            return None
+
+        workers = getattr(settings, 'PDF_EXTRACTION_WORKERS', 2)
+        per_chunk = max(getattr(settings, 'PDF_EXTRACTION_PAGES_PER_CHUNK', 2),
+                        math.ceil(page_count / max(workers, 1)))
+        ranges = [(start, min(start + per_chunk, page_count)) for start in range(0, page_count, per_chunk)]
+
+        pool = get_pool()
+        remaining = max(deadline - time.monotonic(), 0.1)
+        engine = default_engine()
+        futures = [pool.submit(_extract_pages, self.pdf_path, start, stop, remaining, engine)
+                   for start, stop in ranges]
+        done, pending = wait(futures, timeout=remaining + 1, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        try:
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            if pending:
+                raise ExtractionBudgetExceeded(f"Extraction du PDF plus longue que {timeout:g} s")
+            pages = [page for future in futures for page in future.result()]
+        except BrokenProcessPool:
+            # Processus du pool tué (mémoire) : le pool est recréé au prochain document
+            reset_pool()
+            raise ExtractionBudgetExceeded("Processus d'extraction du PDF interrompu")
+        except ExtractionBudgetExceeded:
+            raise
+        except Exception as e:
+            logging.info(f"Erreur lecture PDF : {e}")
+            return None
+        return self._assemble(pages)
+
+    def _assemble(self, pages):
+        """Texte complet à partir des (texte, durée en ms, moteur) des pages, dans l'ordre."""
+        self.page_timings_ms = [round(ms, 1) for _, ms, _ in pages]
+        self.engines = dict(Counter(engine for _, _, engine in pages))
+        self.full_text = "".join(text + "\n" for text, _, _ in pages if text)
+        logger.info(
+            "PDF %s : %s page(s) extraites en %.0f ms (page la plus lente : %.0f ms, moteurs : %s)",
+            os.path.basename(str(self.pdf_path)), len(pages), sum(self.page_timings_ms),
+            max(self.page_timings_ms, default=0), self.engines,
+        )
+        return self.full_text
 
     def parse_data(self):
         """
@@ -42,12 +178,249 @@ class PDFParser:
 
     def _extract_email(self):
         """Extrait l'adresse email du texte du CV"""
-        email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        match = re.search(email_pattern, self.full_text)
+        match = EMAIL_RE.search(self.full_text)
         return match.group(0) if match else None
 
     def _extract_phone(self):
         """Extrait le numéro de téléphone français du texte du CV"""
-        phone_pattern = r'(?:(?:\+|00)33|0)\s*[1-9](?:[\s.-]*\d{2}){4}'
-        match = re.search(phone_pattern, self.full_text)
-        return match.group(0) if match else None
\ No newline at end of file
+        match = PHONE_RE.search(self.full_text)
+        return match.group(0) if match else None
+
+
+def extract_documents(paths, workers=None, timeout=None):
+    """
+    Extraction de nombreux PDF (import en masse) : un document par tâche dans un pool dédié, avec les mêmes
+    budgets de temps et de mémoire que extract_text_parallel. Génère (chemin, pages, erreur) dans l'ordre de
+    fin ; pages : liste de (texte, durée en ms, moteur), None en cas d'erreur.
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'PDF_EXTRACTION_TIMEOUT', 30)
+    engine = default_engine()
+    pool = ProcessPoolExecutor(
+        max_workers=workers or getattr(settings, 'PDF_EXTRACTION_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(getattr(settings, 'PDF_EXTRACTION_MEMORY_MB', 512),),
+    )
+    try:
+        futures = {pool.submit(_extract_pages, path, 0, None, timeout, engine): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except BrokenProcessPool:
+                # Un processus tué (mémoire) casse le pool : les documents restants sont en erreur
+                yield futures[future], None, ExtractionBudgetExceeded("Processus d'extraction du PDF interrompu")
+            except Exception as e:
+                yield futures[future], None, e
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_pool():
+    """
+    Pool de processus d'extraction du processus courant, créé au premier usage.
+    Processus démarrés par 'spawn' : rien n'est hérité du worker (connexions base, clients gRPC).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PDF_EXTRACTION_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(getattr(settings, 'PDF_EXTRACTION_MEMORY_MB', 512),),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _init_worker(memory_limit_mb):
+    """Plafond de mémoire (espace d'adressage) de chaque processus du pool."""
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _on_timeout(signum, frame):
+    raise ExtractionBudgetExceeded("Extraction du PDF plus longue que le budget de temps")
+
+
+def _extract_pages(pdf_path, start, stop, time_budget=None, engine=None):
+    """
+    (texte, durée en ms, moteur) des pages [start, stop) ; exécuté dans le pool (avec un budget de temps)
+    ou dans le processus courant. Le moteur rapide est remplacé par pdfplumber si son texte semble cassé.
+    """
+    if time_budget:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, time_budget)
+    try:
+        engine = engine or default_engine()
+        pages = _timed_pages(engine, pdf_path, start, stop)
+        if engine != ENGINE_PDFPLUMBER:
+            problem = broken_text_reason([text for text, _, _ in pages])
+            if problem and problem != REASON_NO_TEXT:
+                logger.info("PDF %s, pages %s-%s : texte %s cassé (%s) après %.0f ms, relecture avec pdfplumber",
+                            os.path.basename(str(pdf_path)), start + 1, start + len(pages), engine, problem,
+                            sum(ms for _, ms, _ in pages))
+                fallback = _timed_pages(ENGINE_PDFPLUMBER, pdf_path, start, stop)
+                fallback_problem = broken_text_reason([text for text, _, _ in fallback])
+                if fallback_problem is None:
+                    pages = fallback
+                else:
+                    logger.info("PDF %s, pages %s-%s : texte pdfplumber cassé aussi (%s), texte %s conservé",
+                                os.path.basename(str(pdf_path)), start + 1, start + len(pages), fallback_problem,
+                                engine)
+        return pages
+    except MemoryError:
+        raise ExtractionBudgetExceeded("Extraction du PDF au-delà du plafond de mémoire")
+    finally:
+        if time_budget:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def default_engine():
+    engine = getattr(settings, 'PDF_EXTRACTION_ENGINE', 'auto')
+    if engine == 'auto':
+        return ENGINE_PDFIUM if pypdfium2 is not None else ENGINE_PDFMINER
+    if engine == ENGINE_PDFIUM and pypdfium2 is None:
+        logger.warning("pypdfium2 n'est pas installé : extraction avec pdfminer")
+        return ENGINE_PDFMINER
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur d'extraction PDF inconnu : {engine}")
+    return engine
+
+
+def page_count_of(pdf):
+    """Nombre de pages d'un PDF (chemin ou contenu en bytes), sans analyser leur contenu."""
+    if pypdfium2 is not None:
+        with _pdfium_lock:
+            document = pypdfium2.PdfDocument(pdf if isinstance(pdf, bytes) else str(pdf))
+            try:
+                return len(document)
+            finally:
+                document.close()
+    with (io.BytesIO(pdf) if isinstance(pdf, bytes) else open(pdf, 'rb')) as f:
+        document = PDFDocument(PDFMinerParser(f))
+        return resolve1(document.catalog['Pages'])['Count']
+
+
+def broken_text_reason(texts):
+    """
+    Raison pour laquelle le texte de ces pages semble mal extrait, None s'il paraît correct :
+    aucun texte (PDF scanné), trop court (police non décodée), caractères illisibles, mots collés (espaces
+    perdus) ou lignes fragmentées (colonnes lues caractère par caractère).
+    Les glyphes isolés non décodés (puces, pictogrammes) ne comptent pas ; un (cid:NNN) dans un mot compte
+    pour un caractère.
+    """
+    text = _cid_re.sub('\ufffd', _isolated_symbol_re.sub(' ', "\n".join(texts)))
+    if not text.strip():
+        return REASON_NO_TEXT
+    if len(text.strip()) < MIN_CHARS_PER_PAGE * max(len(texts), 1):
+        return "trop court"
+    garbled = sum(
+        1 for char in text
+        if char == '\ufffd' or (ord(char) < 32 and char not in '\n\t') or 0xE000 <= ord(char) <= 0xF8FF
+    )
+    if garbled / len(text) > MAX_GARBLED_RATIO:
+        return "caractères illisibles"
+    words = text.split()
+    if sum(len(word) for word in words) / len(words) > MAX_MEAN_WORD_LENGTH:
+        return "mots collés"
+    lines = [line for line in text.splitlines() if line.strip()]
+    if sum(1 for line in lines if len(line.strip()) <= 2) / len(lines) > MAX_SHORT_LINES_RATIO:
+        return "lignes fragmentées"
+    return None
+
+
+def _timed_pages(engine, pdf_path, start, stop):
+    pages = []
+    page_start = time.perf_counter()
+    for text in ENGINES[engine](pdf_path, start, stop):
+        now = time.perf_counter()
+        pages.append((text, (now - page_start) * 1000, engine))
+        page_start = now
+    return pages
+
+
+def _pages_pdfium(pdf_path, start, stop):
+    """Texte des pages avec PDFium (pypdfium2) : le plus rapide, ordre de lecture du fichier."""
+    with _pdfium_lock:
+        document = pypdfium2.PdfDocument(str(pdf_path))
+        try:
+            for index in range(start, len(document) if stop is None else min(stop, len(document))):
+                page = document[index]
+                text_page = page.get_textpage()
+                text = text_page.get_text_range()
+                text_page.close()
+                page.close()
+                yield text.replace('\r\n', '\n').replace('\r', '\n')
+        finally:
+            document.close()
+
+
+def _pages_pdfminer(pdf_path, start, stop):
+    """
+    Texte des pages avec pdfminer sans analyse de mise en page (laparams=None) : les caractères sont
+    repris dans l'ordre du fichier, avec un saut de ligne quand la ligne de base change.
+    """
+    manager = PDFResourceManager(caching=True)
+    device = PDFPageAggregator(manager, laparams=None)
+    interpreter = PDFPageInterpreter(manager, device)
+    with open(pdf_path, 'rb') as f:
+        for index, page in enumerate(PDFPage.get_pages(f)):
+            if index < start:
+                continue
+            if stop is not None and index >= stop:
+                break
+            interpreter.process_page(page)
+            yield _layout_text(device.get_result())
+
+
+def _layout_text(layout):
+    parts = []
+    previous = None
+    for char in _chars(layout):
+        if previous is not None:
+            if abs(char.y0 - previous.y0) > previous.height / 2:
+                parts.append("\n")
+            elif char.x0 - previous.x1 > previous.size * 0.15 and previous.get_text() != ' ' \
+                    and char.get_text() != ' ':
+                parts.append(" ")
+        parts.append(char.get_text())
+        previous = char
+    return "".join(parts)
+
+
+def _chars(item):
+    for child in item:
+        if isinstance(child, LTChar):
+            yield child
+        elif isinstance(child, LTContainer):
+            yield from _chars(child)
+
+
+def _pages_pdfplumber(pdf_path, start, stop):
+    """Texte des pages avec pdfplumber (mise en page complète) : plus lent, repli des moteurs rapides."""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            text = page.extract_text() or ""
+            # Libère les objets de mise en page de la page avant la suivante
+            page.close()
+            yield text
+
+
+ENGINES = {
+    ENGINE_PDFIUM: _pages_pdfium,
+    ENGINE_PDFMINER: _pages_pdfminer,
+    ENGINE_PDFPLUMBER: _pages_pdfplumber,
+}
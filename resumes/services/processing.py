@@ -0,0 +1,155 @@
+"""
+Traitement d'un CV après l'upload, hors requête (tâche 'process_resume', voir resumes/tasks.py) :
+extraction du texte dans le pool de processus (pdf_parser), puis analyse (titre du poste, compétences) par
+l'extracteur local (local_parser), ou par Gemini quand sa confiance est insuffisante.
+Le statut (Resume.processing_status) et le message d'erreur éventuel sont suivis par la liste des CVs.
+Un PDF déjà traité (même empreinte, voir services/uploads.py) reprend le texte et l'analyse du CV existant.
+"""
+import logging
+
+from matching.services import consume_credit, refund_credit
+from matching.services.gemini_dispatcher import GeminiOverloaded, call_context
+from matching.services.llm_cache import FEATURE_CV_PARSER, cache_hit_consumes_credit
+from ..models import Resume
+from . import local_parser
+from .ai_parser import AIParser
+from .pdf_parser import ExtractionBudgetExceeded, PDFParser
+from .sectionizer import cv_sections, structure_cv
+
+
+logger = logging.getLogger(__name__)
+
+PROCESS_RESUME_TASK = 'process_resume'
+
+
+def process_resume(resume):
+    """Extrait le texte du CV puis l'analyse ; retourne le résultat de la tâche (dict)."""
+    duplicate = find_duplicate(resume)
+    if duplicate is not None:
+        # Même PDF déjà traité : ni extraction ni (pour le même utilisateur) crédit consommé
+        logger.info("CV %s identique au CV %s : texte et analyse réutilisés", resume.pk, duplicate.pk)
+        resume.extracted_text = duplicate.extracted_text
+        resume.parsed_data = {**duplicate.parsed_data, 'reused_from': duplicate.pk}
+        resume.structured_data = duplicate.structured_data or structure_cv(duplicate.extracted_text)
+        resume.processing_error = _reuse_analysis(resume, duplicate)
+        resume.processing_status = Resume.STATUS_READY
+        resume.save()
+        return {
+            'resume_id': resume.pk,
+            'reused_from': duplicate.pk,
+            'job_title': resume.detected_job_title,
+        }
+
+    parser = PDFParser(resume.file.path)
+    try:
+        extracted_text = parser.extract_text_parallel()
+    except ExtractionBudgetExceeded as e:
+        logger.warning("CV %s : %s", resume.pk, e)
+        return _fail(resume, f"Impossible d'extraire le texte du PDF : {e}.")
+    if not extracted_text:
+        return _fail(resume, "Impossible d'extraire le texte du PDF.")
+
+    resume.extracted_text = extracted_text
+    # Découpage en sections, une fois pour toutes : lu ensuite par le score de matching et les prompts
+    resume.structured_data = structure_cv(extracted_text)
+    contact = resume.structured_data['contact']
+    resume.parsed_data = {
+        'email': contact['email'],
+        'phone': contact['phone'],
+        'extraction': {
+            'pages': len(parser.page_timings_ms),
+            'page_ms': parser.page_timings_ms,
+            'total_ms': round(sum(parser.page_timings_ms), 1),
+            'engines': parser.engines,
+        },
+    }
+    resume.processing_error = _analyze(resume, extracted_text)
+    resume.processing_status = Resume.STATUS_READY
+    resume.save()
+    return {
+        'resume_id': resume.pk,
+        'pages': len(parser.page_timings_ms),
+        'job_title': resume.detected_job_title,
+    }
+
+
+def find_duplicate(resume):
+    """
+    CV déjà traité avec le même contenu (empreinte SHA-256), ceux de l'utilisateur d'abord ; None sinon.
+    """
+    if not resume.content_hash:
+        return None
+    candidates = (
+        Resume.objects.filter(content_hash=resume.content_hash, processing_status=Resume.STATUS_READY)
+        .exclude(pk=resume.pk)
+        .exclude(extracted_text='')
+        .order_by('-uploaded_at')
+    )
+    return candidates.filter(user_id=resume.user_id).first() or candidates.first()
+
+
+def _reuse_analysis(resume, duplicate):
+    """
+    Reprend le poste et les compétences détectés sur le CV identique. Le CV d'un autre utilisateur est traité
+    comme une réponse du cache (facturée selon LLM_CACHE_HIT_CONSUMES_CREDIT) ; sans analyse à reprendre,
+    analyse IA normale. Retourne le message d'erreur à afficher ('' si réussie).
+    """
+    if not duplicate.detected_job_title and not duplicate.detected_skills:
+        return _analyze(resume, resume.extracted_text)
+    if duplicate.user_id != resume.user_id and cache_hit_consumes_credit(resume.user, FEATURE_CV_PARSER):
+        if not consume_credit(resume.user):
+            return "Crédits insuffisants pour l'analyse IA. Passez Premium ou rechargez vos crédits."
+    resume.detected_job_title = duplicate.detected_job_title
+    resume.detected_skills = list(duplicate.detected_skills)
+    return ''
+
+
+def _analyze(resume, extracted_text):
+    """
+    Analyse du CV : extracteur local s'il est assez sûr de lui (gratuit), sinon Gemini (consomme 1 crédit).
+    La source est notée dans parsed_data['analysis'] ; retourne le message d'erreur à afficher ('' si réussie).
+    """
+    user = resume.user
+    local = local_parser.extract(extracted_text, resume.structured_data)
+    if local_parser.is_confident(local):
+        _record_analysis(resume, local_parser.ANALYSIS_LOCAL, local, local['confidence'])
+        return ''
+    # Un CV identique déjà analysé est servi depuis le cache (facturé selon la politique du cache)
+    job_info = AIParser.cached_result(extracted_text)
+    source = local_parser.ANALYSIS_CACHE if job_info is not None else local_parser.ANALYSIS_GEMINI
+    if job_info is None or cache_hit_consumes_credit(user, FEATURE_CV_PARSER):
+        if not consume_credit(user):
+            return "Crédits insuffisants pour l'analyse IA. Passez Premium ou rechargez vos crédits."
+    try:
+        if job_info is None:
+            with call_context(user=user):
+                job_info = AIParser().extract_job_info(
+                    extracted_text, use_cache=False, sections=cv_sections(resume, extracted_text),
+                )
+    except GeminiOverloaded as e:
+        # Service IA saturé : crédit rendu, le CV est sauvegardé sans analyse
+        refund_credit(user)
+        return f"Analyse IA reportée : {e}"
+    except Exception as e:
+        # En cas d'erreur avec l'IA, on continue quand même (le CV est sauvegardé)
+        logger.warning("Erreur lors de l'analyse IA du CV %s : %s", resume.pk, e)
+        return f"Erreur lors de l'analyse IA : {e}"
+
+    _record_analysis(resume, source, job_info, local['confidence'])
+    return ''
+
+
+def _record_analysis(resume, source, job_info, confidence):
+    resume.detected_job_title = job_info.get('job_title')
+    resume.detected_skills = job_info.get('skills', [])
+    resume.parsed_data = {
+        **(resume.parsed_data or {}),
+        'analysis': local_parser.analysis_info(source, confidence),
+    }
+
+
+def _fail(resume, message):
+    resume.processing_status = Resume.STATUS_FAILED
+    resume.processing_error = message
+    resume.save(update_fields=['processing_status', 'processing_error'])
+    return {'resume_id': resume.pk, 'error': message}
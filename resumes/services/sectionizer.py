@@ -0,0 +1,137 @@
+"""
+Structuration d'un CV, faite une fois après l'extraction du texte (tâche process_resume, import_resumes) :
+contact, sections dans l'ordre du CV (en-tête, profil, expériences, formation, compétences, langues...),
+expériences découpées en postes, listes de compétences et de langues, et vocabulaire normalisé du score de
+matching. Le tout est stocké en JSON compact dans Resume.structured_data avec l'empreinte du texte dont il
+est tiré : score de matching, prompts Gemini et coordonnées lisent ces morceaux déjà découpés au lieu de
+reparcourir le texte complet. Si le texte a changé depuis, structure_for recalcule la structure.
+"""
+import hashlib
+import re
+
+from matching.services.prompt_compactor import CV_SECTIONS, split_sections
+
+
+# À incrémenter à chaque changement du format : les structures enregistrées sont alors recalculées
+STRUCTURE_VERSION = 1
+
+LANGUAGE_HEADINGS = ('langue', 'langues', 'languages')
+
+# Titres de CV_SECTIONS, avec les intitulés longs d'expériences et les langues séparées des autres rubriques
+SECTION_HEADINGS = {
+    **{kind: keywords for kind, keywords in CV_SECTIONS.items() if kind != 'other'},
+    'experience': CV_SECTIONS['experience'] + ('experiences professionnelles', 'experience professionnelle'),
+    'languages': LANGUAGE_HEADINGS,
+    'other': tuple(keyword for keyword in CV_SECTIONS['other'] if keyword not in LANGUAGE_HEADINGS),
+}
+
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+# Numéro de téléphone français
+PHONE_RE = re.compile(r'(?:(?:\+|00)33|0)\s*[1-9](?:[\s.-]*\d{2}){4}')
+LINK_RE = re.compile(r'(?:https?://)?(?:www\.)?(?:linkedin\.com|github\.com|gitlab\.com)/[\w\-./]+', re.IGNORECASE)
+
+# Début d'un nouveau poste dans la section expériences : une année ou un mois
+ENTRY_START_RE = re.compile(
+    r'\b(?:19|20)\d{2}\b|\b(?:janv|févr|fevr|mars|avr|mai|juin|juil|août|aout|sept|oct|nov|déc|dec)[a-zé]*\.?\s+\d',
+    re.IGNORECASE,
+)
+LIST_SEPARATORS_RE = re.compile(r'\s*[,;•|·]\s*|\s+-\s+|\s*/\s+')
+
+# Mots ignorés par le score de matching (matching/services/francetravail.py)
+SCORE_STOPWORDS = frozenset(
+    {'le', 'la', 'les', 'de', 'du', 'des', 'et', 'en', 'un', 'une', 'pour', 'avec', 'nous', 'vous'}
+)
+_score_word_re = re.compile(r'\w+')
+
+
+def text_hash(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def score_words(text):
+    """Vocabulaire d'un texte pour le score de matching : mots en minuscules, sans mots vides."""
+    return set(_score_word_re.findall((text or '').lower())) - SCORE_STOPWORDS
+
+
+def extract_contact(text):
+    """Email, téléphone et liens (LinkedIn, GitHub, GitLab) trouvés dans le texte."""
+    email = EMAIL_RE.search(text or '')
+    phone = PHONE_RE.search(text or '')
+    links = list(dict.fromkeys(match.group(0).rstrip('./') for match in LINK_RE.finditer(text or '')))
+    return {
+        'email': email.group(0) if email else None,
+        'phone': phone.group(0) if phone else None,
+        'links': links,
+    }
+
+
+def structure_cv(text):
+    """Structure d'un texte de CV (dict sérialisable en JSON)."""
+    text = text or ''
+    sections = split_sections(text, SECTION_HEADINGS)
+    return {
+        'version': STRUCTURE_VERSION,
+        'text_hash': text_hash(text),
+        'contact': extract_contact(text),
+        'sections': [[kind, lines] for kind, lines in sections],
+        'experience': _experience_entries(
+            [line for kind, lines in sections if kind == 'experience' for line in lines[1:]]
+        ),
+        'skills': _list_items(lines[1:] for kind, lines in sections if kind == 'skills'),
+        'languages': _list_items(lines[1:] for kind, lines in sections if kind == 'languages'),
+        'words': sorted(score_words(text)),
+    }
+
+
+def structure_for(resume):
+    """
+    Structure du CV : celle enregistrée si elle correspond au texte actuel, sinon recalculée (non enregistrée :
+    utilisable depuis du code asynchrone).
+    """
+    text = resume.extracted_text or ''
+    stored = resume.structured_data or {}
+    if stored.get('version') == STRUCTURE_VERSION and stored.get('text_hash') == text_hash(text):
+        return stored
+    return structure_cv(text)
+
+
+def cv_sections(resume, text):
+    """
+    Sections enregistrées du CV si elles ont été tirées de ce texte (format de prompt_compactor.split_sections),
+    None sinon : la compaction découpe alors le texte elle-même.
+    """
+    stored = getattr(resume, 'structured_data', None) or {}
+    if stored.get('version') == STRUCTURE_VERSION and stored.get('text_hash') == text_hash(text):
+        return stored['sections']
+    return None
+
+
+def section_lines(structure, kind):
+    """Lignes des sections d'un type ('profile', 'education'...), titres compris, dans l'ordre du CV."""
+    return [line for section_kind, lines in structure['sections'] if section_kind == kind for line in lines]
+
+
+def _experience_entries(lines):
+    entries = []
+    for line in lines:
+        if not entries or ENTRY_START_RE.search(line):
+            entries.append({'title': line, 'lines': []})
+        else:
+            entries[-1]['lines'].append(line)
+    return entries
+
+
+def _list_items(groups):
+    """Éléments d'une liste (compétences, langues) : découpés sur les séparateurs, sans libellé ni doublon."""
+    items = {}
+    for lines in groups:
+        for line in lines:
+            # "Langages : Python, Java" -> "Python, Java" (libellé court, sans séparateur)
+            label, colon, values = line.partition(':')
+            if not colon or len(label) > 25 or LIST_SEPARATORS_RE.search(label):
+                values = line
+            for item in LIST_SEPARATORS_RE.split(values):
+                item = item.strip(' .-*')
+                if item and len(item) <= 40:
+                    items.setdefault(item.lower(), item)
+    return list(items.values())
@@ -0,0 +1,173 @@
+"""
+Fichiers PDF des CV envoyés : empreinte SHA-256 calculée en lisant l'upload par morceaux (jamais chargé en
+entier en mémoire) et stockage adressé par contenu (Resume.content_hash, voir resume_upload_path) : un PDF
+déjà stocké n'est pas recopié, les CV identiques partagent le même fichier.
+La vue d'upload reçoit le fichier par ResumeUploadHandler, qui le valide pendant la réception.
+"""
+import hashlib
+import io
+import logging
+import re
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import UploadRejectionStat, resume_upload_path
+from .pdf_parser import page_count_of
+
+
+logger = logging.getLogger(__name__)
+
+
+def hash_upload(uploaded_file):
+    """
+    SHA-256 (hex) d'un fichier envoyé : celui calculé pendant la réception (ResumeUploadHandler), sinon en le
+    relisant par morceaux (le fichier est rembobiné ensuite).
+    """
+    if getattr(uploaded_file, 'sha256', None):
+        return uploaded_file.sha256
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def store_blob(storage, name, content):
+    """
+    Écrit content sous son nom adressé par contenu (name) s'il n'y est pas déjà ; vrai si cet appel l'a écrit.
+    Deux envois identiques simultanés passent tous deux le contrôle d'existence : le second est alors enregistré
+    par le stockage sous un nom suffixé (get_available_name), copie supprimée aussitôt puisque son contenu est
+    celui du blob déjà écrit.
+    """
+    if storage.exists(name):
+        return False
+    stored = storage.save(name, content)
+    if stored != name:
+        logger.info("Blob %s écrit en même temps par un envoi identique : copie %s supprimée", name, stored)
+        storage.delete(stored)
+        return False
+    return True
+
+
+def attach_upload(resume, uploaded_file):
+    """
+    Renseigne l'empreinte du CV et son fichier, écrit sous son nom adressé par contenu (store_blob) : un blob
+    déjà stocké est partagé.
+    """
+    resume.content_hash = hash_upload(uploaded_file)
+    name = resume_upload_path(resume, uploaded_file.name)
+    if not store_blob(resume.file.storage, name, uploaded_file):
+        logger.info("CV %s… déjà stocké : fichier partagé", resume.content_hash[:12])
+    resume.file = name
+    return resume
+
+
+class ResumeUploadHandler(FileUploadHandler):
+    """
+    Gestionnaire d'upload de la vue upload_resume : le PDF est vérifié pendant sa réception, morceau par
+    morceau (signature %PDF-, taille, nombre de pages, chiffrement), et gardé en mémoire. Un fichier refusé
+    est abandonné dès le morceau fautif, sans rien écrire sur disque ; le motif est placé dans
+    request.resume_upload_error et comptabilisé (UploadRejectionStat). L'empreinte SHA-256 est calculée au
+    passage (attribut sha256 du fichier reçu).
+    """
+    # Motif "/Type /Page" d'un objet page (pas "/Pages") ; recouvrement entre morceaux pour ne rien manquer
+    PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+    OVERLAP = 32
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, 'RESUME_UPLOAD_MAX_MB', 10) * 1024 * 1024
+        self.max_pages = getattr(settings, 'RESUME_UPLOAD_MAX_PAGES', 20)
+        self.request_length = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_length = content_length or 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.buffer = io.BytesIO()
+        self.digest = hashlib.sha256()
+        self.pages = 0
+        self.tail = b''
+        # Taille annoncée déjà hors limite : refus avant de lire le fichier
+        if self.request_length > self.max_bytes + 64 * 1024:
+            self._reject(UploadRejectionStat.REASON_TOO_LARGE)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and b'%PDF-' not in raw_data[:1024]:
+            self._reject(UploadRejectionStat.REASON_NOT_PDF, len(raw_data))
+        if start + len(raw_data) > self.max_bytes:
+            self._reject(UploadRejectionStat.REASON_TOO_LARGE, start + len(raw_data))
+        window = self.tail + raw_data
+        if b'/Encrypt' in window:
+            self._reject(UploadRejectionStat.REASON_ENCRYPTED, start + len(raw_data))
+        # Les pages vues dans le recouvrement ont déjà été comptées au morceau précédent
+        self.pages += len(self.PAGE_PATTERN.findall(window)) - len(self.PAGE_PATTERN.findall(self.tail))
+        if self.pages > self.max_pages:
+            self._reject(UploadRejectionStat.REASON_TOO_MANY_PAGES, start + len(raw_data))
+        self.tail = window[-self.OVERLAP:]
+        self.digest.update(raw_data)
+        self.buffer.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not file_size:
+            self._record(UploadRejectionStat.REASON_NOT_PDF, 0)
+            return None
+        # Compte exact (pages dans des flux d'objets compressés, invisibles pendant la réception)
+        try:
+            pages = page_count_of(self.buffer.getvalue())
+        except Exception:
+            pages = None
+        if pages is not None and pages > self.max_pages:
+            self._record(UploadRejectionStat.REASON_TOO_MANY_PAGES, file_size)
+            self.buffer.close()
+            return None
+        self.buffer.seek(0)
+        uploaded = InMemoryUploadedFile(
+            file=self.buffer, field_name=self.field_name, name=self.file_name,
+            content_type=self.content_type, size=file_size, charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        uploaded.sha256 = self.digest.hexdigest()
+        return uploaded
+
+    def _reject(self, reason, received=0):
+        self.buffer.close()
+        self._record(reason, received)
+        # Le reste du fichier est lu et ignoré par le parseur multipart
+        raise SkipFile(reason)
+
+    def _record(self, reason, received):
+        errors = {
+            UploadRejectionStat.REASON_NOT_PDF: "Le fichier n'est pas un PDF.",
+            UploadRejectionStat.REASON_TOO_LARGE:
+                f"Le fichier dépasse {self.max_bytes // (1024 * 1024)} Mo.",
+            UploadRejectionStat.REASON_TOO_MANY_PAGES: f"Le CV dépasse {self.max_pages} pages.",
+            UploadRejectionStat.REASON_ENCRYPTED: "Le PDF est protégé par un mot de passe.",
+        }
+        if self.request is not None:
+            self.request.resume_upload_error = errors[reason]
+        logger.warning("Upload de CV refusé (%s) : %s, %s octets lus sur %s annoncés",
+                       reason, self.file_name, received, self.request_length)
+        _record_rejection(reason, received, self.request_length)
+
+
+def _record_rejection(reason, received, declared):
+    counters = {
+        'count': F('count') + 1,
+        'bytes_received': F('bytes_received') + received,
+        'bytes_declared': F('bytes_declared') + declared,
+    }
+    if not UploadRejectionStat.objects.filter(reason=reason).update(**counters):
+        try:
+            with transaction.atomic():
+                UploadRejectionStat.objects.create(
+                    reason=reason, count=1, bytes_received=received, bytes_declared=declared,
+                )
+        except IntegrityError:
+            UploadRejectionStat.objects.filter(reason=reason).update(**counters)
@@ -0,0 +1,24 @@
+"""
+Handlers des tâches en arrière-plan de l'application resumes (voir matching/services/tasks.py).
+"""
+from matching.services.tasks import register_task
+from .models import Resume
+from .services.processing import PROCESS_RESUME_TASK, process_resume
+
+
+@register_task(PROCESS_RESUME_TASK)
+def process_resume_task(task):
+    """
+    Extraction du texte et analyse IA d'un CV uploadé (voir services/processing.py).
+    payload : {"resume_id": int}
+    """
+    resume = Resume.objects.select_related('user').get(pk=task.payload['resume_id'])
+    try:
+        return process_resume(resume)
+    except Exception:
+        # La tâche échoue : le CV ne doit pas rester "en cours d'analyse"
+        Resume.objects.filter(pk=resume.pk).update(
+            processing_status=Resume.STATUS_FAILED,
+            processing_error="Erreur inattendue pendant l'analyse du CV.",
+        )
+        raise
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from resumes.models import Resume, UploadRejectionStat
+from resumes.services import local_parser, pdf_parser
+from resumes.services.uploads import ResumeUploadHandler, attach_upload
+
+
+BULLETED_CV = [
+    "Jean Dupont",
+    "Développeur backend senior",
+    "Expériences professionnelles",
+] + [
+    line
+    for i in range(14)
+    for line in (f"{2010 + i} : Développeur Python chez Doctolib",
+                 "• Conception d'API REST en Django et PostgreSQL")
+]
+
+
+class BrokenTextReasonTests(SimpleTestCase):
+
+    def test_clean_text(self):
+        text = "Développeur backend Python, API REST en Django et PostgreSQL.\n" * 5
+        self.assertIsNone(pdf_parser.broken_text_reason([text]))
+
+    def test_undecoded_bullets_are_not_garbled(self):
+        # pdfminer et pdfplumber rendent la puce « • » des polices standard en (cid:127)
+        text = "(cid:127) Conception d'API REST en Django et PostgreSQL\n" * 10
+        self.assertIsNone(pdf_parser.broken_text_reason([text]))
+
+    def test_symbol_font_pictograms_are_not_garbled(self):
+        text = " Python\n Django et PostgreSQL au quotidien, API REST\n" * 10
+        self.assertIsNone(pdf_parser.broken_text_reason([text]))
+
+    def test_undecoded_words_are_garbled(self):
+        text = "(cid:12)(cid:45)(cid:3) (cid:9)(cid:33)ab Python Django\n" * 20
+        self.assertEqual(pdf_parser.broken_text_reason([text]), "caractères illisibles")
+
+    def test_no_text(self):
+        self.assertEqual(pdf_parser.broken_text_reason(["", "  \n"]), pdf_parser.REASON_NO_TEXT)
+
+    def test_too_short(self):
+        self.assertEqual(pdf_parser.broken_text_reason(["Jean Dupont"]), "trop court")
+
+    def test_glued_words(self):
+        text = "Développeurbackendpythonchezdoctolibdepuis2021 " * 10
+        self.assertEqual(pdf_parser.broken_text_reason([text]), "mots collés")
+
+    def test_fragmented_lines(self):
+        text = "\n".join("Python") * 30
+        self.assertEqual(pdf_parser.broken_text_reason([text]), "lignes fragmentées")
+
+
+class ExtractPagesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _pdf(self, lines):
+        path = os.path.join(self.tmp.name, 'cv.pdf')
+        c = canvas.Canvas(path, pagesize=A4)
+        # Cadre : la page existe même sans texte (PDF scanné)
+        c.rect(40, 40, 515, 760)
+        y = 800
+        for line in lines:
+            c.drawString(50, y, line)
+            y -= 16
+        c.save()
+        return path
+
+    def test_bulleted_cv_is_not_read_again(self):
+        path = self._pdf(BULLETED_CV)
+        pages = pdf_parser._extract_pages(path, 0, None, engine=pdf_parser.ENGINE_PDFMINER)
+        self.assertEqual({engine for _, _, engine in pages}, {pdf_parser.ENGINE_PDFMINER})
+        self.assertIn("Conception d'API REST", pages[0][0])
+
+    def test_scanned_pdf_is_not_read_again(self):
+        path = self._pdf([])
+        pages = pdf_parser._extract_pages(path, 0, None, engine=pdf_parser.ENGINE_PDFMINER)
+        self.assertEqual([engine for _, _, engine in pages], [pdf_parser.ENGINE_PDFMINER])
+
+    def test_fallback_kept_only_if_correct(self):
+        path = self._pdf(BULLETED_CV)
+        broken = "(cid:1)(cid:2)(cid:3)(cid:4) " * 50
+        fast = pdf_parser.ENGINE_PDFMINER
+        with mock.patch.dict(pdf_parser.ENGINES, {fast: lambda *args: iter([broken])}):
+            pages = pdf_parser._extract_pages(path, 0, None, engine=fast)
+        self.assertEqual(pages[0][2], pdf_parser.ENGINE_PDFPLUMBER)
+
+        with mock.patch.dict(pdf_parser.ENGINES, {fast: lambda *args: iter([broken]),
+                                                  pdf_parser.ENGINE_PDFPLUMBER: lambda *args: iter([broken + "x"])}):
+            pages = pdf_parser._extract_pages(path, 0, None, engine=fast)
+        self.assertEqual(pages[0][:1] + pages[0][2:], (broken, fast))
+
+
+class AttachUploadTests(TestCase):
+    PDF = b"%PDF-1.4\n1 0 obj << /Type /Page >> endobj\n%%EOF\n"
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media = media.name
+        self.user = get_user_model().objects.create_user(username='jean', password=None)
+
+    def _upload(self):
+        resume = Resume(user=self.user)
+        attach_upload(resume, SimpleUploadedFile('mon cv.pdf', self.PDF, content_type='application/pdf'))
+        resume.save()
+        return resume
+
+    def _stored_files(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.media) for name in names]
+
+    def test_content_addressed_name(self):
+        resume = self._upload()
+        digest = hashlib.sha256(self.PDF).hexdigest()
+        self.assertEqual(resume.content_hash, digest)
+        self.assertEqual(resume.file.name, f"cvs/{digest[:2]}/{digest}.pdf")
+        with resume.file.open('rb') as f:
+            self.assertEqual(f.read(), self.PDF)
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self._upload(), self._upload()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(len(self._stored_files()), 1)
+
+    def test_simultaneous_identical_uploads_share_one_blob(self):
+        first = self._upload()
+        # Le second envoi a passé le contrôle d'existence avant que le premier écrive le fichier
+        real_exists = FileSystemStorage.exists
+        stale = iter([False])
+        with mock.patch.object(FileSystemStorage, 'exists', autospec=True,
+                               side_effect=lambda storage, name: next(stale, real_exists(storage, name))):
+            second = self._upload()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(len(self._stored_files()), 1)
+
+
+@override_settings(RESUME_UPLOAD_MAX_MB=1, RESUME_UPLOAD_MAX_PAGES=2)
+class ResumeUploadHandlerTests(TestCase):
+    PDF = b"%PDF-1.4\n1 0 obj << /Type /Pages /Count 1 >> endobj\n2 0 obj << /Type /Page >> endobj\n%%EOF\n"
+
+    def _receive(self, data, chunk_size=64 * 1024, declared=None):
+        """Fichier reçu par le gestionnaire, ou le motif de refus (SkipFile)."""
+        request = SimpleNamespace()
+        handler = ResumeUploadHandler(request)
+        handler.handle_raw_input(None, {}, declared if declared is not None else len(data) + 200, b'boundary')
+        try:
+            handler.new_file('file', 'cv.pdf', 'application/pdf', len(data))
+            for start in range(0, len(data), chunk_size):
+                handler.receive_data_chunk(data[start:start + chunk_size], start)
+        except SkipFile as e:
+            self.assertTrue(request.resume_upload_error)
+            return str(e)
+        return handler.file_complete(len(data))
+
+    def _rejections(self, reason):
+        stat = UploadRejectionStat.objects.filter(reason=reason).first()
+        return stat.count if stat else 0
+
+    def test_accepted_pdf_is_hashed(self):
+        uploaded = self._receive(self.PDF)
+        self.assertEqual(uploaded.read(), self.PDF)
+        self.assertEqual(uploaded.sha256, hashlib.sha256(self.PDF).hexdigest())
+        self.assertFalse(UploadRejectionStat.objects.exists())
+
+    def test_not_a_pdf(self):
+        self.assertEqual(self._receive(b"PK\x03\x04 archive zip" * 10), UploadRejectionStat.REASON_NOT_PDF)
+        self.assertEqual(self._rejections(UploadRejectionStat.REASON_NOT_PDF), 1)
+
+    def test_too_large_while_streaming(self):
+        data = self.PDF + b"0" * (1024 * 1024)
+        self.assertEqual(self._receive(data, declared=0), UploadRejectionStat.REASON_TOO_LARGE)
+        stat = UploadRejectionStat.objects.get(reason=UploadRejectionStat.REASON_TOO_LARGE)
+        self.assertLess(stat.bytes_received, len(data) + 64 * 1024)
+
+    def test_too_large_declared(self):
+        self.assertEqual(self._receive(self.PDF, declared=2 * 1024 * 1024), UploadRejectionStat.REASON_TOO_LARGE)
+
+    def test_encrypted_marker_split_between_chunks(self):
+        data = self.PDF + b"x" * 10 + b"/Encrypt 5 0 R\n"
+        split = data.index(b"/Encrypt") + 4
+        self.assertEqual(self._receive(data, chunk_size=split), UploadRejectionStat.REASON_ENCRYPTED)
+
+    def test_too_many_pages(self):
+        data = self.PDF + b"3 0 obj << /Type /Page >> endobj\n4 0 obj << /Type/Page >> endobj\n"
+        self.assertEqual(self._receive(data, chunk_size=40), UploadRejectionStat.REASON_TOO_MANY_PAGES)
+        self.assertEqual(self._rejections(UploadRejectionStat.REASON_TOO_MANY_PAGES), 1)
+
+    def test_rejected_upload_shows_the_reason(self):
+        user = get_user_model().objects.create_user(username='jean', password=None)
+        self.client.force_login(user)
+        response = self.client.post(reverse('upload_resume'), {
+            'title': 'Mon CV',
+            'file': SimpleUploadedFile('cv.pdf', b"pas un pdf" * 20, content_type='application/pdf'),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Le fichier n&#x27;est pas un PDF.")
+        self.assertFalse(Resume.objects.exists())
+
+
+class LocalParserTests(SimpleTestCase):
+    CV = (
+        "Jean Dupont\n"
+        "Développeur Python | 5 ans d'expérience\n"
+        "jean.dupont@mail.fr - 06 12 34 56 78\n"
+        "\n"
+        "Compétences\n"
+        "Python, Django/DRF, PostgreSQL, Spring Boot, Power BI, C++, C#, Node.js, ReactJS, scikit-learn\n"
+    )
+
+    def test_extract(self):
+        result = local_parser.extract(self.CV)
+        self.assertEqual(result['job_title'], 'Développeur Python')
+        self.assertEqual(result['skills'], ['Python', 'Django', 'PostgreSQL', 'Spring', 'Power BI', 'C++', 'C#',
+                                            'Node.js', 'React', 'scikit-learn'])
+        self.assertTrue(local_parser.is_confident(result, threshold=0.75))
+
+    def test_title_with_contract_and_introduction(self):
+        self.assertEqual(local_parser.extract("Stage Data Engineer\n")['job_title'], 'Stage Data Engineer')
+        result = local_parser.extract("À la recherche d'un poste de Développeur Python\nPython Django Docker Git\n")
+        self.assertEqual(result['job_title'], 'Développeur Python')
+
+    def test_no_title_is_not_confident(self):
+        result = local_parser.extract("Jean Dupont\nbonjour\n")
+        self.assertEqual((result['job_title'], result['skills'], result['confidence']), (None, [], 0.0))
+        self.assertFalse(local_parser.is_confident(result, threshold=0))
+
+    def test_tokens_keep_compound_skill_names(self):
+        self.assertEqual(local_parser.tokens("Python/Django node.js C++ scikit-learn"),
+                         ['python', 'django', 'node.js', 'c++', 'scikit-learn'])
+
+    def test_canonical_skill(self):
+        self.assertEqual(local_parser.canonical_skill('reactjs'), 'React')
+        self.assertEqual(local_parser.canonical_skill('postgres'), 'PostgreSQL')
+        self.assertEqual(local_parser.canonical_skill('Spring Boot'), 'Spring')
+        # Plusieurs compétences ou compétence hors lexique : nom normalisé
+        self.assertEqual(local_parser.canonical_skill('Python/Django'), 'python django')
+        self.assertEqual(local_parser.canonical_skill('Rust Embarqué'), 'rust embarque')
+
+    @override_settings(LOCAL_PARSER_ENABLED=False)
+    def test_disabled(self):
+        self.assertIsNone(local_parser.min_confidence())
+        self.assertFalse(local_parser.is_confident(local_parser.extract(self.CV)))
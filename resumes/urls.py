@@ -5,5 +5,6 @@ urlpatterns = [
     path('upload/', views.upload_resume, name='upload_resume'),
     path('', views.resume_list, name='resume_list'),
     path('delete/<int:resume_id>/', views.delete_resume, name='delete_resume'),
+    path('status/<int:resume_id>/', views.resume_status, name='resume_status'),
 
 ]
\ No newline at end of file
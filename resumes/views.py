@@ -2,70 +2,57 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from .forms import ResumeUploadForm
 from .models import Resume
-from .services.pdf_parser import PDFParser
+from .services.processing import PROCESS_RESUME_TASK
+from .services.uploads import ResumeUploadHandler, attach_upload
 from matching.models import JobAlert
-from matching.services import consume_credit
-from .services.ai_parser import AIParser
+from matching.services import context_cache
+from matching.services.tasks import enqueue
 
 User = get_user_model()
 
 @login_required  # Requiert l'authentification
+@csrf_exempt
 def upload_resume(request):
+    # Le PDF est validé pendant sa réception : le gestionnaire doit être posé avant toute lecture du corps,
+    # donc avant le contrôle CSRF, fait ensuite par _upload_resume
+    request.upload_handlers = [ResumeUploadHandler(request)]
+    return _upload_resume(request)
+
+
+@csrf_protect
+def _upload_resume(request):
     if request.method == 'POST':
-        form = ResumeUploadForm(request.POST, request.FILES)
+        form = ResumeUploadForm(
+            request.POST, request.FILES, upload_error=getattr(request, 'resume_upload_error', None),
+        )
         if form.is_valid():
             resume = form.save(commit=False)
             resume.user = request.user
+            # Empreinte du PDF et fichier partagé si déjà stocké
+            attach_upload(resume, form.cleaned_data['file'])
+            resume.processing_status = Resume.STATUS_PROCESSING
             resume.save()
 
-            # --- ÉTAPE 1 : EXTRACTION DU TEXTE DU PDF ---
-            parser = PDFParser(resume.file.path)
-            extracted_text = parser.extract_text()  # Extraction du texte brut
-            parsed_data = parser.parse_data()  # Parsing basique (email, phone uniquement)
-
-            if extracted_text:
-                resume.extracted_text = extracted_text
-                resume.parsed_data = parsed_data
-                resume.save()
-
-                # --- ÉTAPE 2 : ANALYSE IA AVEC GEMINI (consomme 1 crédit) ---
-                if not consume_credit(request.user):
-                    messages.error(
-                        request,
-                        "Crédits insuffisants pour l'analyse IA. Passez Premium ou rechargez vos crédits."
-                    )
-                    return redirect('pricing')
-                try:
-                    ai_parser = AIParser()
-                    job_info = ai_parser.extract_job_info(extracted_text)
-                    
-                    # Sauvegarde des données extraites par l'IA
-                    resume.detected_job_title = job_info.get('job_title')
-                    resume.detected_skills = job_info.get('skills', [])
-                    resume.save()
-                    
-                    if resume.detected_job_title:
-                        messages.success(
-                            request, 
-                            f'CV analysé ! Poste détecté : {resume.detected_job_title}'
-                        )
-                    else:
-                        messages.warning(
-                            request, 
-                            'CV analysé mais aucun titre de poste détecté. La recherche d\'emploi pourrait être limitée.'
-                        )
-                        
-                except Exception as e:
-                    # En cas d'erreur avec l'IA, on continue quand même (le CV est sauvegardé)
-                    print(f"❌ Erreur lors de l'analyse IA : {e}")
-                    messages.warning(
-                        request, 
-                        f'⚠️ CV sauvegardé mais erreur lors de l\'analyse IA : {str(e)}'
-                    )
+            # Extraction du texte (pool de processus) et analyse IA hors requête : voir services/processing.py
+            enqueue(PROCESS_RESUME_TASK, user=request.user, payload={'resume_id': resume.pk}, priority=10)
+            resume.refresh_from_db(fields=['processing_status', 'processing_error', 'detected_job_title'])
+            if resume.processing_status == Resume.STATUS_PROCESSING:
+                messages.info(request, '📄 CV reçu ! Extraction et analyse en cours, la page se met à jour toute seule.')
+            elif resume.processing_status == Resume.STATUS_FAILED:
+                messages.error(request, f'❌ {resume.processing_error}')
+            elif resume.processing_error:
+                messages.warning(request, f'⚠️ CV sauvegardé. {resume.processing_error}')
+            elif resume.detected_job_title:
+                messages.success(request, f'CV analysé ! Poste détecté : {resume.detected_job_title}')
             else:
-                messages.error(request, '❌ Impossible d\'extraire le texte du PDF.')
+                messages.warning(
+                    request,
+                    'CV analysé mais aucun titre de poste détecté. La recherche d\'emploi pourrait être limitée.'
+                )
 
             return redirect('resume_list')
     else:
@@ -74,11 +61,22 @@ def upload_resume(request):
     return render(request, 'resumes/upload.html', {'form': form})
 
 
+@login_required
+def resume_status(request, resume_id):
+    """Endpoint JSON de suivi de l'analyse d'un CV (interrogé par la liste des CVs tant qu'elle est en cours)."""
+    resume = get_object_or_404(Resume.objects.for_list(), pk=resume_id, user=request.user)
+    return JsonResponse({
+        'resume_id': resume.pk,
+        'status': resume.processing_status,
+        'ready': resume.processing_status != Resume.STATUS_PROCESSING,
+        'job_title': resume.detected_job_title,
+        'error': resume.processing_error or None,
+    })
 
 
 @login_required
 def resume_list(request):
-    resumes = Resume.objects.filter(user=request.user)
+    resumes = Resume.objects.filter(user=request.user).for_list()
     active_alert_resume_ids = set(
         JobAlert.objects.filter(resume__user=request.user, is_active=True).values_list('resume_id', flat=True)
     )
@@ -92,6 +90,8 @@ def resume_list(request):
 def delete_resume(request, resume_id):
     if request.method == 'POST':
         resume = get_object_or_404(Resume, pk=resume_id, user=request.user)
+        # Contextes Gemini du CV : supprimés chez le fournisseur sans attendre leur expiration
+        context_cache.invalidate(resume)
         resume.delete()
         messages.success(request, 'CV supprimé.')
     return redirect('resume_list')